@@ -0,0 +1,56 @@
+'''
+Each user's default category, where tasks created without one go.
+
+The category is named 'Uncategorized', created at signup and referenced
+by Profile.default_category; a unique constraint allows one per owner
+and delete_category() refuses to delete it (see categories/deletion.py).
+JWT authentication loads the profile's default_category_id with the
+cached user (see drf_api/authentication.py), so the task create path
+does not query for it, and a changed default is seen by every worker
+that sees the changed user.
+'''
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from drf_api.authentication import forget_user
+from profiles.models import Profile
+from .models import Category
+
+
+def get_default_category_id(user):
+    '''
+    Reads the id from the profile loaded with the user, if it was.
+    '''
+    if User.profile.is_cached(user):
+        category_id = user.profile.default_category_id
+        if category_id is not None:
+            return category_id
+    return load_default_category_id(user)
+
+
+def load_default_category_id(user):
+    '''
+    Reads the id from the profile, repairing it if it is missing.
+    '''
+    category_id = Profile.objects.filter(owner=user).values_list(
+        'default_category_id', flat=True
+    ).first()
+    if category_id is not None:
+        return category_id
+
+    try:
+        with transaction.atomic():
+            category, _ = Category.objects.get_or_create(
+                owner=user, name='Uncategorized'
+            )
+    except IntegrityError:
+        # Created by a concurrent request
+        category = Category.objects.get(owner=user, name='Uncategorized')
+    Profile.objects.filter(owner=user).update(default_category=category)
+    # update() sends no signal, the cached user still has no default
+    forget_user(user.pk)
+    return category.id
+
+
+def is_default_category(category):
+    return Profile.objects.filter(default_category=category).exists()
@@ -0,0 +1,101 @@
+'''
+Batched deletion of a category and its tasks.
+
+Django's deletion collector loads every related row into memory and
+deletes them in one transaction. For a category with a large number of
+tasks this stalls the worker and holds the table locks for the whole
+delete. This module deletes tasks in batches instead:
+- Each batch runs in its own short transaction, so memory and lock time
+  stay bounded by the batch size.
+- Rows are removed with a raw DELETE ... WHERE id IN (...). Nothing has a
+  foreign key to Task, and the work done by Task's post_delete receivers
+  (tombstones, data version bumps) is done here, once per batch.
+- An interrupted delete can be resumed by calling it again.
+A user's default category is never deleted, see categories/defaults.py.
+'''
+from django.db import connections, transaction
+from django.utils import timezone
+
+from drf_api.cache import bump_data_version
+from tasks.models import Task, TaskTombstone
+from tasks.sequence import reserve_sequence
+from .defaults import is_default_category
+
+BATCH_SIZE = 2000
+
+
+class DefaultCategoryError(Exception):
+    '''
+    Raised when deleting a user's default 'Uncategorized' category.
+    '''
+
+
+def create_tombstones(owner_id, task_ids, deleted_at):
+    '''
+    Writes the tombstones of the owner's given tasks with one
+    INSERT ... SELECT, numbered in the owner's change sequence.
+    Run it inside transaction.atomic().
+    '''
+    first = reserve_sequence(owner_id, len(task_ids))
+    connection = connections[Task.objects.db]
+    placeholders = ', '.join(['%s'] * len(task_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TaskTombstone._meta.db_table} '
+            f'(owner_id, task_id, deleted_at, sync_seq) '
+            f'SELECT owner_id, id, %s, %s + ROW_NUMBER() OVER (ORDER BY id) '
+            f'FROM {Task._meta.db_table} '
+            f'WHERE owner_id = %s AND id IN ({placeholders})',
+            [
+                connection.ops.adapt_datetimefield_value(deleted_at),
+                first - 1,
+                owner_id,
+                *task_ids,
+            ],
+        )
+
+
+def delete_category_tasks(category, batch_size=BATCH_SIZE, progress=None):
+    '''
+    Deletes the category's tasks in batches, returning how many went.
+    `progress(deleted, total)` is called after every batch.
+    '''
+    tasks = Task.objects.filter(category=category)
+    total = tasks.count()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            # Unordered, so each batch is read straight off the index
+            batch = list(
+                tasks.order_by().values_list('id', 'owner_id')[:batch_size]
+            )
+            if not batch:
+                break
+            owners = {}
+            for task_id, owner_id in batch:
+                owners.setdefault(owner_id, []).append(task_id)
+            now = timezone.now()
+            for owner_id in sorted(owners):
+                create_tombstones(owner_id, owners[owner_id], now)
+            queryset = Task.objects.filter(
+                id__in=[task_id for task_id, _ in batch]
+            )
+            deleted += queryset._raw_delete(queryset.db)
+            bump_data_version(*owners)
+        if progress:
+            progress(deleted, max(total, deleted))
+    return deleted
+
+
+def delete_category(category, batch_size=BATCH_SIZE, progress=None):
+    '''
+    Deletes the category's tasks in batches, then the category itself.
+    Raises DefaultCategoryError for a default category.
+    '''
+    if is_default_category(category):
+        raise DefaultCategoryError(
+            'The default category cannot be deleted.'
+        )
+    deleted = delete_category_tasks(category, batch_size, progress)
+    category.delete()
+    return deleted
@@ -0,0 +1,57 @@
+from rest_framework import serializers
+from .models import Category
+
+
+def get_owned_categories(request):
+    '''
+    Returns the requesting user's categories by id, read once per request
+    and shared by every serializer and view handling it.
+    '''
+    if not hasattr(request, '_owned_categories'):
+        request._owned_categories = {
+            category.id: category
+            for category in Category.objects.filter(
+                owner=request.user
+            ).order_by()
+        }
+    return request._owned_categories
+
+
+class OwnedCategoryField(serializers.PrimaryKeyRelatedField):
+    '''
+    Primary key of one of the requesting user's categories.
+    - Checked against get_owned_categories(), so validating any number
+      of tasks in a request takes a single category query.
+    - Same errors as PrimaryKeyRelatedField.
+    '''
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Category.objects.none())
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        '''
+        Only used for the choices of the browsable API form.
+        '''
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return Category.objects.none()
+        return Category.objects.filter(owner=request.user)
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        # int() takes JSON true and false for 1 and 0
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            self.fail('does_not_exist', pk_value=data)
+        category = get_owned_categories(request).get(pk)
+        if category is None:
+            self.fail('does_not_exist', pk_value=data)
+        return category
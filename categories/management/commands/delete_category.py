@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from categories.deletion import (
+    BATCH_SIZE, DefaultCategoryError, delete_category,
+)
+from categories.models import Category
+
+
+class Command(BaseCommand):
+    '''
+    Deletes a category and its tasks in batches, printing progress.
+    Safe to re-run if interrupted. Default categories are refused, like
+    in the API.
+    '''
+    help = 'Delete a category and all of its tasks in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('category_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            category = Category.objects.get(id=options['category_id'])
+        except Category.DoesNotExist:
+            raise CommandError(
+                f'Category {options["category_id"]} does not exist.'
+            )
+
+        def progress(deleted, total):
+            self.stdout.write(f'Deleted {deleted:,} of {total:,} tasks')
+
+        try:
+            deleted = delete_category(
+                category, options['batch_size'], progress=progress
+            )
+        except DefaultCategoryError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted category "{category.name}" and {deleted:,} tasks.'
+        ))
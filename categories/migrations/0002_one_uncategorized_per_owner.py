@@ -0,0 +1,42 @@
+# Generated by Django 3.2.4 on 2026-10-18 08:15
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_uncategorized(apps, schema_editor):
+    '''
+    Keeps each owner's oldest 'Uncategorized' category and moves the tasks
+    of any others into it, so the unique constraint can be added.
+    '''
+    Category = apps.get_model('categories', 'Category')
+    Task = apps.get_model('tasks', 'Task')
+    duplicated = Category.objects.filter(name='Uncategorized').values(
+        'owner'
+    ).annotate(count=Count('id'), keep=Min('id')).filter(count__gt=1)
+    for row in duplicated:
+        duplicates = Category.objects.filter(
+            owner=row['owner'], name='Uncategorized'
+        ).exclude(id=row['keep'])
+        Task.objects.filter(category__in=duplicates).update(
+            category=row['keep']
+        )
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        ('tasks', '0009_task_overdue_sweep_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_uncategorized, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(condition=models.Q(('name', 'Uncategorized')), fields=('owner',), name='category_one_uncategorized_per_owner'),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Q
 from django.contrib.auth.models import User
 
 
@@ -13,6 +14,19 @@ class Category(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        constraints = [
+            # The default category, see categories/defaults.py
+            models.UniqueConstraint(
+                fields=['owner'],
+                condition=Q(name='Uncategorized'),
+                name='category_one_uncategorized_per_owner',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Saving resequences the category's tasks, see categories/signals.py
+        with transaction.atomic(using=router.db_for_write(Category)):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f'{self.name} (by {self.owner.username})'
\ No newline at end of file
@@ -1,14 +1,26 @@
 from rest_framework import serializers
 from .models import Category
 from tasks.models import Task
+from drf_api.metrics import MetricsSerializerMixin
+from drf_api.sparse import SparseFieldsMixin
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(
+    MetricsSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """
     Serializer for the Category model.
     - Shows the task count for each category.
     - Ensures only the category owner can access it.
+    - GETs can ask for some fields only, see drf_api/sparse.py.
     """
+    # task_count and task_ids come from with_task_summary() in views.py
+    sparse_sources = {
+        'owner': ['owner__username'],
+        'task_count': [],
+        'task_ids': [],
+    }
+
     owner = serializers.ReadOnlyField(source='owner.username')
     task_count = serializers.SerializerMethodField()
     task_ids = serializers.SerializerMethodField()
@@ -24,14 +36,34 @@ class CategorySerializer(serializers.ModelSerializer):
             'created_at'
         ]
 
+    def validate_name(self, value):
+        """
+        'Uncategorized' is reserved for the default category.
+        """
+        if value == 'Uncategorized' and (
+            self.instance is None or self.instance.name != 'Uncategorized'
+        ):
+            raise serializers.ValidationError(
+                "'Uncategorized' is reserved for the default category."
+            )
+        return value
+
     def get_task_count(self, obj):
-        """Returns the number of tasks in this category"""
+        """
+        Returns the number of tasks in this category.
+        Uses the views' annotation, only queries for fresh instances.
+        """
+        if hasattr(obj, 'task_count'):
+            return obj.task_count
         return Task.objects.filter(category=obj, is_archived=False).count()
 
     def get_task_ids(self, obj):
         '''
         Returns a list of task IDs for this category
+        Uses the views' prefetch, only queries for fresh instances.
         '''
+        if hasattr(obj, 'owned_tasks'):
+            return [task.id for task in obj.owned_tasks]
         request = self.context.get('request')
         return list(
             Task.objects.filter(
@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from drf_api.authentication import forget_user
+from drf_api.cache import bump_data_version
+from profiles.models import Profile
+from tasks.models import Task
+from tasks.sequence import resequence
 from .models import Category
 
 
@@ -8,6 +13,49 @@ from .models import Category
 def create_uncategorized_category(sender, instance, created, **kwargs):
     """
     Automatically creates an 'Uncategorized' category for new users.
+    Sets it as the default category on their profile.
     """
     if created:
-        Category.objects.create(owner=instance, name="Uncategorized")
\ No newline at end of file
+        category = Category.objects.create(
+            owner=instance, name="Uncategorized"
+        )
+        Profile.objects.filter(owner=instance).update(
+            default_category=category
+        )
+
+
+@receiver(post_save, sender=Category)
+def resequence_renamed_category_tasks(sender, instance, created, **kwargs):
+    """
+    Sends the tasks of a saved (renamed) category to /tasks/changes/
+    again, they show its name. Category.save() makes this atomic.
+    """
+    if not created:
+        resequence(Task.objects.filter(category=instance), instance.owner_id)
+
+
+@receiver(pre_delete, sender=Category)
+def resequence_uncategorized_tasks(sender, instance, **kwargs):
+    """
+    Same for tasks left in a deleted category (eg. from the admin), which
+    are set to no category without a signal, in the same transaction.
+    """
+    resequence(Task.objects.filter(category=instance), instance.owner_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_owner_data_version(sender, instance, **kwargs):
+    """
+    Invalidates the owner's cached task and category lists.
+    """
+    bump_data_version(instance.owner_id)
+
+
+@receiver(post_delete, sender=Category)
+def forget_deleted_default(sender, instance, **kwargs):
+    """
+    Drops the owner's cached user and default category id, in case this
+    was it: the profile is set to NULL without a signal.
+    """
+    forget_user(instance.owner_id)
@@ -1,9 +1,22 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 from .models import Category
-from tasks.models import Task
+from .defaults import get_default_category_id
+from .deletion import DefaultCategoryError, delete_category
+from drf_api.authentication import CachedJWTCookieAuthentication
+from profiles.models import Profile
+from tasks.models import Task, TaskTombstone
 from datetime import date
+from io import StringIO
+from rest_framework_simplejwt.tokens import RefreshToken
+from unittest import mock
 
 
 class CategoryTests(APITestCase):
@@ -266,3 +279,312 @@ class TaskCategoryTests(APITestCase):
         self.task1.refresh_from_db()
         # Ensure category was removed but task still exists
         self.assertIsNone(self.task1.category)
+
+
+class CategoryQueryCountTests(APITestCase):
+    '''
+    Tests that category endpoints run a fixed number of queries,
+    however many categories and tasks there are.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user1",
+            password="password123"
+        )
+        self.client.login(username="user1", password="password123")
+
+    def create_categories(self, count):
+        for i in range(count):
+            category = Category.objects.create(
+                owner=self.user,
+                name=f"Category {i}"
+            )
+            Task.objects.create(
+                owner=self.user,
+                title=f"Active {i}",
+                category=category
+            )
+            Task.objects.create(
+                owner=self.user,
+                title=f"Done {i}",
+                category=category,
+                status="Completed"
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_category_list_query_count_is_constant(self):
+        '''
+        Listing 3 or 12 categories runs the same number of queries.
+        '''
+        self.create_categories(3)
+        small = self.count_queries('/categories/')
+        self.create_categories(9)
+        self.assertEqual(self.count_queries('/categories/'), small)
+
+    def test_category_list_keeps_model_ordering(self):
+        self.create_categories(3)
+        response = self.client.get('/categories/')
+        self.assertEqual(
+            [data['id'] for data in response.data['results']],
+            list(Category.objects.filter(owner=self.user).values_list(
+                'id', flat=True
+            ))
+        )
+
+    def test_category_list_task_summary(self):
+        '''
+        task_count counts active tasks, task_ids lists all the user's tasks.
+        '''
+        self.create_categories(2)
+        response = self.client.get('/categories/')
+        for data in response.data['results']:
+            category = Category.objects.get(id=data['id'])
+            tasks = Task.objects.filter(category=category)
+            self.assertEqual(
+                data['task_count'],
+                tasks.filter(is_archived=False).count()
+            )
+            self.assertEqual(
+                data['task_ids'],
+                list(tasks.values_list('id', flat=True))
+            )
+
+    def test_category_detail_task_summary(self):
+        '''
+        The detail view returns the same precomputed task summary.
+        '''
+        self.create_categories(1)
+        category = Category.objects.get(name="Category 0")
+        response = self.client.get(f'/categories/{category.id}/')
+        self.assertEqual(response.data['task_count'], 1)
+        self.assertEqual(len(response.data['task_ids']), 2)
+
+    def test_sparse_fields_skip_task_summary(self):
+        self.create_categories(3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/categories/?fields=id,name')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'name'])
+        category_queries = [
+            query['sql'] for query in queries
+            if 'categories_category' in query['sql']
+        ]
+        self.assertEqual(len(category_queries), 2)
+        for sql in category_queries:
+            self.assertNotIn('JOIN', sql)
+
+        response = self.client.get('/categories/?omit=task_ids')
+        self.assertIn('task_count', response.data['results'][0])
+        self.assertNotIn('task_ids', response.data['results'][0])
+
+
+class CategoryResponseCacheTests(APITestCase):
+    '''
+    Tests that cached category lists follow task and category writes.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.category = Category.objects.create(owner=self.user, name="Work")
+
+    def get_category(self):
+        response = self.client.get('/categories/')
+        category = next(
+            data for data in response.data['results']
+            if data['id'] == self.category.id
+        )
+        return response['X-Cache'], category
+
+    def test_second_request_is_a_hit(self):
+        self.assertEqual(self.get_category()[0], 'MISS')
+        self.assertEqual(self.get_category()[0], 'HIT')
+
+    def test_task_writes_update_task_count(self):
+        self.get_category()
+        task = Task.objects.create(
+            owner=self.user, title="Task", category=self.category
+        )
+        cache_status, category = self.get_category()
+        self.assertEqual(cache_status, 'MISS')
+        self.assertEqual(category['task_count'], 1)
+
+        task.delete()
+        self.assertEqual(self.get_category()[1]['task_count'], 0)
+
+    def test_rename_invalidates(self):
+        self.get_category()
+        self.client.put(
+            f'/categories/{self.category.id}/', {'name': 'Home'}
+        )
+        cache_status, category = self.get_category()
+        self.assertEqual(cache_status, 'MISS')
+        self.assertEqual(category['name'], 'Home')
+
+    def test_task_delete_changes_etag(self):
+        task = Task.objects.create(
+            owner=self.user, title="Task", category=self.category
+        )
+        url = f'/categories/{self.category.id}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        task.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['task_ids'], [])
+
+
+class CategoryBatchedDeleteTests(APITestCase):
+    '''
+    Tests that deleting a category removes its tasks in batches.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.category = Category.objects.create(owner=self.user, name="Work")
+        self.other = Category.objects.create(owner=self.user, name="Home")
+        Task.objects.bulk_create([
+            Task(owner=self.user, title=f"Task {i}", category=self.category)
+            for i in range(7)
+        ])
+        self.kept = Task.objects.create(
+            owner=self.user, title="Kept", category=self.other
+        )
+
+    def test_delete_in_batches(self):
+        reports = []
+        deleted = delete_category(
+            self.category, batch_size=3,
+            progress=lambda deleted, total: reports.append((deleted, total)),
+        )
+        self.assertEqual(deleted, 7)
+        self.assertEqual(reports, [(3, 7), (6, 7), (7, 7)])
+        self.assertFalse(Category.objects.filter(id=self.category.id).exists())
+        self.assertEqual(list(Task.objects.all()), [self.kept])
+
+    def test_tombstones_and_cache_invalidation(self):
+        ids = set(
+            Task.objects.filter(category=self.category)
+            .values_list('id', flat=True)
+        )
+        self.client.get('/tasks/')
+        response = self.client.delete(f'/categories/{self.category.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            set(TaskTombstone.objects.values_list('task_id', flat=True)), ids
+        )
+        response = self.client.get('/tasks/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command(
+            'delete_category', self.category.id, batch_size=5, stdout=out
+        )
+        self.assertIn('Deleted 5 of 7 tasks', out.getvalue())
+        self.assertFalse(Task.objects.filter(title="Task 0").exists())
+
+        with self.assertRaises(CommandError):
+            call_command('delete_category', self.category.id, stdout=out)
+
+
+class DefaultCategoryTests(APITestCase):
+    '''
+    Tests for the per-user default 'Uncategorized' category.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.default = Category.objects.get(
+            owner=self.user, name="Uncategorized"
+        )
+
+    def test_signup_sets_default_category(self):
+        profile = Profile.objects.get(owner=self.user)
+        self.assertEqual(profile.default_category, self.default)
+        self.assertEqual(get_default_category_id(self.user), self.default.id)
+
+    def test_task_create_does_not_look_up_default(self):
+        # The id comes with the user loaded by JWT authentication
+        caches['default'].clear()
+        self.client.logout()
+        self.client.cookies[settings.JWT_AUTH_COOKIE] = str(
+            RefreshToken.for_user(self.user).access_token
+        )
+        patcher = mock.patch(
+            'rest_framework.views.APIView.authentication_classes',
+            [CachedJWTCookieAuthentication],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.post('/tasks/', {'title': 'Warm up'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/tasks/', {'title': 'Task'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['category'], self.default.id)
+        self.assertEqual(response.data['category_name'], 'Uncategorized')
+        # Other than authentication loading the user with it
+        lookups = [
+            query for query in queries
+            if ('default_category' in query['sql']
+                and 'FROM "auth_user"' not in query['sql'])
+            or "'Uncategorized'" in query['sql']
+        ]
+        self.assertEqual(lookups, [])
+
+    def test_category_list_creates_nothing(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/categories/')
+        self.assertFalse(
+            any(query['sql'].startswith('INSERT') for query in queries)
+        )
+
+    def test_default_category_cannot_be_deleted(self):
+        response = self.client.delete(f'/categories/{self.default.id}/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Category.objects.filter(id=self.default.id).exists())
+        with self.assertRaises(DefaultCategoryError):
+            delete_category(self.default)
+        with self.assertRaises(CommandError):
+            call_command(
+                'delete_category', self.default.id, stdout=StringIO()
+            )
+        self.assertTrue(Category.objects.filter(id=self.default.id).exists())
+
+    def test_uncategorized_name_is_reserved(self):
+        response = self.client.post('/categories/', {'name': 'Uncategorized'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.put(
+            f'/categories/{self.default.id}/', {'name': 'Uncategorized'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_one_uncategorized_per_owner(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Category.objects.create(owner=self.user, name="Uncategorized")
+
+    def test_missing_default_is_repaired(self):
+        Profile.objects.filter(owner=self.user).update(default_category=None)
+        self.assertEqual(get_default_category_id(self.user), self.default.id)
+        profile = Profile.objects.get(owner=self.user)
+        self.assertEqual(profile.default_category, self.default)
@@ -1,7 +1,8 @@
 from django.urls import path
 from categories import views
+from drf_api.async_views import async_view
 
 urlpatterns = [
-    path('categories/', views.CategoryListView.as_view()),
+    path('categories/', async_view(views.CategoryListView.as_view())),
     path('categories/<int:pk>/', views.CategoryDetailView.as_view()),
 ]
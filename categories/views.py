@@ -1,17 +1,67 @@
+from django.db.models import Count, Prefetch, Q
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
 from .models import Category
 from .serializers import CategorySerializer
+from .deletion import DefaultCategoryError, delete_category
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.cache import CachedListMixin
+from drf_api.conditional import DataVersionConditionalMixin
+from drf_api.replicas import ReplicaReadMixin
+from drf_api.sparse import get_sparse_fields, narrow_queryset
 from tasks.models import Task
 
 
-class CategoryListView(generics.ListCreateAPIView):
+def with_task_summary(queryset, request):
+    '''
+    Adds what CategorySerializer needs to each category up front:
+    - task_count of active tasks, as an annotation on the same query.
+    - owned_tasks, the user's task ids, in one prefetch for all categories.
+    Only what the requested fields need, see drf_api/sparse.py.
+    '''
+    fields = get_sparse_fields(request, CategorySerializer.Meta.fields)
+    if fields is None:
+        fields = CategorySerializer.Meta.fields
+        queryset = queryset.select_related('owner')
+    else:
+        queryset = narrow_queryset(
+            queryset, CategorySerializer.get_sparse_sources(fields)
+        )
+
+    if 'task_count' in fields:
+        queryset = queryset.annotate(
+            task_count=Count('task', filter=Q(task__is_archived=False)),
+        ).order_by(
+            # Meta.ordering is not applied to GROUP BY queries
+            *Category._meta.ordering
+        )
+    if 'task_ids' in fields:
+        queryset = queryset.prefetch_related(
+            Prefetch(
+                'task_set',
+                queryset=Task.objects.filter(
+                    owner=request.user
+                ).only('id', 'category'),
+                to_attr='owned_tasks',
+            )
+        )
+    return queryset
+
+
+class CategoryListView(
+    ReplicaReadMixin, DataVersionConditionalMixin, CachedListMixin,
+    generics.ListCreateAPIView
+):
     """
     API view for listing and creating categories.
     - Users can only view their own categories.
     - Users must be authenticated.
+    - `?fields=` and `?omit=` return and load only some fields.
+    - List responses are cached per user until their data changes.
+    - GETs carry an ETag and answer If-None-Match with 304.
+    - GETs read from a replica when there is one.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = CategorySerializer
@@ -21,16 +71,11 @@ class CategoryListView(generics.ListCreateAPIView):
     def get_queryset(self):
         """
         Returns only categories belonging to the logged-in user.
-        Creates an 'Uncategorized' category if missing.
+        'Uncategorized' always exists, see categories/defaults.py.
         """
-        user = self.request.user
-        queryset = Category.objects.filter(owner=user)
-
-        # Ensure "Uncategorized" exists
-        if not queryset.filter(name="Uncategorized").exists():
-            Category.objects.create(owner=user, name="Uncategorized")
-
-        return queryset
+        return with_task_summary(
+            Category.objects.filter(owner=self.request.user), self.request
+        )
 
     def perform_create(self, serializer):
         """
@@ -39,11 +84,17 @@ class CategoryListView(generics.ListCreateAPIView):
         serializer.save(owner=self.request.user)
 
 
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(
+    ReplicaReadMixin, DataVersionConditionalMixin,
+    generics.RetrieveUpdateDestroyAPIView
+):
     '''
     API view for retrieving, updating, and deleting categories.
     - Users can only modify their own categories.
     - If a category is deleted, all associated tasks are also deleted
+    - `?fields=` and `?omit=` return and load only some fields.
+    - GETs carry an ETag and answer If-None-Match with 304.
+    - GETs read from a replica when there is one.
     '''
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
     serializer_class = CategorySerializer
@@ -52,11 +103,17 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
         """
         Returns only categories belonging to the logged-in user.
         """
-        return Category.objects.filter(owner=self.request.user)
+        return with_task_summary(
+            Category.objects.filter(owner=self.request.user), self.request
+        )
       
     def perform_destroy(self, instance):
         """
         Deletes all tasks linked to the category before deleting the category itself.
+        Tasks are deleted in batches, see categories/deletion.py.
+        The default 'Uncategorized' category cannot be deleted.
         """
-        Task.objects.filter(category=instance).delete()  # Delete all associated tasks
-        instance.delete()  # Delete the category
\ No newline at end of file
+        try:
+            delete_category(instance)
+        except DefaultCategoryError as error:
+            raise ValidationError({"detail": str(error)})
\ No newline at end of file
@@ -1,7 +1,10 @@
 """
 ASGI config for drf_api project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``,
+eg. for ``uvicorn drf_api.asgi:application``. The task and category
+endpoints are served by async views, and their streamed responses sent
+by ASGIHandler, see drf_api/async_views.py.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +12,13 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drf_api.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from drf_api.async_views import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -0,0 +1,166 @@
+'''
+Async views for serving under ASGI (see drf_api/asgi.py).
+
+Django 3.2 runs sync views under ASGI with sync_to_async(thread_sensitive=
+True), ie. one at a time on a single shared thread. async_view() wraps a
+DRF view into an async view that runs it, with its database queries and
+rendering, on an executor of ASYNC_VIEWS['MAX_WORKERS'] threads instead,
+so that many requests are served at once and the event loop only waits.
+- Each worker thread has its own database connection, closed (returned
+  to the pool, see drf_api/postgres_pool) after every request.
+  Size MAX_WORKERS like the pool's MAX_SIZE.
+- Streamed responses (`?stream=true`) are read by one worker thread, at
+  most STREAM_BUFFER chunks ahead of the client. Django 3.2 only sends
+  streaming content from a sync iterator in the event loop, where
+  queries are not allowed, so they are sent by ASGIHandler, which
+  drf_api/asgi.py serves.
+- With ASYNC_VIEWS['ENABLED'] off, as under WSGI, async_view() returns
+  the view unchanged.
+'''
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers import asgi
+from django.db import close_old_connections
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_WORKERS': 10,
+}
+STREAM_BUFFER = 2
+
+_executor = None
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'ASYNC_VIEWS', {})}
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_config()['MAX_WORKERS'],
+            thread_name_prefix='async-views',
+        )
+    return _executor
+
+
+def run_view(view, request, *args, **kwargs):
+    '''
+    Calls the view and renders its response, in a worker thread.
+    '''
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view, force=False):
+    '''
+    Returns an async version of the view when ASYNC_VIEWS is enabled,
+    or `force`d.
+    '''
+    if not (force or get_config()['ENABLED']):
+        return view
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        response = await sync_to_async(
+            run_view, thread_sensitive=False, executor=get_executor()
+        )(view, request, *args, **kwargs)
+        if response.streaming:
+            response.async_streaming_content = stream_in_worker(
+                response.streaming_content
+            )
+            response.streaming_content = unsent()
+        return response
+    return wrapper
+
+
+def unsent():
+    raise ImproperlyConfigured(
+        'Streamed responses of async views are sent by '
+        'drf_api.async_views.ASGIHandler.'
+    )
+    yield
+
+
+async def stream_in_worker(chunks, buffer=STREAM_BUFFER):
+    '''
+    Yields the chunks of a streamed response, reading them in one worker
+    thread, which keeps the queryset's database connection to itself.
+    - The worker reads at most `buffer` chunks ahead of the client.
+    - When the client goes away, the worker stops at the next chunk.
+    '''
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    slots = threading.Semaphore(buffer)
+    stopped = threading.Event()
+    done = object()
+
+    def read():
+        try:
+            for chunk in chunks:
+                slots.acquire()
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        finally:
+            close_old_connections()
+
+    reader = loop.run_in_executor(get_executor(), read)
+    # Done callbacks run after the chunks' put_nowait() calls
+    reader.add_done_callback(lambda _: queue.put_nowait(done))
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is done:
+                break
+            slots.release()
+            yield chunk
+    finally:
+        stopped.set()
+        slots.release()
+        # Raises the worker's error, if any
+        await reader
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    '''
+    Django's ASGI handler, also sending the streamed responses of the
+    async views, from their worker threads (see stream_in_worker()).
+    '''
+
+    async def send_response(self, response, send):
+        chunks = getattr(response, 'async_streaming_content', None)
+        if chunks is None:
+            return await super().send_response(response, send)
+        response.streaming_content = ()
+
+        async def send_with_content(message):
+            # The content goes before the closing message
+            if (
+                message['type'] == 'http.response.body'
+                and not message.get('more_body')
+            ):
+                try:
+                    async for part in chunks:
+                        for chunk, _ in self.chunk_bytes(part):
+                            await send({
+                                'type': 'http.response.body',
+                                'body': chunk,
+                                'more_body': True,
+                            })
+                finally:
+                    await chunks.aclose()
+            await send(message)
+        await super().send_response(response, send_with_content)
@@ -0,0 +1,143 @@
+'''
+JWT cookie authentication with a short lived cache of the user.
+
+JWTCookieAuthentication reads the user from the database on every request,
+and CurrentUserSerializer then reads their profile. Here the user, joined
+with their profile id, is cached for AUTH_USER_CACHE['TIMEOUT'] seconds
+under the user id and an auth version.
+
+Saving or deleting a user or profile, and deleting an account, replaces
+the user's auth version once the transaction commits, so their cached
+copies are never read again. The version lives in the same cache, which
+must be shared by all workers (eg. Redis or Memcached) for a deactivated
+user to be rejected everywhere at once. A per-process cache (LocMemCache,
+the default without CACHES) would let other workers accept the user until
+their copy expires, so nothing is cached then and the user is read from
+the database on every request.
+'''
+import uuid
+
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, InvalidToken,
+)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_USER_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_config()['ALIAS']]
+
+
+def is_shared(cache):
+    '''
+    Whether every worker sees the same entries of the cache.
+    '''
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def get_version_key(user_id):
+    return 'auth-version:%s' % user_id
+
+
+def get_auth_version(cache, user_id):
+    '''
+    Returns the user's auth version, starting a new one if there is none
+    (never set, or evicted) so older entries cannot be read.
+    '''
+    key = get_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def forget_user(*user_ids):
+    '''
+    Makes every cached copy of the given users unreachable,
+    once the current transaction commits.
+    '''
+    def replace_versions():
+        get_cache().set_many({
+            get_version_key(user_id): uuid.uuid4().hex
+            for user_id in user_ids
+        }, None)
+    transaction.on_commit(replace_versions)
+
+
+def load_user(user_id):
+    '''
+    Reads the user with their profile id and default category id,
+    leaving out the password hash so it is never copied to the cache.
+    '''
+    fields = [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname != 'password'
+    ]
+    return User.objects.select_related('profile').only(
+        *fields, 'profile__id', 'profile__owner',
+        'profile__default_category',
+    ).get(**{jwt_settings.USER_ID_FIELD: user_id})
+
+
+class CachedJWTCookieAuthentication(JWTCookieAuthentication):
+    '''
+    JWTCookieAuthentication reading the user from the cache.
+    - Same checks and errors as JWTAuthentication.get_user().
+    - `request.user.profile.id` needs no query either.
+    - Nothing is cached unless AUTH_USER_CACHE['ALIAS'] is a shared
+      cache, the user and profile id are then read on every request.
+    '''
+    def get_user(self, validated_token):
+        config = get_config()
+        if not config['ENABLED']:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+
+        cache = caches[config['ALIAS']]
+        key = user = None
+        # Other workers would not see auth version changes in a
+        # per-process cache
+        if is_shared(cache):
+            key = 'auth-user:%s:%s' % (
+                user_id, get_auth_version(cache, user_id)
+            )
+            user = cache.get(key)
+        if user is None:
+            try:
+                user = load_user(user_id)
+            except User.DoesNotExist:
+                raise AuthenticationFailed(
+                    _("User not found"), code="user_not_found"
+                )
+            if key:
+                cache.set(key, user, config['TIMEOUT'])
+
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+        return user
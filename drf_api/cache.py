@@ -0,0 +1,352 @@
+'''
+Per-user response cache for list endpoints.
+
+Every profile has a `data_version` that is bumped whenever one of the
+user's tasks or categories changes (see tasks/signals.py and
+categories/signals.py). The version is part of the cache key, so a write
+makes every cached response of that user unreachable at once and a stale
+payload is never served.
+
+Code that changes rows without sending signals (queryset.update(),
+bulk_create(), raw deletes) must call bump_data_version() itself.
+
+The profile list shows every user's profile, so it is versioned by one
+global profile list version instead, the single ProfileListVersion row,
+bumped in the transaction of every profile or user change (see
+profiles/models.py). Being in the database, a bump is seen by every
+worker at once, whatever the cache backend.
+
+The backend is set by the RESPONSE_CACHE setting:
+- LRUBackend, the default, keeps entries in this process, up to
+  `max_entries` and about `max_bytes`. An entry cached under a newer
+  version drops the older versions' entries of the same user and view.
+- DjangoCacheBackend stores them in one of the CACHES, eg. a Redis or
+  Memcached cache shared by all workers. LocMemCache stands in for it
+  in development and tests.
+Pages of more than MAX_ROWS rows are not cached, they would crowd out
+everything else.
+'''
+import sys
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+from profiles.models import Profile, ProfileListVersion
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BACKEND': 'drf_api.cache.LRUBackend',
+    'OPTIONS': {},
+    'MAX_ROWS': 1000,
+}
+
+
+def get_size(value):
+    '''
+    Approximate memory used by a serialized payload, in bytes.
+    '''
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += get_size(key) + get_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += get_size(item)
+    return size
+
+
+class LRUBackend:
+    '''
+    Thread safe, in-process least recently used cache, bounded by entries
+    and approximate bytes.
+    - Entries bigger than a tenth of max_bytes are not kept.
+    - set() with a `scope` and `version` drops the entries that scope
+      holds under any other version. Versioned keys are never read again
+      once the version changes, so they need not wait for eviction.
+    '''
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key: (value, size, scope)
+        self.entries = OrderedDict()
+        # scope: (version, keys)
+        self.scopes = {}
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, scope=None, version=None):
+        size = get_size(value)
+        if size > self.max_bytes // 10:
+            return
+        with self.lock:
+            self.pop(key)
+            if scope is not None:
+                scope_version, keys = self.scopes.get(scope, (None, ()))
+                if scope_version != version:
+                    for old_key in list(keys):
+                        self.pop(old_key)
+                    self.scopes[scope] = (version, set())
+                self.scopes[scope][1].add(key)
+            self.entries[key] = (value, size, scope)
+            self.bytes += size
+            while (
+                len(self.entries) > self.max_entries
+                or self.bytes > self.max_bytes
+            ):
+                self.pop(next(iter(self.entries)))
+
+    def pop(self, key):
+        '''
+        Called with the lock held.
+        '''
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        _, size, scope = entry
+        self.bytes -= size
+        if scope is not None:
+            keys = self.scopes[scope][1]
+            keys.discard(key)
+            if not keys:
+                del self.scopes[scope]
+
+    def delete(self, key):
+        with self.lock:
+            self.pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.scopes.clear()
+            self.bytes = 0
+
+
+class DjangoCacheBackend:
+    '''
+    Stores entries in a Django cache from CACHES.
+    Entries expire after `timeout` seconds, old versions are never read
+    again so they only need to live long enough to be evicted.
+    '''
+    def __init__(self, alias='default', timeout=300):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, scope=None, version=None):
+        # Older versions expire with the timeout
+        self.cache.set(key, value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class CacheStats:
+    '''
+    Hit and miss counters, shared by every view in the process.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        with self.lock:
+            self.hits += 1
+
+    def miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def reset(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+stats = CacheStats()
+_backend = None
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def get_backend():
+    '''
+    Returns the configured backend, created on first use.
+    '''
+    global _backend
+    if _backend is None:
+        config = get_config()
+        _backend = import_string(config['BACKEND'])(**config['OPTIONS'])
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting in ('RESPONSE_CACHE', 'CACHES'):
+        _backend = None
+
+
+def get_data_version(user):
+    '''
+    Returns the user's current data version, None if they have no profile.
+    '''
+    versions = Profile.objects.filter(owner=user).order_by().values_list(
+        'data_version', flat=True
+    )[:1]
+    return versions[0] if versions else None
+
+
+def get_request_data_version(request):
+    '''
+    Reads the requesting user's data version once per request.
+    '''
+    if not hasattr(request, '_data_version'):
+        request._data_version = get_data_version(request.user)
+    return request._data_version
+
+
+def bump_data_version(*user_ids):
+    '''
+    Invalidates every cached response of the given users.
+    '''
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        Profile.objects.filter(owner_id__in=user_ids).update(
+            data_version=F('data_version') + 1
+        )
+
+
+def get_profile_list_version():
+    '''
+    Returns the version of the profile list.
+    '''
+    version = ProfileListVersion.objects.values_list(
+        'version', flat=True
+    ).first()
+    if version is None:
+        version = ProfileListVersion.objects.get_or_create(pk=1)[0].version
+    return version
+
+
+def bump_profile_list_version():
+    '''
+    Invalidates every cached profile list and its ETags, as part of the
+    current transaction.
+    '''
+    if not ProfileListVersion.objects.update(version=F('version') + 1):
+        ProfileListVersion.objects.get_or_create(pk=1)
+
+
+def get_normalized_url(request):
+    '''
+    Returns the request URL with its query parameters in a fixed order.
+    '''
+    query = '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(request.query_params.lists())
+        for value in values
+    )
+    return '%s://%s%s?%s' % (
+        request.scheme, request.get_host(), request.path, query,
+    )
+
+
+def get_cache_key(request, version):
+    '''
+    Builds a key from the user, their data version and the normalized URL.
+    '''
+    return 'response:%s:%s:%s' % (
+        request.user.pk, version, get_normalized_url(request),
+    )
+
+
+def count_rows(data):
+    '''
+    Number of rows in a list payload, paginated or not.
+    '''
+    if isinstance(data, dict):
+        data = data.get('results', ())
+    return len(data)
+
+
+class CachedListMixin:
+    '''
+    Caches the serialized list response of authenticated GETs.
+    - Adds an `X-Cache: HIT` or `X-Cache: MISS` header.
+    - The data version is read before the list is built, so a write that
+      lands in between is cached under the old, already dead, version.
+    - Views listing more than the user's own data override
+      get_cache_version().
+    - Pages of more than MAX_ROWS rows are not cached.
+    '''
+    def list(self, request, *args, **kwargs):
+        if not get_config()['ENABLED'] or not request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+
+        version = self.get_cache_version(request)
+        if version is None:
+            return super().list(request, *args, **kwargs)
+
+        backend = get_backend()
+        key = get_cache_key(request, version)
+        data = backend.get(key)
+        if data is not None:
+            stats.hit()
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        stats.miss()
+        response = super().list(request, *args, **kwargs)
+        # Streamed responses (drf_api/streaming.py) have no data to keep
+        if (
+            isinstance(response, Response)
+            and response.status_code == status.HTTP_200_OK
+            and count_rows(response.data) <= get_config()['MAX_ROWS']
+        ):
+            backend.set(
+                key, response.data,
+                scope=(request.user.pk, type(self).__name__),
+                version=version,
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def get_cache_version(self, request):
+        '''
+        Returns the version cached responses are keyed by,
+        None to skip the cache.
+        '''
+        return get_request_data_version(request)
@@ -0,0 +1,73 @@
+'''
+Conditional GETs: answer If-None-Match / If-Modified-Since with a
+304 Not Modified before the queryset is serialized.
+'''
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+
+from drf_api.cache import get_normalized_url, get_request_data_version
+
+
+def make_etag(*parts):
+    '''
+    Returns a quoted strong ETag hashed from the given parts.
+    '''
+    value = ':'.join(str(part) for part in parts)
+    return '"%s"' % hashlib.md5(value.encode()).hexdigest()
+
+
+class ConditionalGetMixin:
+    '''
+    Adds ETag and Last-Modified validators to GET responses.
+    - Views implement get_validators(), returning an (etag, last_modified)
+      pair from a cheap query, or None to skip validation.
+    - Matching requests get a 304 without the view's queryset running.
+    - The browsable API is skipped, its pages change with the session.
+    '''
+    def get(self, request, *args, **kwargs):
+        validators = None
+        if request.accepted_renderer.format != 'api':
+            validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        # HTTP dates have whole seconds
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        if etag:
+            response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def get_validators(self, request, *args, **kwargs):
+        return None
+
+
+class DataVersionConditionalMixin(ConditionalGetMixin):
+    '''
+    ETags from the user's data version, which every change to their tasks
+    or categories bumps (including deletes), see drf_api/cache.py.
+    '''
+    def get_validators(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return None
+        version = get_request_data_version(request)
+        if version is None:
+            return None
+        etag = make_etag(
+            request.user.pk, version, get_normalized_url(request),
+            request.accepted_renderer.media_type,
+        )
+        return etag, None
+
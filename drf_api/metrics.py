@@ -0,0 +1,390 @@
+'''
+Per-view request metrics, served in the Prometheus text format.
+
+metrics_middleware times every request and records, under the name of
+the view it resolved to (eg. TaskListView) and its method:
+- a latency histogram and request counts by status class,
+- the number of queries and the time spent running them,
+- the time spent in serializers (see MetricsSerializerMixin),
+- the response size in bytes.
+Streamed responses are timed until their body starts, the queries
+reading it are not counted.
+`/metrics/` serves them with the response cache and connection pool
+counters, to staff users or with `Authorization: Bearer <METRICS['TOKEN']>`.
+
+The series are bounded: views and methods are fixed sets and statuses
+are grouped by class, endpoints beyond MAX_ENDPOINTS are recorded as
+"other". The time spent recording is itself counted in
+drf_metrics_overhead_seconds_total, see also `bench_metrics`.
+
+Metrics are kept per process: with several gunicorn workers each scrape
+reads the one that answers it.
+'''
+import asyncio
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+
+from . import cache
+from .postgres_pool import get_pool_stats
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TOKEN': '',
+    'MAX_ENDPOINTS': 200,
+}
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METHODS = {'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_request_stats = ContextVar('request_stats', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+class RequestStats:
+    '''
+    What one request spent on queries and serializers.
+    '''
+    __slots__ = ('queries', 'db_seconds', 'serializer_seconds', 'serializing')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializing = False
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.bytes = 0
+
+
+class Registry:
+    '''
+    Metrics of every endpoint, shared by all threads of the process.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+            self.overhead_seconds = 0.0
+
+    def get_endpoint(self, view, method):
+        '''
+        Called with the lock held.
+        '''
+        key = (view, method)
+        endpoint = self.endpoints.get(key)
+        if endpoint is None:
+            if len(self.endpoints) >= get_config()['MAX_ENDPOINTS']:
+                key = ('other', method)
+                endpoint = self.endpoints.get(key)
+            if endpoint is None:
+                endpoint = self.endpoints[key] = EndpointMetrics()
+        return endpoint
+
+    def observe(self, view, method, status, seconds, stats, size):
+        status_class = '%dxx' % (status // 100)
+        with self.lock:
+            endpoint = self.get_endpoint(view, method)
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    endpoint.buckets[index] += 1
+                    break
+            endpoint.count += 1
+            endpoint.seconds += seconds
+            endpoint.statuses[status_class] = (
+                endpoint.statuses.get(status_class, 0) + 1
+            )
+            endpoint.queries += stats.queries
+            endpoint.db_seconds += stats.db_seconds
+            endpoint.serializer_seconds += stats.serializer_seconds
+            endpoint.bytes += size
+
+    def add_bytes(self, view, method, size):
+        with self.lock:
+            self.get_endpoint(view, method).bytes += size
+
+    def add_overhead(self, seconds):
+        with self.lock:
+            self.overhead_seconds += seconds
+
+    def render(self):
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            lines = []
+            write_family(
+                lines, 'drf_request_duration_seconds', 'histogram',
+                'Request latency by view.',
+            )
+            for (view, method), endpoint in endpoints:
+                labels = format_labels(view=view, method=method)
+                cumulative = 0
+                for bound, count in zip(BUCKETS, endpoint.buckets):
+                    cumulative += count
+                    lines.append(
+                        'drf_request_duration_seconds_bucket{%s,le="%s"} %d'
+                        % (labels, bound, cumulative)
+                    )
+                lines.append(
+                    'drf_request_duration_seconds_bucket{%s,le="+Inf"} %d'
+                    % (labels, endpoint.count)
+                )
+                lines.append('drf_request_duration_seconds_sum{%s} %r'
+                             % (labels, endpoint.seconds))
+                lines.append('drf_request_duration_seconds_count{%s} %d'
+                             % (labels, endpoint.count))
+
+            write_family(
+                lines, 'drf_requests_total', 'counter',
+                'Requests by view and status class.',
+            )
+            for (view, method), endpoint in endpoints:
+                for status_class, count in sorted(endpoint.statuses.items()):
+                    lines.append('drf_requests_total{%s} %d' % (
+                        format_labels(
+                            view=view, method=method, status=status_class
+                        ),
+                        count,
+                    ))
+
+            for name, attribute, help_text in [
+                ('drf_db_queries_total', 'queries',
+                 'Database queries by view.'),
+                ('drf_db_query_seconds_total', 'db_seconds',
+                 'Time spent running queries by view.'),
+                ('drf_serializer_seconds_total', 'serializer_seconds',
+                 'Time spent in serializers by view.'),
+                ('drf_response_bytes_total', 'bytes',
+                 'Response body bytes by view.'),
+            ]:
+                write_family(lines, name, 'counter', help_text)
+                for (view, method), endpoint in endpoints:
+                    lines.append('%s{%s} %r' % (
+                        name, format_labels(view=view, method=method),
+                        getattr(endpoint, attribute),
+                    ))
+
+            write_family(
+                lines, 'drf_metrics_overhead_seconds_total', 'counter',
+                'Time spent recording these metrics.',
+            )
+            lines.append(
+                'drf_metrics_overhead_seconds_total %r' % self.overhead_seconds
+            )
+        return lines
+
+
+registry = Registry()
+
+
+def write_family(lines, name, kind, help_text):
+    lines.append('# HELP %s %s' % (name, help_text))
+    lines.append('# TYPE %s %s' % (name, kind))
+
+
+def format_labels(**labels):
+    return ','.join(
+        '%s="%s"' % (
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'),
+        )
+        for name, value in labels.items()
+    )
+
+
+def render_cache_and_pools():
+    '''
+    The response cache and connection pool counters.
+    '''
+    lines = []
+    cache_stats = cache.stats.as_dict()
+    for name, value in [
+        ('drf_response_cache_hits_total', cache_stats['hits']),
+        ('drf_response_cache_misses_total', cache_stats['misses']),
+    ]:
+        write_family(lines, name, 'counter', 'Cached list responses.')
+        lines.append('%s %d' % (name, value))
+
+    pools = get_pool_stats()
+    for key, kind in [
+        ('max_size', 'gauge'), ('size', 'gauge'), ('idle', 'gauge'),
+        ('in_use', 'gauge'), ('checkouts', 'counter'), ('waits', 'counter'),
+        ('wait_seconds', 'counter'), ('max_wait_seconds', 'gauge'),
+        ('timeouts', 'counter'), ('connects', 'counter'),
+        ('ping_failures', 'counter'), ('recycled', 'counter'),
+        ('discarded', 'counter'),
+    ]:
+        name = 'drf_db_pool_%s%s' % (key, '_total' if kind == 'counter' else '')
+        write_family(
+            lines, name, kind, 'Connection pool %s.' % key.replace('_', ' ')
+        )
+        for pool in pools:
+            lines.append('%s{%s} %r' % (
+                name, format_labels(database=pool['name']), pool[key]
+            ))
+    return lines
+
+
+def render():
+    return '\n'.join(registry.render() + render_cache_and_pools()) + '\n'
+
+
+@contextmanager
+def serializer_timer():
+    '''
+    Adds the time spent in the block to the request's serializer time.
+    Nested blocks (eg. nested serializers) are counted once.
+    '''
+    stats = _request_stats.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_seconds += time.perf_counter() - start
+        stats.serializing = False
+
+
+class MetricsSerializerMixin:
+    '''
+    Serializer mixin adding its to_representation() time to the
+    request's metrics.
+    '''
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+def add_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(add_query_recorder)
+# Connections opened before this module was imported
+for connection in connections.all():
+    add_query_recorder(None, connection)
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return getattr(match.func, '__name__', 'unknown')
+
+
+def count_bytes(content, view, method):
+    '''
+    Counts the bytes of a streamed response as they are sent.
+    '''
+    size = 0
+    for chunk in content:
+        size += len(chunk)
+        yield chunk
+    registry.add_bytes(view, method, size)
+
+
+def start_request():
+    if not get_config()['ENABLED']:
+        return None
+    start = time.perf_counter()
+    stats = RequestStats()
+    _request_stats.set(stats)
+    return stats, start, time.perf_counter() - start
+
+
+def finish_request(request, response, started):
+    if started is None:
+        return
+    stats, start, overhead = started
+    finished = time.perf_counter()
+    _request_stats.set(None)
+
+    view = get_view_name(request)
+    method = request.method if request.method in METHODS else 'other'
+    if response.streaming:
+        size = 0
+        response.streaming_content = count_bytes(
+            response.streaming_content, view, method
+        )
+    else:
+        size = len(response.content)
+    registry.observe(
+        view, method, response.status_code, finished - start, stats, size
+    )
+    registry.add_overhead(overhead + time.perf_counter() - finished)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = start_request()
+            response = await get_response(request)
+            finish_request(request, response, started)
+            return response
+    else:
+        def middleware(request):
+            started = start_request()
+            response = get_response(request)
+            finish_request(request, response, started)
+            return response
+    return middleware
+
+
+def is_scraper(request):
+    token = get_config()['TOKEN']
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if hmac.compare_digest(header.encode(), ('Bearer ' + token).encode()):
+            return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+def metrics_view(request):
+    '''
+    Serves the metrics of this process in the Prometheus text format.
+    '''
+    if not is_scraper(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
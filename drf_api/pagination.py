@@ -0,0 +1,300 @@
+import json
+import operator
+from collections import OrderedDict
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from rest_framework import exceptions
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import SearchFilter
+from rest_framework.pagination import (
+    Cursor, CursorPagination, PageNumberPagination,
+)
+from rest_framework.settings import api_settings
+
+
+class KeysetPagination(CursorPagination):
+    '''
+    Keyset (seek) pagination over the requested ordering plus the primary key.
+    - Each page is fetched with a WHERE clause on the last row seen instead
+      of an OFFSET, and no COUNT(*) is run, so page 500 costs the same
+      as page 1.
+    - Honours the view's OrderingFilter (`?ordering=`); the primary key is
+      always appended as a tie-breaker so the ordering is total.
+    - Null values (eg. `due_date`) always sort after non-null values.
+    - A `?search=` ranked by relevance is rejected with a 400 unless
+      `?ordering=` is given, see check_not_ranked().
+    '''
+    ordering = ('-created_at',)
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.check_not_ranked(request, view)
+        self.base_url = request.build_absolute_uri()
+        self.keys = self.get_keys(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+        self.position = (
+            self.decode_position(self.cursor.position)
+            if self.cursor else None
+        )
+
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+        if self.position is not None:
+            try:
+                queryset = queryset.filter(
+                    self.get_seek_filter(self.position, reverse)
+                )
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # Fetch one extra row to find out if there is a following page
+        results = list(queryset[:self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.position is not None
+        return self.page
+
+    def check_not_ranked(self, request, view):
+        '''
+        Searches without `?ordering=` come best match first. The rank is
+        not a column and changes as other rows do, so there is nothing to
+        seek on, and paging by the default ordering would drop the rank.
+        '''
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return
+        for backend in getattr(view, 'filter_backends', []):
+            if (
+                issubclass(backend, SearchFilter)
+                and backend().get_search_terms(request)
+            ):
+                raise exceptions.ValidationError({
+                    self.cursor_query_param: [
+                        'Searches are ranked by relevance and paginated '
+                        'by page number. Add `?ordering=` for cursor pages.'
+                    ],
+                })
+
+    def get_keys(self, request, queryset, view):
+        '''
+        Returns the ordering as (field name, descending) pairs,
+        always ending with the primary key.
+        Orderings across relations are dropped, they cannot be seeked on.
+        '''
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        ordering = ordering or self.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+
+        opts = queryset.model._meta
+        keys = []
+        self.nullable = {}
+        for field in ordering:
+            name = field.lstrip('-')
+            if name == 'pk':
+                name = opts.pk.name
+            try:
+                model_field = opts.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if not model_field.concrete or model_field.many_to_many:
+                continue
+            # Seek on the raw column, eg. `category_id` not `category`
+            name = model_field.attname
+            keys.append((name, field.startswith('-')))
+            self.nullable[name] = model_field.null
+            # Nothing after a unique key can change the ordering
+            if model_field.primary_key:
+                return keys
+
+        keys.append((opts.pk.name, keys[0][1] if keys else False))
+        self.nullable[opts.pk.name] = False
+        return keys
+
+    def get_order_by(self, reverse):
+        '''
+        Order by every key, nulls last when walking forwards.
+        '''
+        order_by = []
+        for name, descending in self.keys:
+            expression = F(name).desc if descending != reverse else F(name).asc
+            if not self.nullable[name]:
+                order_by.append(expression())
+            elif reverse:
+                order_by.append(expression(nulls_first=True))
+            else:
+                order_by.append(expression(nulls_last=True))
+        return order_by
+
+    def get_seek_filter(self, position, reverse):
+        '''
+        Matches the rows strictly after `position` in the direction of travel,
+        ie. (a, b, id) > (x, y, z) expanded for databases without row values.
+        '''
+        clauses = []
+        equal = Q()
+        for (name, descending), value in zip(self.keys, position):
+            beyond = self.get_beyond_filter(name, descending, value, reverse)
+            if beyond is not None:
+                clauses.append(equal & beyond)
+            if value is None:
+                equal &= Q(**{name + '__isnull': True})
+            else:
+                equal &= Q(**{name: value})
+        return reduce(operator.or_, clauses, Q(pk__in=[]))
+
+    def get_beyond_filter(self, name, descending, value, reverse):
+        '''
+        Matches rows where a single key is strictly past `value`.
+        '''
+        lookup = 'lt' if descending != reverse else 'gt'
+        nullable = self.nullable[name]
+
+        if value is None:
+            # Nulls come last going forwards, first going backwards
+            if reverse:
+                return Q(**{name + '__isnull': False})
+            return None
+
+        beyond = Q(**{'%s__%s' % (name, lookup): value})
+        if nullable and not reverse:
+            beyond |= Q(**{name + '__isnull': True})
+        return beyond
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self.get_position(self.page[-1])
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=position)
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self.get_position(self.page[0])
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=position)
+        )
+
+    def get_position(self, item):
+        '''
+        Encodes the key values of a row (model instance, dict or named tuple).
+        '''
+        values = []
+        for name, _ in self.keys:
+            value = item[name] if isinstance(item, dict) else getattr(item, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        return json.dumps(values, separators=(',', ':'))
+
+    def decode_position(self, position):
+        if position is None:
+            return None
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor from a different ?ordering= has a different shape
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+
+class PageOrCursorPagination(PageNumberPagination):
+    '''
+    Page number pagination for existing clients, keyset pagination on request.
+    - `?pagination=cursor` returns the first keyset page.
+    - The `next`/`previous` links of a keyset page carry a `?cursor=`
+      which keeps the client in keyset mode.
+    '''
+    mode_query_param = 'pagination'
+    cursor_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def use_cursor(self, request):
+        params = request.query_params
+        return (
+            params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_pagination_class.cursor_query_param in params
+        )
+
+    def paginate_queryset_lazily(self, queryset, request, view=None):
+        '''
+        Returns the page number mode page as an unevaluated queryset,
+        and the rest of the paginated response, for streaming.
+        Returns None in keyset mode, whose pages are small anyway.
+        '''
+        if self.use_cursor(request):
+            return None
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.request = request
+        envelope = OrderedDict([
+            ('count', self.page.paginator.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        return envelope, self.page.object_list
+
+    def get_key_columns(self, queryset, request, view=None):
+        '''
+        Returns the columns a keyset page reads from its rows,
+        none in page number mode.
+        '''
+        if not self.use_cursor(request):
+            return []
+        keys = self.cursor_pagination_class().get_keys(
+            request, queryset, view
+        )
+        return [name for name, _ in keys]
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
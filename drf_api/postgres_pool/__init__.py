@@ -0,0 +1,264 @@
+'''
+Pooled PostgreSQL connections.
+
+Django 3.2 connects to the database at the first query of a request and
+closes the connection when the request ends (CONN_MAX_AGE = 0), so every
+request pays for a connect, TLS handshake and authentication. With
+ENGINE 'drf_api.postgres_pool' (see DATABASES in settings.py) closing
+returns the connection to a pool of the process instead, and the next
+request checks it out again:
+- At most MAX_SIZE connections per process, a checkout waits up to
+  TIMEOUT seconds for one to be returned.
+- Idle connections are pinged before being handed out (PRE_PING), those
+  left unused for MAX_IDLE seconds or open for MAX_LIFETIME seconds
+  are closed.
+- A connection returned inside a transaction is rolled back, a broken
+  one is closed.
+- Counters of checkouts and waits are kept for monitoring, see
+  get_pool_stats().
+
+Keep CONN_MAX_AGE at 0, the pool is what keeps connections open.
+'''
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULTS = {
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_IDLE': 300,
+    'MAX_LIFETIME': 3600,
+    'PRE_PING': True,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    '''
+    A connection with the times the pool recycles it by.
+    '''
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+class ConnectionPool:
+    '''
+    Thread safe pool of database connections.
+    - `connect()` opens a new connection.
+    - `ping(connection)` raises if the connection is unusable.
+    - `reset(connection)` rolls back, raises if it cannot.
+    '''
+    def __init__(self, connect, ping, reset, config, name=''):
+        self.connect = connect
+        self.ping = ping
+        self.reset = reset
+        self.config = {**DEFAULTS, **config}
+        self.name = name
+        self.idle = deque()
+        self.in_use = {}
+        self.size = 0
+        self.condition = threading.Condition()
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'timeouts': 0,
+            'connects': 0,
+            'ping_failures': 0,
+            'recycled': 0,
+            'discarded': 0,
+        }
+
+    def checkout(self):
+        '''
+        Returns an idle or new connection,
+        raises PoolTimeout if none is free within TIMEOUT seconds.
+        '''
+        started = time.monotonic()
+        deadline = started + self.config['TIMEOUT']
+        waited = False
+        while True:
+            with self.condition:
+                self.recycle_idle()
+                while not self.idle and self.size >= self.config['MAX_SIZE']:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            'No connection free in pool %s after %ss'
+                            % (self.name, self.config['TIMEOUT'])
+                        )
+                    waited = True
+                    self.condition.wait(remaining)
+                    self.recycle_idle()
+                pooled = self.idle.pop() if self.idle else None
+                if pooled is None:
+                    self.size += 1
+
+            if pooled is None:
+                pooled = self.open()
+            elif not self.is_alive(pooled):
+                continue
+            return self.checked_out(pooled, started, waited)
+
+    def open(self):
+        try:
+            pooled = PooledConnection(self.connect())
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.stats['connects'] += 1
+        return pooled
+
+    def is_alive(self, pooled):
+        '''
+        Pings an idle connection, closing it if it fails.
+        '''
+        if not self.config['PRE_PING']:
+            return True
+        try:
+            self.ping(pooled.connection)
+        except Exception:
+            with self.condition:
+                self.stats['ping_failures'] += 1
+            self.discard(pooled)
+            return False
+        return True
+
+    def checked_out(self, pooled, started, waited):
+        wait = time.monotonic() - started
+        with self.condition:
+            self.in_use[id(pooled.connection)] = pooled
+            self.stats['checkouts'] += 1
+            if waited:
+                self.stats['waits'] += 1
+            self.stats['wait_seconds'] += wait
+            self.stats['max_wait_seconds'] = max(
+                self.stats['max_wait_seconds'], wait
+            )
+        return pooled.connection
+
+    def release(self, connection, reuse=True):
+        '''
+        Returns a connection to the pool, or closes it if it is broken,
+        too old or `reuse` is False.
+        '''
+        with self.condition:
+            pooled = self.in_use.pop(id(connection), None)
+        if pooled is None:
+            connection.close()
+            return
+        if not reuse:
+            self.discard(pooled)
+            return
+        try:
+            self.reset(connection)
+        except Exception:
+            self.discard(pooled)
+            return
+        now = time.monotonic()
+        if now - pooled.created_at >= self.config['MAX_LIFETIME']:
+            with self.condition:
+                self.stats['recycled'] += 1
+            self.discard(pooled)
+            return
+        pooled.released_at = now
+        with self.condition:
+            self.idle.append(pooled)
+            self.condition.notify()
+
+    def discard(self, pooled):
+        with self.condition:
+            self.size -= 1
+            self.stats['discarded'] += 1
+            self.condition.notify()
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def recycle_idle(self):
+        '''
+        Closes idle connections past MAX_IDLE or MAX_LIFETIME.
+        Checkouts take the most recently returned connection, so with
+        less traffic the surplus ones go idle and are closed.
+        Called with the condition held.
+        '''
+        now = time.monotonic()
+        kept = deque()
+        while self.idle:
+            pooled = self.idle.popleft()
+            if (
+                now - pooled.released_at >= self.config['MAX_IDLE']
+                or now - pooled.created_at >= self.config['MAX_LIFETIME']
+            ):
+                self.size -= 1
+                self.stats['recycled'] += 1
+                self.condition.notify()
+                try:
+                    pooled.connection.close()
+                except Exception:
+                    pass
+            else:
+                kept.append(pooled)
+        self.idle = kept
+
+    def close_idle(self):
+        with self.condition:
+            idle, self.idle = self.idle, deque()
+            self.size -= len(idle)
+            self.condition.notify_all()
+        for pooled in idle:
+            pooled.connection.close()
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                'name': self.name,
+                'max_size': self.config['MAX_SIZE'],
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': len(self.in_use),
+                **self.stats,
+            }
+
+
+def get_pool(key, name, connect, ping, reset, config):
+    '''
+    Returns the pool of this process for `key`, creating it if needed.
+    A forked worker does not reuse its parent's connections.
+    '''
+    pid = os.getpid()
+    with _pools_lock:
+        pool = _pools.get((pid, key))
+        if pool is None:
+            pool = _pools[(pid, key)] = ConnectionPool(
+                connect, ping, reset, config, name
+            )
+        return pool
+
+
+def get_pools():
+    pid = os.getpid()
+    with _pools_lock:
+        return [pool for (owner, key), pool in _pools.items() if owner == pid]
+
+
+def get_pool_stats():
+    '''
+    Returns the size and counters of every pool of this process.
+    '''
+    return [pool.get_stats() for pool in get_pools()]
@@ -0,0 +1,95 @@
+'''
+PostgreSQL backend checking connections out of a ConnectionPool,
+configured by the `POOL` dict of the database settings.
+'''
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from django.db.backends.postgresql import base, creation
+
+from . import PoolTimeout, get_pool, get_pools
+
+
+def connect(conn_params, isolation_level):
+    '''
+    Opens a connection the way the postgresql backend does.
+    '''
+    connection = psycopg2.connect(**conn_params)
+    if (
+        isolation_level is not None
+        and isolation_level != connection.isolation_level
+    ):
+        connection.set_session(isolation_level=isolation_level)
+    # See base.DatabaseWrapper.get_new_connection()
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection, loads=lambda x: x
+    )
+    return connection
+
+
+def ping(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    if not connection.autocommit:
+        connection.rollback()
+
+
+def reset(connection):
+    '''
+    Leaves the connection outside of any transaction,
+    raises if it is broken.
+    '''
+    if connection.closed:
+        raise psycopg2.InterfaceError('connection already closed')
+    status = connection.get_transaction_status()
+    if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+        raise psycopg2.InterfaceError('connection is broken')
+    if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database in use
+        for pool in get_pools():
+            if pool.name == test_database_name:
+                pool.close_idle()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict['OPTIONS']
+        isolation_level = options.get('isolation_level')
+        return get_pool(
+            key=repr(sorted(conn_params.items())),
+            name=conn_params.get('database', ''),
+            connect=lambda: connect(conn_params, isolation_level),
+            ping=ping,
+            reset=reset,
+            config=self.settings_dict.get('POOL', {}),
+        )
+
+    @base.async_unsafe
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool(conn_params)
+        try:
+            connection = pool.checkout()
+        except PoolTimeout as error:
+            raise base.Database.OperationalError(str(error)) from error
+        self.pool = pool
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # Closed inside atomic(), the wrapper keeps the connection
+                # until the block exits: it must not be handed out meanwhile
+                self.pool.release(
+                    self.connection, reuse=not self.in_atomic_block
+                )
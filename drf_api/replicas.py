@@ -0,0 +1,193 @@
+'''
+Reads from database replicas.
+
+Views with ReplicaReadMixin run the queries of their GETs on one of
+REPLICA_ROUTER['REPLICAS'], everything else stays on `default`:
+- Writes always go to `default`. After a write in a request, its later
+  reads go there too.
+- A successful write sets a cookie pinning the client's reads to
+  `default` for PIN_SECONDS, so they see their own changes.
+- Each replica's lag is checked at most every CHECK_INTERVAL seconds
+  per process. Replicas behind by more than MAX_LAG seconds, or that
+  cannot be reached, are skipped until the next check, and reads fall
+  back to `default` when none is left. Keep MAX_LAG below PIN_SECONDS.
+'''
+import asyncio
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'REPLICAS': [],
+    'PIN_SECONDS': 10,
+    'PIN_COOKIE': 'db-pin',
+    'MAX_LAG': 5,
+    'CHECK_INTERVAL': 5,
+    # Read from `default` only, sessions are read right after login
+    'PRIMARY_APPS': ['sessions'],
+}
+
+# How far a Postgres standby's replay is behind, 0 on a primary or
+# when it has replayed all it received
+POSTGRES_LAG_SQL = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+_read_alias = ContextVar('read_alias', default=None)
+# alias: (checked at, usable)
+_health = {}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'REPLICA_ROUTER', {})}
+
+
+def get_lag(alias):
+    '''
+    Returns how many seconds the replica is behind.
+    Replicas other than Postgres (eg. SQLite stand-ins) never are.
+    '''
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        connection.ensure_connection()
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+def is_usable(alias, config):
+    now = time.monotonic()
+    checked_at, usable = _health.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < config['CHECK_INTERVAL']:
+        return usable
+
+    try:
+        lag = get_lag(alias)
+    except DatabaseError:
+        logger.warning('Replica %s is unreachable', alias, exc_info=True)
+        usable = False
+    else:
+        usable = lag <= config['MAX_LAG']
+        if not usable:
+            logger.warning('Replica %s is %.1fs behind', alias, lag)
+    _health[alias] = (now, usable)
+    return usable
+
+
+def is_pinned(request, config):
+    try:
+        return float(request.COOKIES[config['PIN_COOKIE']]) > time.time()
+    except (KeyError, ValueError):
+        return False
+
+
+def choose_replica(request):
+    '''
+    Returns the replica to read from for this request,
+    None to read from `default`.
+    '''
+    config = get_config()
+    if (
+        not config['REPLICAS']
+        or request.method not in SAFE_METHODS
+        or is_pinned(request, config)
+    ):
+        return None
+    replicas = list(config['REPLICAS'])
+    random.shuffle(replicas)
+    for alias in replicas:
+        if is_usable(alias, config):
+            return alias
+    return None
+
+
+class ReplicaRouter:
+    '''
+    Sends reads to the replica chosen for the current view, if any,
+    and every write to `default`.
+    '''
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or (
+            model._meta.app_label in get_config()['PRIMARY_APPS']
+        ):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Read what was just written from where it was written
+        _read_alias.set(None)
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            if instance._state.db not in get_config()['REPLICAS']:
+                # Like Django's default, eg. when migrating another alias
+                return instance._state.db
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as default
+        aliases = {DEFAULT_DB_ALIAS, *get_config()['REPLICAS']}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    '''
+    View mixin running the queries of GETs on a replica,
+    see choose_replica().
+    '''
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(choose_replica(request))
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+
+def pin_reads(request, response):
+    '''
+    Pins the reads of a client that just wrote to `default`.
+    '''
+    config = get_config()
+    if (
+        config['REPLICAS']
+        and request.method not in SAFE_METHODS
+        and response.status_code < 400
+    ):
+        response.set_cookie(
+            config['PIN_COOKIE'],
+            str(time.time() + config['PIN_SECONDS']),
+            max_age=config['PIN_SECONDS'],
+            httponly=True,
+            secure=settings.JWT_AUTH_SECURE,
+            samesite=settings.JWT_AUTH_SAMESITE,
+        )
+
+
+@sync_and_async_middleware
+def replica_pin_middleware(get_response):
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = await get_response(request)
+            pin_reads(request, response)
+            return response
+    else:
+        def middleware(request):
+            response = get_response(request)
+            pin_reads(request, response)
+            return response
+    return middleware
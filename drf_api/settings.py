@@ -25,20 +25,77 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [(
         'rest_framework.authentication.SessionAuthentication'
         if 'DEV' in os.environ
-        else 'dj_rest_auth.jwt_auth.JWTCookieAuthentication'
+        else 'drf_api.authentication.CachedJWTCookieAuthentication'
     )],
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10000,
     'DATE_FORMAT': '%d %b %Y',
     'DATETIME_FORMAT': '%d %b %Y',
+    # orjson backed when it is installed, see drf_api/renderers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'drf_api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'drf_api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 if 'DEV' not in os.environ:
     REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
-        'rest_framework.renderers.JSONRenderer',
+        'drf_api.renderers.FastJSONRenderer',
     ]
 
+# Serve task list GETs from values_list() rows instead of model instances
+TASKS_FAST_READ = True
+
+# Purge deleted accounts in a background thread, see profiles/purge.py
+ACCOUNT_PURGE_IN_BACKGROUND = True
+
+# Per-user cache of task and category list responses, see drf_api/cache.py.
+# Bounded to about 64MB per process, pages over MAX_ROWS rows are not cached.
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'BACKEND': 'drf_api.cache.LRUBackend',
+    'OPTIONS': {'max_entries': 1024, 'max_bytes': 64 * 1024 * 1024},
+    'MAX_ROWS': 1000,
+}
+
+# Per-view request metrics served on /metrics/ to staff users, or with
+# an `Authorization: Bearer <METRICS_TOKEN>` header, see drf_api/metrics.py
+METRICS = {
+    'ENABLED': True,
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),
+    'MAX_ENDPOINTS': 200,
+}
+
+# Async views under ASGI, see drf_api/async_views.py.
+# drf_api/asgi.py turns them on, WSGI keeps the sync views
+ASYNC_VIEWS = {
+    'ENABLED': os.environ.get('ASYNC_VIEWS') == '1',
+    'MAX_WORKERS': int(os.environ.get('ASYNC_VIEW_WORKERS', 10)),
+}
+
+# Days tombstones of deleted tasks are kept for /tasks/changes/, older
+# sync cursors must start over, see tasks/sync.py
+TASK_SYNC = {
+    'TOMBSTONE_RETENTION_DAYS': int(
+        os.environ.get('TOMBSTONE_RETENTION_DAYS', 30)
+    ),
+}
+
+# Seconds JWT-authenticated users stay cached in the CACHES alias, only
+# used when that cache is shared by all workers (not LocMemCache, the
+# default without CACHES), see drf_api/authentication.py
+AUTH_USER_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
 REST_USE_JWT = True
 JWT_AUTH_SECURE = True
 JWT_AUTH_COOKIE = 'my-app-auth'
@@ -93,6 +150,7 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    'drf_api.metrics.metrics_middleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -101,6 +159,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'drf_api.replicas.replica_pin_middleware',
 ]
 
 if "CLIENT_ORIGIN" in os.environ:
@@ -156,12 +215,63 @@ if 'DEV' in os.environ:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
-        }
+        },
+        # A stand-in replica, eg. a copy of db.sqlite3, read from with
+        # DEV_REPLICA=1, see drf_api/replicas.py
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db-replica.sqlite3',
+        },
     }
+    DATABASE_REPLICAS = ['replica'] if 'DEV_REPLICA' in os.environ else []
 else:
     DATABASES = {
         'default': dj_database_url.parse(os.environ.get("DATABASE_URL"))
     }
+    # Pooled Postgres connections, see drf_api/postgres_pool.
+    # The sizes are per process: MAX_SIZE * gunicorn workers must stay
+    # below the server's max_connections
+    if (
+        os.environ.get('DB_POOL', '1') == '1'
+        and 'postgresql' in DATABASES['default']['ENGINE']
+    ):
+        DATABASES['default']['ENGINE'] = 'drf_api.postgres_pool'
+        DATABASES['default']['POOL'] = {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'MAX_LIFETIME': float(
+                os.environ.get('DB_POOL_MAX_LIFETIME', 3600)
+            ),
+            'PRE_PING': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+        }
+    # Read replicas, comma separated URLs, see drf_api/replicas.py
+    DATABASE_REPLICAS = []
+    for number, url in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')),
+        start=1,
+    ):
+        alias = f'replica{number}'
+        DATABASES[alias] = {
+            **dj_database_url.parse(url),
+            'ENGINE': DATABASES['default']['ENGINE'],
+            'TEST': {'MIRROR': 'default'},
+        }
+        if 'POOL' in DATABASES['default']:
+            DATABASES[alias]['POOL'] = DATABASES['default']['POOL']
+        DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['drf_api.replicas.ReplicaRouter']
+
+# Seconds a client reads from the primary after writing, and the
+# replica lag (checked every CHECK_INTERVAL) beyond which a replica
+# is skipped
+REPLICA_ROUTER = {
+    'REPLICAS': DATABASE_REPLICAS,
+    'PIN_SECONDS': int(os.environ.get('REPLICA_PIN_SECONDS', 10)),
+    'MAX_LAG': float(os.environ.get('REPLICA_MAX_LAG', 5)),
+    'CHECK_INTERVAL': float(os.environ.get('REPLICA_CHECK_INTERVAL', 5)),
+}
 
 
 # Password validation
@@ -0,0 +1,95 @@
+'''
+Sparse fieldsets for GETs: `?fields=id,title,status` returns only those
+fields, `?omit=description` returns all but those.
+
+Serializers with SparseFieldsMixin drop the fields that were not asked
+for. Views narrow their queryset to the columns and joins the remaining
+fields read with sparse_queryset(), so the payload and what is read from
+the database shrink together.
+'''
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def split_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def get_sparse_fields(request, available):
+    '''
+    Returns the fields of `available` the request asks for, in their
+    usual order, or None when it asks for all of them.
+    Raises ValidationError for unknown field names.
+    '''
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    if FIELDS_PARAM not in params and OMIT_PARAM not in params:
+        return None
+
+    wanted = split_names(params.get(FIELDS_PARAM, '')) or list(available)
+    omitted = split_names(params.get(OMIT_PARAM, ''))
+    for param, names in [(FIELDS_PARAM, wanted), (OMIT_PARAM, omitted)]:
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ValidationError({param: [
+                'Unknown fields: %s.' % ', '.join(unknown)
+            ]})
+    return [
+        name for name in available
+        if name in wanted and name not in omitted
+    ]
+
+
+def narrow_queryset(queryset, paths):
+    '''
+    Loads only the model fields in `paths` (eg. 'title', 'owner__username'),
+    joining only the relations they go through.
+    '''
+    relations = {path.rsplit('__', 1)[0] for path in paths if '__' in path}
+    queryset = queryset.select_related(None)
+    if relations:
+        queryset = queryset.select_related(*relations)
+    return queryset.only(
+        queryset.model._meta.pk.name, *set(paths) | relations
+    )
+
+
+def sparse_queryset(queryset, request, serializer_class):
+    '''
+    Narrows the queryset to what the fields asked for read.
+    '''
+    fields = get_sparse_fields(request, serializer_class.Meta.fields)
+    if fields is None:
+        return queryset
+    return narrow_queryset(
+        queryset, serializer_class.get_sparse_sources(fields)
+    )
+
+
+class SparseFieldsMixin:
+    '''
+    Serializer mixin dropping the fields a GET did not ask for.
+    - `sparse_sources` maps a field to the model fields it reads;
+      fields that are not listed read the model field of their name.
+    '''
+    sparse_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = get_sparse_fields(
+            self.context.get('request'), self.Meta.fields
+        )
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_sparse_sources(cls, fields):
+        return [
+            source for field in fields
+            for source in cls.sparse_sources.get(field, [field])
+        ]
@@ -0,0 +1,67 @@
+'''
+Streamed JSON for large list responses.
+
+With `?stream=true` a list view writes the same JSON as usual, one chunk
+of rows at a time from queryset.iterator(), instead of holding the rows,
+their serialized dicts and the rendered body in memory all at once.
+- Only JSON is streamed, the browsable API renders as usual.
+- Streamed responses are not cached (see drf_api/cache.py).
+- The status line is sent before the rows are read, a database error
+  midway truncates the body instead of turning it into a 500.
+'''
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+STREAM_QUERY_PARAM = 'stream'
+CHUNK_SIZE = 1000
+
+
+def wants_stream(request):
+    '''
+    True when a streamed JSON response was asked for.
+    '''
+    return (
+        request.query_params.get(STREAM_QUERY_PARAM) in ('1', 'true')
+        and isinstance(request.accepted_renderer, JSONRenderer)
+    )
+
+
+def iter_json(envelope, rows, serialize, renderer, chunk_size=CHUNK_SIZE):
+    '''
+    Yields `envelope` as JSON with the serialized rows as its `results`.
+    - `serialize` turns a list of rows into a list of dicts.
+    - Each chunk is rendered by the compact JSON `renderer`, so the output
+      is byte for byte what rendering the whole list would give.
+    '''
+    empty = renderer.render({**envelope, 'results': []})
+    # `results` is the last key, the rows go between its brackets
+    head, tail = empty[:-2], empty[-2:]
+
+    yield head
+    rows = iter(rows)
+    separator = b''
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield separator + renderer.render(serialize(chunk))[1:-1]
+        separator = b','
+    yield tail
+
+
+def streaming_response(
+    envelope, queryset, serialize, renderer, chunk_size=CHUNK_SIZE
+):
+    '''
+    Streams a paginated list, reading the queryset in chunks.
+    The rows are read after the view has returned, so the queryset is
+    bound now to the database it is routed to, eg. the replica chosen
+    for the request (see drf_api/replicas.py).
+    '''
+    rows = queryset.using(queryset.db).iterator(chunk_size=chunk_size)
+    return StreamingHttpResponse(
+        iter_json(envelope, rows, serialize, renderer, chunk_size),
+        content_type='application/json',
+    )
@@ -0,0 +1,500 @@
+from rest_framework.test import APITestCase
+from asgiref.sync import async_to_sync
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import (
+    AsyncRequestFactory, TestCase, TransactionTestCase, override_settings,
+)
+from django.core.exceptions import ImproperlyConfigured
+from django.http import StreamingHttpResponse
+from categories.models import Category
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+from tasks.views import TaskListView, TaskDetailView
+from . import metrics, replicas
+from .async_views import ASGIHandler, STREAM_BUFFER, async_view
+from .parsers import FastJSONParser
+from .postgres_pool import ConnectionPool, PoolTimeout
+from .renderers import FastJSONRenderer
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
+import asyncio
+import json
+import threading
+import time
+import uuid
+from unittest import mock
+
+
+class FastJSONTests(TestCase):
+    '''
+    Tests that the orjson renderer and parser behave exactly like
+    DRF's JSONRenderer and JSONParser.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        category = Category.objects.create(owner=self.user, name="Wörk")
+        Task.objects.create(
+            owner=self.user,
+            title="Quotes \" and \\ and \u2028\u2029 and \x01",
+            description="Line one\nline two 😀",
+            category=category,
+            due_date=date(2024, 2, 15),
+        )
+        Task.objects.create(owner=self.user, title="Bare")
+
+    def assertSameJSON(self, data, accepted_media_type=None):
+        expected = JSONRenderer().render(data, accepted_media_type)
+        actual = FastJSONRenderer().render(data, accepted_media_type)
+        self.assertEqual(actual, expected)
+
+    def test_task_payloads_match(self):
+        tasks = Task.objects.select_related('owner', 'category')
+        self.assertSameJSON(TaskSerializer(tasks, many=True).data)
+        self.assertSameJSON(
+            TaskSerializer(tasks, many=True).data,
+            'application/json; indent=4',
+        )
+
+    def test_other_types_match(self):
+        moment = datetime(2024, 2, 15, 9, 30, 1, 123456, tzinfo=timezone.utc)
+        self.assertSameJSON({
+            'datetime': moment,
+            'naive': moment.replace(tzinfo=None),
+            'date': moment.date(),
+            'time': moment.time(),
+            'timedelta': timedelta(days=1, seconds=5),
+            'decimals': [Decimal('1.10'), Decimal('1e20'), Decimal('-0.5')],
+            'uuid': uuid.UUID(int=1),
+            'floats': [1.0, 0.1, 2.5e-3],
+            'big': 2 ** 70,
+            'tuple': (1, 'two'),
+            'set': {3},
+            'int_keys': {1: 'one'},
+            'lazy': gettext_lazy('Not found.'),
+            'none': None,
+        })
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    @mock.patch('drf_api.parsers.orjson', None)
+    @mock.patch('drf_api.renderers.orjson', None)
+    def test_works_without_orjson(self):
+        self.assertSameJSON({'date': date(2024, 2, 15), 'title': 'Bare'})
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(b'{"title": "Bare"}')),
+            {'title': 'Bare'},
+        )
+
+    def test_parser_matches(self):
+        parser, fallback = FastJSONParser(), JSONParser()
+        for body in [
+            '{"title": "Wörk \\u2028", "ids": [1, 2.5, true, null]}',
+            '{"big": 123456789012345678901234567890}',
+            '{"lone": "\\ud800"}',
+        ]:
+            body = body.encode()
+            self.assertEqual(
+                parser.parse(BytesIO(body)), fallback.parse(BytesIO(body))
+            )
+        for body in [b'{"title": NaN}', b'{"title": ', b'\xef\xbb\xbf{}']:
+            with self.assertRaises(ParseError) as expected:
+                fallback.parse(BytesIO(body))
+            with self.assertRaises(ParseError) as actual:
+                parser.parse(BytesIO(body))
+            self.assertEqual(
+                str(actual.exception), str(expected.exception)
+            )
+
+
+class ConnectionPoolTests(TestCase):
+    '''
+    Tests checkout, recycling and bounds of the Postgres connection pool,
+    on stand-in connections.
+    '''
+
+    class Connection:
+        def __init__(self):
+            self.closed = False
+            self.healthy = True
+
+        def close(self):
+            self.closed = True
+
+    def make_pool(self, **config):
+        def ping(connection):
+            if not connection.healthy:
+                raise Exception('server closed the connection')
+        return ConnectionPool(
+            connect=self.Connection, ping=ping,
+            reset=lambda connection: None, config=config, name='test',
+        )
+
+    def test_reuses_returned_connection(self):
+        pool = self.make_pool()
+        first = pool.checkout()
+        pool.release(first)
+        self.assertIs(pool.checkout(), first)
+        stats = pool.get_stats()
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_replaces_connection_failing_ping(self):
+        pool = self.make_pool()
+        first = pool.checkout()
+        pool.release(first)
+        first.healthy = False
+        second = pool.checkout()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.get_stats()['ping_failures'], 1)
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+    def test_closes_idle_connections(self):
+        pool = self.make_pool(MAX_IDLE=60)
+        first = pool.checkout()
+        pool.release(first)
+        with mock.patch(
+            'drf_api.postgres_pool.time.monotonic',
+            return_value=time.monotonic() + 61,
+        ):
+            second = pool.checkout()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.get_stats()['recycled'], 1)
+
+    def test_closes_connection_returned_in_atomic_block(self):
+        pool = self.make_pool()
+        first = pool.checkout()
+        pool.release(first, reuse=False)
+        self.assertTrue(first.closed)
+        self.assertIsNot(pool.checkout(), first)
+
+    def test_waits_for_a_free_connection(self):
+        pool = self.make_pool(MAX_SIZE=1, TIMEOUT=5)
+        first = pool.checkout()
+        threading.Timer(0.05, pool.release, [first]).start()
+        self.assertIs(pool.checkout(), first)
+        stats = pool.get_stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_seconds'], 0)
+
+    def test_times_out_when_full(self):
+        pool = self.make_pool(MAX_SIZE=1, TIMEOUT=0.01)
+        pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        self.assertEqual(pool.get_stats()['timeouts'], 1)
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class AsyncViewTests(TransactionTestCase):
+    '''
+    Tests that the async task views answer like the sync ones,
+    from the executor threads.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.task = Task.objects.create(owner=self.user, title="Async task")
+
+    def get(self, view, path, **kwargs):
+        request = AsyncRequestFactory().get(
+            path, HTTP_ACCEPT='application/json'
+        )
+        request.user = self.user
+        request._dont_enforce_csrf_checks = True
+        if not asyncio.iscoroutinefunction(view):
+            return view(request, **kwargs)
+        return async_to_sync(view)(request, **kwargs)
+
+    def test_list_matches_sync_view(self):
+        view = TaskListView.as_view()
+        response = self.get(async_view(view, force=True), '/tasks/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_rendered)
+        self.assertEqual(
+            json.loads(response.content),
+            json.loads(self.get(view, '/tasks/').render().content)
+        )
+
+    def test_detail(self):
+        view = async_view(TaskDetailView.as_view(), force=True)
+        response = self.get(
+            view, f'/tasks/{self.task.id}/', pk=self.task.id
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['title'], "Async task")
+
+    def test_runs_in_executor(self):
+        threads = []
+
+        def view(request):
+            threads.append(threading.current_thread().name)
+            return TaskListView.as_view()(request)
+        self.get(async_view(view, force=True), '/tasks/')
+        self.assertTrue(threads[0].startswith('async-views'))
+
+    def send(self, response):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+        async_to_sync(ASGIHandler().send_response)(response, send)
+        return messages
+
+    def test_streamed_list_is_sent_from_executor(self):
+        view = async_view(TaskListView.as_view(), force=True)
+        response = self.get(view, '/tasks/?stream=true')
+        messages = self.send(response)
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        self.assertNotIn('more_body', messages[-1])
+        body = b''.join(message.get('body', b'') for message in messages)
+        self.assertEqual(json.loads(body)['count'], 1)
+
+    def test_stream_is_read_ahead_by_buffer_only(self):
+        reads = []
+
+        def view(request):
+            def chunks():
+                for number in range(10):
+                    reads.append(threading.current_thread().name)
+                    yield b'x'
+            return StreamingHttpResponse(chunks())
+        response = self.get(async_view(view, force=True), '/tasks/')
+
+        async def read_two():
+            chunks = response.async_streaming_content
+            received = [await chunks.__anext__() for _ in range(2)]
+            self.assertLessEqual(len(reads), 2 + STREAM_BUFFER + 1)
+            await chunks.aclose()
+            return received
+        self.assertEqual(async_to_sync(read_two)(), [b'x', b'x'])
+        # The worker stopped once the client went away
+        self.assertLess(len(reads), 10)
+        self.assertTrue(
+            all(name.startswith('async-views') for name in reads)
+        )
+
+    def test_stream_needs_asgi_handler(self):
+        view = async_view(TaskListView.as_view(), force=True)
+        response = self.get(view, '/tasks/?stream=true')
+        with self.assertRaises(ImproperlyConfigured):
+            b''.join(response.streaming_content)
+
+        async def close():
+            await response.async_streaming_content.aclose()
+        async_to_sync(close)()
+
+    def test_disabled_returns_sync_view(self):
+        view = TaskListView.as_view()
+        self.assertIs(async_view(view), view)
+
+
+@override_settings(
+    RESPONSE_CACHE={'ENABLED': False},
+    REPLICA_ROUTER={'REPLICAS': ['replica'], 'CHECK_INTERVAL': 60},
+)
+class ReplicaRoutingTests(APITestCase):
+    '''
+    Tests that task GETs read from the replica, and that writers,
+    lagging and unreachable replicas fall back to the primary.
+    The replica is a second SQLite database holding other rows.
+    '''
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        replicas._health.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        Task.objects.create(owner=self.user, title="Primary task")
+        # Without signals, which would write to the primary
+        User.objects.using('replica').bulk_create([
+            User(id=self.user.id, username="testuser")
+        ])
+        Task.objects.using('replica').bulk_create([
+            Task(owner_id=self.user.id, title="Replica task")
+        ])
+        self.client.force_authenticate(user=self.user)
+
+    def get_titles(self):
+        response = self.client.get('/tasks/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task['title'] for task in response.data['results']]
+
+    def test_reads_from_replica(self):
+        self.assertEqual(self.get_titles(), ["Replica task"])
+
+    def test_reads_from_primary_after_write(self):
+        response = self.client.post('/tasks/', {'title': "New task"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('db-pin', response.cookies)
+        self.assertIn("New task", self.get_titles())
+
+        self.client.cookies['db-pin'] = str(time.time() - 1)
+        self.assertEqual(self.get_titles(), ["Replica task"])
+
+    def test_write_sends_later_reads_to_primary(self):
+        router = replicas.ReplicaRouter()
+        token = replicas._read_alias.set('replica')
+        try:
+            self.assertEqual(router.db_for_read(Task), 'replica')
+            task = Task.objects.get()
+            self.assertEqual(task.title, "Replica task")
+            self.assertEqual(router.db_for_write(Task, instance=task), 'default')
+            self.assertEqual(router.db_for_read(Task), 'default')
+        finally:
+            replicas._read_alias.reset(token)
+
+    def test_lagging_replica_is_skipped(self):
+        with mock.patch.object(replicas, 'get_lag', return_value=60):
+            self.assertEqual(self.get_titles(), ["Primary task"])
+            self.assertEqual(self.get_titles(), ["Primary task"])
+        # Until the next check
+        self.assertEqual(self.get_titles(), ["Primary task"])
+        replicas._health.clear()
+        self.assertEqual(self.get_titles(), ["Replica task"])
+
+    def test_unreachable_replica_is_skipped(self):
+        with mock.patch.object(
+            replicas, 'get_lag', side_effect=OperationalError('down')
+        ):
+            self.assertEqual(self.get_titles(), ["Primary task"])
+
+    def test_archive_reads_from_replica(self):
+        Task.objects.using('replica').bulk_create([
+            Task(owner_id=self.user.id, title="Archived", is_archived=True)
+        ])
+        response = self.client.get('/archive/')
+        self.assertEqual(
+            [task['title'] for task in response.data['results']],
+            ["Archived"],
+        )
+
+    def test_streamed_rows_come_from_replica(self):
+        response = self.client.get(
+            '/tasks/', {'stream': 'true'}, HTTP_ACCEPT='application/json'
+        )
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(body['count'], 1)
+        self.assertEqual(
+            [task['title'] for task in body['results']], ["Replica task"]
+        )
+
+    def test_changes_read_from_primary(self):
+        response = self.client.get('/tasks/changes/')
+        self.assertEqual(
+            [task['title'] for task in response.data['changed']],
+            ["Primary task"],
+        )
+
+    @override_settings(REPLICA_ROUTER={'REPLICAS': []})
+    def test_no_replicas(self):
+        self.assertEqual(self.get_titles(), ["Primary task"])
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class MetricsTests(APITestCase):
+    '''
+    Tests the per-view metrics and their /metrics/ endpoint.
+    '''
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        Task.objects.create(owner=self.user, title="Measured task")
+        self.client.login(username="testuser", password="password123")
+
+    def scrape(self, **headers):
+        response = self.client.get('/metrics/', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return {
+            line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in response.content.decode().splitlines()
+            if not line.startswith('#')
+        }
+
+    def test_records_task_list(self):
+        response = self.client.get('/tasks/')
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        samples = self.scrape()
+
+        labels = '{view="TaskListView",method="GET"}'
+        self.assertEqual(
+            samples[
+                'drf_requests_total'
+                '{view="TaskListView",method="GET",status="2xx"}'
+            ],
+            1
+        )
+        self.assertEqual(
+            samples[
+                'drf_request_duration_seconds_bucket'
+                '{view="TaskListView",method="GET",le="+Inf"}'
+            ],
+            1
+        )
+        self.assertGreater(samples['drf_db_queries_total' + labels], 0)
+        self.assertGreater(samples['drf_db_query_seconds_total' + labels], 0)
+        self.assertGreater(samples['drf_serializer_seconds_total' + labels], 0)
+        self.assertEqual(
+            samples['drf_response_bytes_total' + labels],
+            len(response.content)
+        )
+        self.assertGreater(samples['drf_metrics_overhead_seconds_total'], 0)
+
+    def test_forbidden_without_staff_or_token(self):
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.logout()
+        with override_settings(METRICS={'TOKEN': 'scraper-token'}):
+            response = self.client.get(
+                '/metrics/', HTTP_AUTHORIZATION='Bearer wrong'
+            )
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.scrape(HTTP_AUTHORIZATION='Bearer scraper-token')
+
+    @override_settings(METRICS={'TOKEN': 'scraper-token', 'MAX_ENDPOINTS': 1})
+    def test_endpoints_are_bounded(self):
+        self.client.get('/tasks/')
+        self.client.get('/categories/')
+        samples = self.scrape(HTTP_AUTHORIZATION='Bearer scraper-token')
+        self.assertIn(
+            'drf_db_queries_total{view="TaskListView",method="GET"}', samples
+        )
+        self.assertIn(
+            'drf_db_queries_total{view="other",method="GET"}', samples
+        )
+        self.assertNotIn(
+            'drf_db_queries_total{view="CategoryListView",method="GET"}',
+            samples
+        )
+
+    @override_settings(METRICS={'ENABLED': False, 'TOKEN': 'scraper-token'})
+    def test_disabled(self):
+        self.client.get('/tasks/')
+        samples = self.scrape(HTTP_AUTHORIZATION='Bearer scraper-token')
+        self.assertFalse(
+            [name for name in samples if 'TaskListView' in name]
+        )
@@ -15,11 +15,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import metrics_view
 from .views import root_route, logout_route
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     path('', root_route),
+    path('metrics/', metrics_view),
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
     path('dj-rest-auth/logout/', logout_route),
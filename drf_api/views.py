@@ -13,26 +13,24 @@ def root_route(request):
     })
 
 
+def expire_auth_cookies(response):
+    '''
+    Clears the JWT access and refresh cookies on the client.
+    '''
+    for key in [JWT_AUTH_COOKIE, JWT_AUTH_REFRESH_COOKIE]:
+        response.set_cookie(
+            key=key,
+            value='',
+            httponly=True,
+            expires='Thu, 01 Jan 1970 00:00:00 GMT',
+            max_age=0,
+            samesite=JWT_AUTH_SAMESITE,
+            secure=JWT_AUTH_SECURE,
+        )
+    return response
+
+
 # dj-rest-auth logout view fix
 @api_view(['POST'])
 def logout_route(request):
-    response = Response()
-    response.set_cookie(
-        key=JWT_AUTH_COOKIE,
-        value='',
-        httponly=True,
-        expires='Thu, 01 Jan 1970 00:00:00 GMT',
-        max_age=0,
-        samesite=JWT_AUTH_SAMESITE,
-        secure=JWT_AUTH_SECURE,
-    )
-    response.set_cookie(
-        key=JWT_AUTH_REFRESH_COOKIE,
-        value='',
-        httponly=True,
-        expires='Thu, 01 Jan 1970 00:00:00 GMT',
-        max_age=0,
-        samesite=JWT_AUTH_SAMESITE,
-        secure=JWT_AUTH_SECURE,
-    )
-    return response
\ No newline at end of file
+    return expire_auth_cookies(Response())
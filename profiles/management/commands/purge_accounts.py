@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from profiles.models import AccountPurge
+from profiles.purge import CHUNK_SIZE, run_purge
+
+
+class Command(BaseCommand):
+    '''
+    Runs every account purge that has not finished: queued ones,
+    failed ones and ones whose worker died.
+    '''
+    help = 'Finish pending, failed or interrupted account purges.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        purges = AccountPurge.objects.exclude(status=AccountPurge.DONE)
+        for pk, user_id in purges.values_list('pk', 'user_id'):
+            if run_purge(pk, options['chunk_size']):
+                self.stdout.write(f'Purged user {user_id}')
+            else:
+                purge = AccountPurge.objects.get(pk=pk)
+                self.stdout.write(
+                    f'Skipped user {user_id}: {purge.status} {purge.error}'
+                )
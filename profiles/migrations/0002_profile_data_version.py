@@ -0,0 +1,19 @@
+# Generated by Django 3.2.4 on 2026-10-18 07:30
+
+from django.db import migrations, models
+import profiles.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='data_version',
+            field=models.BigIntegerField(default=profiles.models.initial_data_version, editable=False),
+        ),
+    ]
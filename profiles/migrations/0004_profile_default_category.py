@@ -0,0 +1,47 @@
+# Generated by Django 3.2.4 on 2026-10-18 08:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_default_category(apps, schema_editor):
+    '''
+    Points every profile at its owner's 'Uncategorized' category,
+    creating the category for owners who lost theirs.
+    '''
+    Category = apps.get_model('categories', 'Category')
+    Profile = apps.get_model('profiles', 'Profile')
+    defaults = dict(
+        Category.objects.filter(name='Uncategorized').values_list(
+            'owner_id', 'id'
+        )
+    )
+    profiles = Profile.objects.filter(default_category__isnull=True)
+    for profile in profiles.only('pk', 'owner_id').iterator():
+        category_id = defaults.get(profile.owner_id)
+        if category_id is None:
+            category_id = Category.objects.create(
+                owner_id=profile.owner_id, name='Uncategorized'
+            ).id
+        Profile.objects.filter(pk=profile.pk).update(
+            default_category=category_id
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0002_one_uncategorized_per_owner'),
+        ('profiles', '0003_account_purge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='default_category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='categories.category'),
+        ),
+        migrations.RunPython(
+            backfill_default_category, migrations.RunPython.noop
+        ),
+    ]
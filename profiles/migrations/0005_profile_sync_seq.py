@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_profile_default_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='sync_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
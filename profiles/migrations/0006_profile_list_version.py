@@ -0,0 +1,27 @@
+# Generated by Django 3.2.4 on 2026-10-18 09:53
+
+from django.db import migrations, models
+import profiles.models
+
+
+def create_version(apps, schema_editor):
+    ProfileListVersion = apps.get_model('profiles', 'ProfileListVersion')
+    ProfileListVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_profile_sync_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileListVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=profiles.models.initial_data_version)),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
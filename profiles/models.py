@@ -1,7 +1,21 @@
+import time
+import uuid
+
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from drf_api.authentication import forget_user
+
+
+def initial_data_version():
+    '''
+    Starts each profile's data version at the current time in microseconds,
+    so a recreated user id never reuses the cache keys of an old one.
+    '''
+    return time.time_ns() // 1000
+
 
 class Profile(models.Model):
     '''
@@ -15,6 +29,21 @@ class Profile(models.Model):
     name = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Where tasks without a category go, see categories/defaults.py
+    default_category = models.ForeignKey(
+        'categories.Category',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    # Bumped on every change to the user's tasks or categories,
+    # see drf_api/cache.py
+    data_version = models.BigIntegerField(
+        default=initial_data_version, editable=False
+    )
+    # Last number of the user's change sequence, see tasks/sequence.py
+    sync_seq = models.BigIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-created_at']
@@ -23,6 +52,51 @@ class Profile(models.Model):
         return f"{self.owner}'s profile"
 
 
+class ProfileListVersion(models.Model):
+    '''
+    A single row, bumped by every change to any profile or user. It
+    versions the cached profile list and its ETags, see drf_api/cache.py.
+    Kept in the database so every worker sees a bump at once.
+    '''
+    version = models.BigIntegerField(default=initial_data_version)
+
+
+class AccountPurge(models.Model):
+    '''
+    A deleted account whose data is being removed in the background,
+    see profiles/purge.py.
+    The user id is not a foreign key, the purge outlives the user.
+    '''
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user_id = models.IntegerField(db_index=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING
+    )
+    deleted_tasks = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Touched after every chunk, a stale running purge has crashed
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f'purge of user {self.user_id} | {self.status}'
+
+
 def create_profile(sender, instance, created, **kwargs):
     '''
     creates profile based on user instance
@@ -31,5 +105,54 @@ def create_profile(sender, instance, created, **kwargs):
         Profile.objects.create(owner=instance)
 
 
+def touch_profile(sender, instance, created, update_fields=None, **kwargs):
+    '''
+    Profiles, tasks and categories show their owner's username, so a
+    saved user counts as a changed profile for ETags and the cached
+    profile list, and as changed data for their cached task, archive and
+    category lists.
+    Logins only save last_login and are skipped.
+    '''
+    # drf_api.cache imports this module
+    from drf_api.cache import bump_data_version
+
+    if created or update_fields == frozenset(['last_login']):
+        return
+    Profile.objects.filter(owner=instance).update(updated_at=timezone.now())
+    bump_data_version(instance.pk)
+    bump_profile_list(sender, instance)
+
+
+def bump_profile_list(sender, instance, **kwargs):
+    '''
+    Invalidates the cached profile list of every user.
+    '''
+    # drf_api.cache imports this module
+    from drf_api.cache import bump_profile_list_version
+    bump_profile_list_version()
+
+
+def forget_cached_user(sender, instance, **kwargs):
+    '''
+    Drops the cached copies of a saved or deleted user,
+    see drf_api/authentication.py.
+    '''
+    forget_user(instance.pk)
+
+
+def forget_cached_owner(sender, instance, **kwargs):
+    '''
+    Same for the owner of a saved or deleted profile.
+    '''
+    forget_user(instance.owner_id)
+
+
 # Django signal for creating profiles when user is created
 post_save.connect(create_profile, sender=User)
+post_save.connect(touch_profile, sender=User)
+post_save.connect(forget_cached_user, sender=User)
+post_delete.connect(forget_cached_user, sender=User)
+post_save.connect(forget_cached_owner, sender=Profile)
+post_delete.connect(forget_cached_owner, sender=Profile)
+post_save.connect(bump_profile_list, sender=Profile)
+post_delete.connect(bump_profile_list, sender=Profile)
@@ -0,0 +1,163 @@
+'''
+Background removal of a deleted account's data.
+
+Deleting a user through the collector loads and deletes all their tasks,
+categories and profile in one transaction, inside the request. Instead
+DeleteAccountView deactivates the user at once and queues an
+AccountPurge, which deletes their rows in chunks:
+- Each chunk is its own short transaction, so memory and lock time are
+  bounded by the chunk size.
+- Every step only looks at the rows that are left, so a purge that
+  crashed half way is finished by running it again, eg. with the
+  `purge_accounts` management command.
+- Progress is saved after every chunk and doubles as a heartbeat:
+  a purge left running without one for STALE_AFTER can be taken over.
+'''
+import logging
+import threading
+from datetime import timedelta
+
+from dj_rest_auth.models import TokenModel
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from categories.models import Category
+from drf_api.authentication import forget_user
+from tasks.models import Task, TaskTombstone
+from .models import AccountPurge
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+STALE_AFTER = timedelta(minutes=5)
+
+
+def request_purge(user):
+    '''
+    Deactivates the user, revokes their tokens and queues the purge.
+    Returns the AccountPurge to report progress on.
+    '''
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+        # update() sends no signal
+        forget_user(user.pk)
+        TokenModel.objects.filter(user=user).delete()
+        purge = AccountPurge.objects.filter(user_id=user.pk).exclude(
+            status=AccountPurge.DONE
+        ).first()
+        if purge is None:
+            purge = AccountPurge.objects.create(user_id=user.pk)
+        start_purge(purge)
+    return purge
+
+
+def start_purge(purge):
+    '''
+    Runs the purge in a thread once the current transaction commits,
+    or right away if ACCOUNT_PURGE_IN_BACKGROUND is off.
+    '''
+    if not settings.ACCOUNT_PURGE_IN_BACKGROUND:
+        run_purge(purge.pk)
+        return
+
+    def start():
+        threading.Thread(
+            target=run_purge_thread, args=(purge.pk,), daemon=True
+        ).start()
+    transaction.on_commit(start)
+
+
+def run_purge_thread(pk):
+    try:
+        run_purge(pk)
+    finally:
+        connections.close_all()
+
+
+def claim_purge(pk):
+    '''
+    Marks the purge as running, returns False if another worker has it.
+    '''
+    now = timezone.now()
+    claimable = (
+        Q(status__in=[AccountPurge.PENDING, AccountPurge.FAILED])
+        | Q(status=AccountPurge.RUNNING, updated_at__lt=now - STALE_AFTER)
+    )
+    return AccountPurge.objects.filter(claimable, pk=pk).update(
+        status=AccountPurge.RUNNING, error='', updated_at=now
+    ) == 1
+
+
+def run_purge(pk, chunk_size=CHUNK_SIZE):
+    '''
+    Claims and runs a purge, returns True if it finished.
+    '''
+    if not claim_purge(pk):
+        return False
+    purge = AccountPurge.objects.get(pk=pk)
+    try:
+        purge_user_data(purge, chunk_size)
+    except Exception as error:
+        logger.exception('Purge of user %s failed', purge.user_id)
+        AccountPurge.objects.filter(pk=pk).update(
+            status=AccountPurge.FAILED, error=repr(error),
+            updated_at=timezone.now(),
+        )
+        return False
+    AccountPurge.objects.filter(pk=pk).update(
+        status=AccountPurge.DONE, finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    return True
+
+
+def delete_in_chunks(queryset, chunk_size, raw=True, on_chunk=None):
+    '''
+    Deletes the rows of `queryset` one chunk per transaction.
+    - raw: a single DELETE, for models nothing has a foreign key to.
+    - Otherwise each chunk goes through the collector.
+    '''
+    model = queryset.model
+    while True:
+        with transaction.atomic():
+            ids = list(
+                queryset.order_by().values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                return
+            chunk = model.objects.filter(pk__in=ids)
+            if raw:
+                chunk._raw_delete(chunk.db)
+            else:
+                chunk.delete()
+            if on_chunk:
+                on_chunk(len(ids))
+
+
+def purge_user_data(purge, chunk_size=CHUNK_SIZE):
+    '''
+    Deletes tasks, tombstones and categories in chunks, then the user,
+    whose remaining rows (profile, tokens) are a handful.
+    '''
+    user_id = purge.user_id
+
+    def record_progress(deleted):
+        AccountPurge.objects.filter(pk=purge.pk).update(
+            deleted_tasks=F('deleted_tasks') + deleted,
+            updated_at=timezone.now(),
+        )
+
+    delete_in_chunks(
+        Task.objects.filter(owner_id=user_id), chunk_size,
+        on_chunk=record_progress,
+    )
+    delete_in_chunks(
+        TaskTombstone.objects.filter(owner_id=user_id), chunk_size
+    )
+    delete_in_chunks(
+        Category.objects.filter(owner_id=user_id), chunk_size, raw=False
+    )
+    get_user_model().objects.filter(pk=user_id).delete()
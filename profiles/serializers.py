@@ -1,13 +1,23 @@
 from rest_framework import serializers
-from .models import Profile
+from drf_api.metrics import MetricsSerializerMixin
+from drf_api.sparse import SparseFieldsMixin
+from .models import AccountPurge, Profile
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(
+    MetricsSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     '''
     Serializer for the Profile model
     - Converts Profile instances into JSON data for API responses
     - Ensures certain fields are read only and creates custom fields
+    - GETs can ask for some fields only, see drf_api/sparse.py
     '''
+    sparse_sources = {
+        'owner': ['owner__username'],
+        'is_owner': ['owner'],
+    }
+
     # Read-only field: Displays the owner's username instead of their user ID
     owner = serializers.ReadOnlyField(source='owner.username')
     # Custom field: Indicates if the logged-in user is the owner of the profile
@@ -17,12 +27,12 @@ class ProfileSerializer(serializers.ModelSerializer):
         """
         Custom method to determine if the logged-in user owns the profile.
         - Accesses the request from serializer context.
-        - Compares the logged-in user
-            with the profile owner (`obj.owner`).
+        - Compares the logged-in user's id
+            with the profile's `owner_id`, without loading the owner.
         - Returns True if the user is the owner, otherwise False.
         """
         request = self.context['request']
-        return request.user == obj.owner
+        return request.user.id == obj.owner_id
 
     class Meta:
         '''
@@ -33,3 +43,14 @@ class ProfileSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'owner', 'is_owner', 'name', 'created_at', 'updated_at',
         ]
+
+
+class AccountPurgeSerializer(serializers.ModelSerializer):
+    '''
+    Serializer for the progress of an account deletion
+    '''
+    class Meta:
+        model = AccountPurge
+        fields = [
+            'status', 'deleted_tasks', 'created_at', 'finished_at',
+        ]
@@ -1,3 +1,436 @@
-from django.test import TestCase
+from rest_framework.test import (
+    APIRequestFactory, APITestCase, APITransactionTestCase,
+)
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from io import StringIO
+from unittest import mock
+import tempfile
+from categories.models import Category
+from drf_api.authentication import CachedJWTCookieAuthentication
+from tasks.models import Task, TaskTombstone
+from .models import AccountPurge, Profile
+from .purge import request_purge, run_purge
 
-# Create your tests here.
+
+def use_shared_cache(test):
+    '''
+    Points the default cache at a file based one, shared by processes
+    like Redis would be, for the length of the test.
+    '''
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    shared = override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': directory.name,
+    }})
+    shared.enable()
+    test.addCleanup(shared.disable)
+
+
+class ProfileConditionalGetTests(APITestCase):
+    '''
+    Tests ETag and Last-Modified validation on profile endpoints.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.profile = self.user.profile
+        self.url = f'/profiles/{self.profile.id}/'
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['Last-Modified'],
+            http_date(self.profile.updated_at.timestamp())
+        )
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_update_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.put(self.url, {'name': 'New name'})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'New name')
+
+    def test_list_etag_follows_deletes(self):
+        other = User.objects.create_user(
+            username="otheruser",
+            password="password123"
+        )
+        etag = self.client.get('/profiles/')['ETag']
+        response = self.client.get('/profiles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other.delete()
+        response = self.client.get('/profiles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Profile.objects.count(), 1)
+
+    def test_sparse_fields(self):
+        response = self.client.get(self.url + '?fields=id,is_owner')
+        self.assertEqual(
+            response.data, {'id': self.profile.id, 'is_owner': True}
+        )
+        response = self.client.get('/profiles/?omit=owner,created_at')
+        self.assertEqual(
+            list(response.data['results'][0]),
+            ['id', 'is_owner', 'name', 'updated_at'],
+        )
+
+
+@override_settings(RESPONSE_CACHE={
+    'ENABLED': True,
+    'BACKEND': 'drf_api.cache.LRUBackend',
+    'OPTIONS': {'max_entries': 100},
+})
+class ProfileListTests(APITestCase):
+    '''
+    Tests for the paginated, cached profile list.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+
+    def create_users(self, count):
+        for i in range(count):
+            User.objects.create_user(
+                username=f"user{User.objects.count()}",
+                password="password123"
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False})
+    def test_query_count_is_constant(self):
+        self.create_users(2)
+        small = self.count_queries('/profiles/')
+        self.create_users(10)
+        self.assertEqual(self.count_queries('/profiles/'), small)
+
+    def test_keyset_pages(self):
+        self.create_users(2)
+        response = self.client.get('/profiles/?page_size=2')
+        self.assertEqual(
+            [profile['owner'] for profile in response.data['results']],
+            ['user2', 'user1'],
+        )
+        self.assertNotIn('count', response.data)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertTrue(response.data['results'][0]['is_owner'])
+        self.assertIsNone(response.data['next'])
+
+    def test_cached_until_a_profile_or_user_changes(self):
+        self.create_users(1)
+        self.assertEqual(self.client.get('/profiles/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/profiles/')['X-Cache'], 'HIT')
+
+        other = User.objects.get(username='user1')
+        other.username = 'renamed'
+        other.save()
+        response = self.client.get('/profiles/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['owner'], 'renamed')
+
+        self.client.put(f'/profiles/{self.user.profile.id}/', {'name': 'Me'})
+        response = self.client.get('/profiles/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][1]['name'], 'Me')
+
+    def test_cache_is_per_user(self):
+        self.client.get('/profiles/')
+        self.client.logout()
+        self.create_users(1)
+        self.client.login(username="user1", password="password123")
+        response = self.client.get('/profiles/')
+        owners = {
+            profile['owner']: profile['is_owner']
+            for profile in response.data['results']
+        }
+        self.assertEqual(owners, {'user1': True, 'testuser': False})
+
+    def test_cache_hits_do_not_read_profiles(self):
+        self.create_users(10)
+        self.client.get('/profiles/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/profiles/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        # Only the version is read
+        self.assertFalse([
+            query for query in queries
+            if '"profiles_profile"' in query['sql']
+        ])
+
+    def test_version_is_shared_by_workers(self):
+        '''
+        The version is read from the database, not a per-process cache.
+        '''
+        response = self.client.get('/profiles/')
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'other-worker',
+        }}):
+            self.assertEqual(
+                self.client.get('/profiles/')['ETag'], response['ETag']
+            )
+            Profile.objects.get(owner=self.user).save()
+        response = self.client.get(
+            '/profiles/', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_logins_keep_the_cache(self):
+        self.client.get('/profiles/')
+        self.client.login(username="testuser", password="password123")
+        self.assertEqual(self.client.get('/profiles/')['X-Cache'], 'HIT')
+
+
+@override_settings(ACCOUNT_PURGE_IN_BACKGROUND=False)
+class AccountPurgeTests(APITestCase):
+    '''
+    Tests for account deletion through a chunked purge.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="otheruser",
+            password="password123"
+        )
+        self.category = Category.objects.create(owner=self.user, name="Work")
+        Task.objects.bulk_create([
+            Task(owner=self.user, title=f"Task {i}", category=self.category)
+            for i in range(5)
+        ])
+        Task.objects.create(owner=self.user, title="Deleted").delete()
+        self.kept = Task.objects.create(owner=self.other, title="Kept")
+        self.client.login(username="testuser", password="password123")
+
+    def test_delete_account(self):
+        response = self.client.delete('/delete-account/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        self.assertFalse(User.objects.filter(id=self.user.id).exists())
+        self.assertFalse(Task.objects.filter(owner_id=self.user.id).exists())
+        self.assertFalse(
+            Category.objects.filter(owner_id=self.user.id).exists()
+        )
+        self.assertFalse(
+            TaskTombstone.objects.filter(owner_id=self.user.id).exists()
+        )
+        self.assertEqual(list(Task.objects.all()), [self.kept])
+
+        response = self.client.get(response.data['status_url'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], AccountPurge.DONE)
+        self.assertEqual(response.data['deleted_tasks'], 5)
+
+    @override_settings(ACCOUNT_PURGE_IN_BACKGROUND=True)
+    def test_user_is_deactivated_before_the_purge(self):
+        response = self.client.delete('/delete-account/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        # The purge starts once the request's transaction commits
+        self.assertEqual(
+            AccountPurge.objects.get().status, AccountPurge.PENDING
+        )
+        self.assertEqual(
+            self.client.get('/tasks/').status_code, status.HTTP_403_FORBIDDEN
+        )
+
+    def test_purge_resumes_after_a_crash(self):
+        purge = AccountPurge.objects.create(user_id=self.user.id)
+        # Fails on the last step, after the tasks are gone
+        with mock.patch(
+            'profiles.purge.get_user_model', side_effect=RuntimeError
+        ):
+            self.assertFalse(run_purge(purge.pk, chunk_size=2))
+        purge.refresh_from_db()
+        self.assertEqual(purge.status, AccountPurge.FAILED)
+        self.assertEqual(purge.deleted_tasks, 5)
+
+        out = StringIO()
+        call_command('purge_accounts', stdout=out)
+        self.assertIn(f'Purged user {self.user.id}', out.getvalue())
+        self.assertFalse(User.objects.filter(id=self.user.id).exists())
+        purge.refresh_from_db()
+        self.assertEqual(purge.status, AccountPurge.DONE)
+        self.assertEqual(purge.deleted_tasks, 5)
+
+    def test_running_purge_is_not_claimed_twice(self):
+        purge = AccountPurge.objects.create(
+            user_id=self.user.id, status=AccountPurge.RUNNING
+        )
+        self.assertFalse(run_purge(purge.pk))
+        self.assertTrue(User.objects.filter(id=self.user.id).exists())
+
+    def test_unknown_status_token(self):
+        response = self.client.get(
+            '/delete-account/00000000-0000-0000-0000-000000000000/'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AccountPurgeJWTTests(APITransactionTestCase):
+    '''
+    Account deletion with the production JWT cookie authentication.
+    '''
+
+    def setUp(self):
+        use_shared_cache(self)
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.cookies[settings.JWT_AUTH_COOKIE] = str(
+            RefreshToken.for_user(self.user).access_token
+        )
+        patcher = mock.patch(
+            'rest_framework.views.APIView.authentication_classes',
+            [CachedJWTCookieAuthentication],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_status_url_can_be_polled(self):
+        # Caches the user
+        self.assertEqual(
+            self.client.get('/profiles/').status_code, status.HTTP_200_OK
+        )
+        with mock.patch('profiles.purge.start_purge'):
+            response = self.client.delete('/delete-account/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        for cookie in [
+            settings.JWT_AUTH_COOKIE, settings.JWT_AUTH_REFRESH_COOKIE
+        ]:
+            self.assertEqual(response.cookies[cookie].value, '')
+            self.assertEqual(response.cookies[cookie]['max-age'], 0)
+
+        # Still sent by a client that ignores the expired cookies
+        self.client.cookies[settings.JWT_AUTH_COOKIE] = str(
+            RefreshToken.for_user(self.user).access_token
+        )
+        status_url = response.data['status_url']
+        response = self.client.get(status_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], AccountPurge.PENDING)
+
+        self.assertTrue(run_purge(AccountPurge.objects.get().pk))
+        response = self.client.get(status_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], AccountPurge.DONE)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    '''
+    Tests the cached user lookup of JWT cookie authentication.
+    '''
+
+    def setUp(self):
+        use_shared_cache(self)
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.auth = CachedJWTCookieAuthentication()
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/')
+        request.COOKIES[settings.JWT_AUTH_COOKIE] = self.token
+        user, token = self.auth.authenticate(request)
+        return user
+
+    def test_second_request_runs_no_queries(self):
+        self.assertEqual(self.authenticate(), self.user)
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual(user.profile.id, self.user.profile.id)
+        self.assertNotIn('password', user.__dict__)
+
+    def test_saved_user_is_reloaded(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = 'renamed'
+            self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().username, 'renamed')
+
+    def test_saved_profile_is_reloaded(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.get(owner=self.user).save()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    def test_deleted_account_is_rejected(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('profiles.purge.start_purge'):
+                request_purge(self.user)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(AUTH_USER_CACHE={'ENABLED': False})
+    def test_disabled(self):
+        self.authenticate()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    def test_per_process_cache_is_not_used(self):
+        '''
+        Other workers would not see the auth version change.
+        '''
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            self.authenticate()
+            with self.assertNumQueries(1):
+                self.authenticate()
+            self.user.is_active = False
+            self.user.save()
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate()
@@ -5,4 +5,8 @@ urlpatterns = [
     path('profiles/', views.ProfileListView.as_view()),
     path('profiles/<int:pk>/', views.ProfileDetailView.as_view()),
     path("delete-account/", views.DeleteAccountView.as_view()),
+    path(
+        "delete-account/<uuid:token>/",
+        views.AccountPurgeStatusView.as_view()
+    ),
 ]
\ No newline at end of file
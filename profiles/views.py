@@ -1,32 +1,70 @@
 from rest_framework import generics, status
 from drf_api.permissions import IsOwnerOrReadOnly
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.shortcuts import get_object_or_404
 from .serializers import ProfileSerializer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.contrib.auth import get_user_model
-from dj_rest_auth.models import TokenModel
 
-from .serializers import ProfileSerializer
-from .models import Profile
+from .serializers import AccountPurgeSerializer, ProfileSerializer
+from .models import AccountPurge, Profile
+from .purge import request_purge
+from drf_api.conditional import ConditionalGetMixin, make_etag
+from drf_api.cache import (
+    CachedListMixin, get_normalized_url, get_profile_list_version,
+)
+from drf_api.pagination import KeysetPagination
+from drf_api.sparse import sparse_queryset
+from drf_api.views import expire_auth_cookies
 
 
-class ProfileListView(generics.ListAPIView):
+class ProfileListView(
+    ConditionalGetMixin, CachedListMixin, generics.ListAPIView
+):
     '''
     Generalised Profile list view
-    List all profiles
+    List all profiles, newest first, in keyset pages (`?cursor=`)
     No create view as profile creation handled by django signals in models.py
+    The ETag comes from the profile list version, which any profile or
+    user save or delete replaces (see profiles/models.py), so no query
+    runs over the whole table
+    Responses are cached per user under the ETag
     '''
-    queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        '''
+        Joins the owners in, or loads only what the requested fields
+        need, see drf_api/sparse.py.
+        '''
+        return sparse_queryset(
+            Profile.objects.select_related('owner'),
+            self.request, ProfileSerializer,
+        )
 
+    def get_validators(self, request, *args, **kwargs):
+        '''
+        Read once per request, they are also the cache version.
+        '''
+        if not hasattr(self, '_validators'):
+            self._validators = make_etag(
+                request.user.pk, get_profile_list_version(),
+                get_normalized_url(request),
+                request.accepted_renderer.media_type,
+            ), None
+        return self._validators
+
+    def get_cache_version(self, request):
+        etag, _ = self.get_validators(request)
+        return etag
 
-class ProfileDetailView(generics.RetrieveUpdateAPIView):
+
+class ProfileDetailView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     '''
     Generalised Profile list view for get, update
     Users cannot access other users' profiles.
-
+    ETag and Last-Modified come from the profile's updated_at
     '''
     permission_classes = [IsOwnerOrReadOnly]
     serializer_class = ProfileSerializer
@@ -35,7 +73,10 @@ class ProfileDetailView(generics.RetrieveUpdateAPIView):
         '''
         Restricts the profile retrieval to only the logged-in user.
         '''
-        return Profile.objects.filter(owner=self.request.user)
+        return sparse_queryset(
+            Profile.objects.filter(owner=self.request.user),
+            self.request, ProfileSerializer,
+        )
 
     def get_object(self):
         '''
@@ -46,16 +87,57 @@ class ProfileDetailView(generics.RetrieveUpdateAPIView):
         obj = get_object_or_404(queryset, pk=self.kwargs["pk"])
         return obj
 
+    def get_validators(self, request, *args, **kwargs):
+        '''
+        Reads only updated_at, a missing profile falls through to the 404.
+        '''
+        if not request.user.is_authenticated:
+            return None
+        updated_at = self.get_queryset().filter(
+            pk=self.kwargs["pk"]
+        ).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        etag = make_etag(
+            updated_at.isoformat(), request.accepted_renderer.media_type
+        )
+        return etag, updated_at
+
 
 class DeleteAccountView(APIView):
     """
     Allows a logged-in user to permanently delete their account.
     Not Accessable to users as of yet
+    The user is deactivated at once and their data is removed in the
+    background, see profiles/purge.py. Returns 202 with a status URL.
+    The JWT cookies are cleared, they belong to an inactive user now.
     """
     permission_classes = [IsAuthenticated]
 
     def delete(self, request):
-        user = request.user
-        TokenModel.objects.filter(user=user).delete()
-        user.delete()
-        return Response({"detail": "Your account has been deleted."}, status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        purge = request_purge(request.user)
+        return expire_auth_cookies(Response(
+            {
+                "detail": "Your account is being deleted.",
+                "status_url": request.build_absolute_uri(
+                    f"/delete-account/{purge.token}/"
+                ),
+            },
+            status=status.HTTP_202_ACCEPTED
+        ))
+
+
+class AccountPurgeStatusView(generics.RetrieveAPIView):
+    """
+    Progress of an account deletion.
+    The token in the URL is the only credential, the user is gone.
+    Credentials are not even read: the client's cookies belong to the
+    deactivated user and would be rejected.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    serializer_class = AccountPurgeSerializer
+    lookup_field = "token"
+
+    def get_queryset(self):
+        return AccountPurge.objects.all()
@@ -1,3 +1,7 @@
+import re
+from django.db import connections
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
 from .models import Task
 from datetime import datetime
 
@@ -22,3 +26,68 @@ def filter_tasks_by_status(queryset, request):
     if status in STATUS_CHOICES:
         queryset = queryset.filter(status=status)
     return queryset
+
+
+class TaskSearchFilter(SearchFilter):
+    '''
+    Full-text `?search=` over title, description and category name,
+    backed by the trigger maintained index in tasks/search.py.
+    - Every search term must match, as a word prefix.
+    - Results are ranked by relevance unless `?ordering=` is given.
+    - Databases without a search index use DRF's SearchFilter.
+    '''
+    def get_search_words(self, request):
+        '''
+        Splits the search terms into plain words, safe to put in a
+        tsquery or FTS5 query.
+        '''
+        words = []
+        for term in self.get_search_terms(request):
+            words.extend(re.findall(r'\w+', term))
+        return words
+
+    def filter_queryset(self, request, queryset, view):
+        words = self.get_search_words(request)
+        if not words:
+            return queryset
+
+        vendor = connections[queryset.db].vendor
+        if vendor == 'postgresql':
+            queryset = self.search_postgres(queryset, words)
+        elif vendor == 'sqlite':
+            queryset = self.search_sqlite(queryset, words)
+        else:
+            return super().filter_queryset(request, queryset, view)
+
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-search_rank', '-created_at')
+        return queryset
+
+    def search_postgres(self, queryset, words):
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        return queryset.extra(
+            select={
+                'search_rank': "ts_rank(tasks_task.search_vector, "
+                               "to_tsquery('english', %s))",
+            },
+            select_params=[tsquery],
+            where=[
+                "tasks_task.search_vector @@ to_tsquery('english', %s)",
+            ],
+            params=[tsquery],
+        )
+
+    def search_sqlite(self, queryset, words):
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.extra(
+            # bm25() is lower for better matches, weighted like Postgres
+            select={'search_rank': '-bm25(tasks_task_fts, 10.0, 5.0, 1.0)'},
+            tables=['tasks_task_fts'],
+            where=[
+                # `+ 0` stops SQLite from probing the FTS table once per
+                # task, so the MATCH drives the join instead
+                'tasks_task.id = tasks_task_fts.rowid + 0',
+                'tasks_task_fts MATCH %s',
+            ],
+            params=[match],
+        )
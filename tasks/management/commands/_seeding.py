@@ -0,0 +1,191 @@
+'''
+Helpers shared by the benchmark commands to build throwaway data.
+'''
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from categories.models import Category
+from profiles.models import Profile
+from profiles.purge import delete_in_chunks
+from tasks.models import Task, TaskTombstone
+from tasks.sequence import reserve_sequence
+
+VERBS = [
+    'Buy', 'Call', 'Clean', 'Fix', 'Plan', 'Review', 'Write', 'Book',
+    'Email', 'Pay', 'Prepare', 'Organise', 'Update', 'Cancel', 'Renew',
+]
+NOUNS = [
+    'groceries', 'dentist', 'kitchen', 'bike', 'holiday', 'report',
+    'invoice', 'presentation', 'garden', 'insurance', 'car', 'passport',
+    'budget', 'birthday', 'newsletter', 'meeting', 'tomatoes', 'gym',
+]
+CATEGORY_NAMES = [
+    'Work', 'Home', 'Shopping', 'Health', 'Finance', 'Errands', 'Study',
+    'Travel', 'Family', 'Fitness', 'Garden', 'Car', 'Hobbies', 'Admin',
+]
+# Rough shares of a to-do list that is in use
+STATUS_WEIGHTS = {
+    'Pending': 40, 'In Progress': 25, 'Completed': 30, 'Overdue': 5,
+}
+PRIORITY_WEIGHTS = {'Low': 30, 'Medium': 50, 'High': 20}
+
+
+def create_bench_user(username='bench-user'):
+    '''
+    Creates a user, their profile and 'Uncategorized' category.
+    '''
+    return User.objects.create_user(username=username, password='bench')
+
+
+def seed_tasks(owner, count, categories=None, batch_size=5000, seed=0):
+    '''
+    Bulk inserts `count` tasks for `owner`, spread over `categories`
+    (the owner's, by default) like realistic_task() spreads them.
+    '''
+    rng = random.Random(seed)
+    if categories is None:
+        categories = Category.objects.filter(owner=owner)
+    # realistic_task() puts its share of uncategorized tasks first
+    category_ids = [
+        category.id for category in sorted(
+            categories, key=lambda category: category.name != 'Uncategorized'
+        )
+    ]
+    today = date.today()
+
+    first = reserve_sequence(owner.id, count)
+
+    tasks = []
+    for number in range(count):
+        task = realistic_task(rng, owner.id, category_ids, today)
+        task.sync_seq = first + number
+        tasks.append(task)
+        if len(tasks) == batch_size:
+            Task.objects.bulk_create(tasks)
+            tasks = []
+    Task.objects.bulk_create(tasks)
+
+
+def realistic_task(rng, owner_id, category_ids, today):
+    '''
+    Returns an unsaved task, with statuses, priorities and due dates
+    spread like STATUS_WEIGHTS and PRIORITY_WEIGHTS:
+    - finished and overdue tasks were due in the past, open ones are
+      mostly due within weeks and a tenth of them has just gone past due
+      (what an overdue sweep finds), a quarter of tasks has no due date,
+    - completed tasks are archived, as Task.save() does,
+    - the first category (Uncategorized) gets a third of the tasks.
+    '''
+    status = rng.choices(
+        list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values())
+    )[0]
+    if rng.random() < 0.25:
+        due_date = None
+    elif status == 'Completed':
+        due_date = today - timedelta(days=rng.randint(0, 90))
+    elif status == 'Overdue':
+        due_date = today - timedelta(days=rng.randint(1, 30))
+    elif rng.random() < 0.1:
+        due_date = today - timedelta(days=rng.randint(1, 14))
+    elif rng.random() < 0.9:
+        due_date = today + timedelta(days=rng.randint(0, 30))
+    else:
+        due_date = today + timedelta(days=rng.randint(31, 180))
+    if len(category_ids) > 1 and rng.random() >= 1 / 3:
+        category_id = rng.choice(category_ids[1:])
+    else:
+        category_id = category_ids[0] if category_ids else None
+    return Task(
+        owner_id=owner_id,
+        title=f'{rng.choice(VERBS)} {rng.choice(NOUNS)}',
+        description='' if rng.random() < 0.3 else ' '.join(
+            rng.choice(VERBS + NOUNS).lower()
+            for _ in range(rng.randint(3, 30))
+        ),
+        category_id=category_id,
+        status=status,
+        priority=rng.choices(
+            list(PRIORITY_WEIGHTS), weights=list(PRIORITY_WEIGHTS.values())
+        )[0],
+        due_date=due_date,
+        is_archived=status == 'Completed',
+    )
+
+
+def seed_users(
+    prefix, users, categories, tasks, password, seed=0, batch_size=5000
+):
+    '''
+    Bulk inserts `users` users named `<prefix>-<n>`, each with a profile,
+    'Uncategorized' and `categories - 1` other categories, and `tasks`
+    tasks. Signals are not sent, so everything signup creates is
+    created here. Returns the users.
+    '''
+    rng = random.Random(seed)
+    today = date.today()
+    # Hashing is slow on purpose, every user shares one hash
+    password = make_password(password)
+    names = [f'{prefix}-{number}' for number in range(users)]
+    User.objects.bulk_create(
+        [User(username=name, password=password) for name in names],
+        batch_size=batch_size,
+    )
+    # SQLite does not return the ids of bulk inserts
+    owners = list(User.objects.filter(username__in=names).order_by('id'))
+    Profile.objects.bulk_create(
+        [Profile(owner=owner) for owner in owners], batch_size=batch_size
+    )
+
+    extra = min(max(categories - 1, 0), len(CATEGORY_NAMES))
+    Category.objects.bulk_create([
+        Category(owner=owner, name=name)
+        for owner in owners
+        for name in ['Uncategorized'] + rng.sample(CATEGORY_NAMES, extra)
+    ], batch_size=batch_size)
+    category_ids = {}
+    for owner_id, name, category_id in Category.objects.filter(
+        owner__in=owners
+    ).values_list('owner_id', 'name', 'id').order_by('id'):
+        ids = category_ids.setdefault(owner_id, [])
+        if name == 'Uncategorized':
+            ids.insert(0, category_id)
+        else:
+            ids.append(category_id)
+
+    profiles = list(Profile.objects.filter(owner__in=owners))
+    for profile in profiles:
+        profile.default_category_id = category_ids[profile.owner_id][0]
+    Profile.objects.bulk_update(
+        profiles, ['default_category'], batch_size=batch_size
+    )
+
+    batch = []
+    for owner in owners:
+        first = reserve_sequence(owner.id, tasks)
+        for number in range(tasks):
+            task = realistic_task(rng, owner.id, category_ids[owner.id], today)
+            task.sync_seq = first + number
+            batch.append(task)
+            if len(batch) == batch_size:
+                Task.objects.bulk_create(batch)
+                batch = []
+    Task.objects.bulk_create(batch)
+    return owners
+
+
+def delete_users(queryset, chunk_size=5000):
+    '''
+    Deletes the users and all their data, in chunks.
+    '''
+    owners = list(queryset.values_list('id', flat=True))
+    delete_in_chunks(Task.objects.filter(owner_id__in=owners), chunk_size)
+    delete_in_chunks(
+        TaskTombstone.objects.filter(owner_id__in=owners), chunk_size
+    )
+    delete_in_chunks(
+        Category.objects.filter(owner_id__in=owners), chunk_size, raw=False
+    )
+    User.objects.filter(id__in=owners).delete()
@@ -0,0 +1,201 @@
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from drf_api.async_views import ASGIHandler
+from profiles.purge import delete_in_chunks
+from tasks.models import Task
+from ._seeding import create_bench_user, seed_tasks
+
+MODES = {
+    # mode: ASYNC_VIEWS environment variable
+    'wsgi': '0',
+    'asgi-sync': '0',
+    'asgi-async': '1',
+}
+
+
+class Command(BaseCommand):
+    '''
+    Compares the throughput of GET /tasks/ through the WSGI handler, the
+    ASGI handler with the sync views and the ASGI handler with the async
+    views of drf_api/async_views.py, at several numbers of concurrent
+    requests.
+    - Requests go to the handlers in process, without a server or
+      sockets, so only the request path itself is compared.
+    - WSGI requests run on `--threads` threads, like gunicorn's gthread
+      worker. The async views use ASYNC_VIEWS['MAX_WORKERS'] threads.
+    - Each mode runs in a fresh process, as ASYNC_VIEWS is read when the
+      URLs are loaded. The response cache is off.
+    - `--db-latency` sleeps that many milliseconds per query, to stand in
+      for the round trips to a database server over the network.
+    '''
+    help = 'Benchmark requests per second of the WSGI and ASGI paths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument(
+            '--concurrency', nargs='+', type=int, default=[10, 100, 1000],
+        )
+        parser.add_argument('--threads', type=int, default=10)
+        parser.add_argument('--db-latency', type=float, default=0)
+        parser.add_argument(
+            '--mode', choices=list(MODES),
+            help='Measure one mode on existing data (used internally).',
+        )
+        parser.add_argument('--username', default='bench-async')
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            return self.measure(options)
+
+        owner = create_bench_user(options['username'])
+        try:
+            seed_tasks(owner, options['tasks'])
+            self.stdout.write(
+                f'{"mode":>11} {"concurrency":>12} {"requests/s":>11} '
+                f'{"errors":>7}'
+            )
+            for mode, async_views in MODES.items():
+                result = subprocess.run(
+                    [sys.executable, sys.argv[0], 'bench_async_views',
+                     '--mode', mode, '--username', owner.username,
+                     '--requests', str(options['requests']),
+                     '--threads', str(options['threads']),
+                     '--db-latency', str(options['db_latency']),
+                     '--concurrency',
+                     *[str(level) for level in options['concurrency']]],
+                    capture_output=True, text=True, check=True,
+                    env={**os.environ, 'ASYNC_VIEWS': async_views},
+                )
+                self.stdout.write(result.stdout.rstrip())
+        finally:
+            delete_in_chunks(Task.objects.filter(owner=owner), 5000)
+            owner.delete()
+
+    def measure(self, options):
+        if options['db_latency']:
+            self.add_latency(options['db_latency'] / 1000)
+        owner = User.objects.get(username=options['username'])
+        client = Client()
+        client.force_login(owner)
+        cookie = '; '.join([
+            f'{settings.SESSION_COOKIE_NAME}='
+            f'{client.cookies[settings.SESSION_COOKIE_NAME].value}',
+            f'{settings.JWT_AUTH_COOKIE}='
+            f'{RefreshToken.for_user(owner).access_token}',
+        ])
+
+        with override_settings(RESPONSE_CACHE={'ENABLED': False}):
+            for concurrency in options['concurrency']:
+                if options['mode'] == 'wsgi':
+                    run = self.run_wsgi
+                else:
+                    run = self.run_asgi
+                start = time.perf_counter()
+                statuses = run(
+                    cookie, options['requests'], concurrency,
+                    options['threads'],
+                )
+                elapsed = time.perf_counter() - start
+                errors = sum(status != 200 for status in statuses)
+                self.stdout.write(
+                    f'{options["mode"]:>11} {concurrency:>12} '
+                    f'{len(statuses) / elapsed:>11.1f} {errors:>7}'
+                )
+
+    def add_latency(self, seconds):
+        def delay(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def add_delay(sender, connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+        connection_created.connect(add_delay, weak=False)
+
+    def run_wsgi(self, cookie, requests, concurrency, threads):
+        application = get_wsgi_application()
+
+        def request(_):
+            statuses = []
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': '/tasks/',
+                'QUERY_STRING': '',
+                'SCRIPT_NAME': '',
+                'SERVER_NAME': '127.0.0.1',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': '127.0.0.1',
+                'HTTP_ACCEPT': 'application/json',
+                'HTTP_COOKIE': cookie,
+                'wsgi.input': io.BytesIO(),
+                'wsgi.url_scheme': 'http',
+            }
+            response = application(
+                environ,
+                lambda status, headers: statuses.append(int(status[:3])),
+            )
+            b''.join(response)
+            response.close()
+            return statuses[0]
+
+        # Requests beyond the threads wait in the executor's queue,
+        # as connections wait in a server's backlog
+        with ThreadPoolExecutor(max_workers=min(threads, concurrency)) as pool:
+            return list(pool.map(request, range(requests)))
+
+    def run_asgi(self, cookie, requests, concurrency, threads):
+        application = ASGIHandler()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/tasks/',
+            'raw_path': b'/tasks/',
+            'root_path': '',
+            'query_string': b'',
+            'headers': [
+                (b'host', b'127.0.0.1'),
+                (b'accept', b'application/json'),
+                (b'cookie', cookie.encode()),
+            ],
+            'client': ('127.0.0.1', 50000),
+            'server': ('127.0.0.1', 80),
+        }
+
+        async def request(semaphore):
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                messages.append(message)
+
+            async with semaphore:
+                await application(dict(scope), receive, send)
+            return messages[0]['status']
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*[
+                request(semaphore) for _ in range(requests)
+            ])
+        return asyncio.run(run())
@@ -0,0 +1,78 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from categories.deletion import BATCH_SIZE, delete_category
+from categories.models import Category
+from tasks.models import Task
+from ._seeding import create_bench_user, seed_tasks
+
+
+class Command(BaseCommand):
+    '''
+    Compares deleting a large category through Django's collector with
+    the batched delete in categories/deletion.py.
+    - `longest tx` is the longest single transaction, ie. how long
+      the table stays locked.
+    - Each run seeds its own user, which is deleted afterwards.
+    '''
+    help = 'Benchmark deleting categories with many tasks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10000, 100000],
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--collector-max', type=int, default=100000,
+            help='Skip the collector above this many tasks, it is slow.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"tasks":>8} {"method":>10} {"total s":>8} '
+            f'{"longest tx s":>13} {"peak MB":>8}'
+        )
+        for size in options['sizes']:
+            if size <= options['collector_max']:
+                self.run(size, 'collector', self.collector_delete)
+            self.run(
+                size, 'batched',
+                lambda category: self.batched_delete(
+                    category, options['batch_size']
+                ),
+            )
+
+    def run(self, size, method, delete):
+        owner = create_bench_user(f'bench-delete-{method}-{size}')
+        category = Category.objects.create(owner=owner, name='Bench')
+        seed_tasks(owner, size, categories=[category])
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        longest = delete(category)
+        total = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        owner.delete()
+
+        self.stdout.write(
+            f'{size:>8} {method:>10} {total:>8.2f} '
+            f'{longest or total:>13.3f} {peak / 2 ** 20:>8.1f}'
+        )
+
+    def collector_delete(self, category):
+        Task.objects.filter(category=category).delete()
+        category.delete()
+
+    def batched_delete(self, category, batch_size):
+        '''
+        Returns the longest time between two progress reports.
+        '''
+        times = [time.perf_counter()]
+        delete_category(
+            category, batch_size,
+            progress=lambda deleted, total: times.append(time.perf_counter()),
+        )
+        return max(b - a for a, b in zip(times, times[1:]))
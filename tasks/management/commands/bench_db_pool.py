@@ -0,0 +1,72 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+from drf_api.postgres_pool import get_pool_stats
+
+
+class Command(BaseCommand):
+    '''
+    Compares per-request connection cost with and without the pool in
+    drf_api/postgres_pool, on the PostgreSQL database of DATABASE_URL.
+    - A request connects, runs one query and closes the connection,
+      as Django does with CONN_MAX_AGE = 0.
+    - `--threads` runs requests concurrently to show pool waits when
+      there are more threads than MAX_SIZE.
+    '''
+    help = 'Benchmark requests on plain and pooled Postgres connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=1)
+
+    def handle(self, *args, **options):
+        settings_dict = connections['default'].settings_dict
+        if 'postgres' not in settings_dict['ENGINE']:
+            raise CommandError('Needs a PostgreSQL DATABASE_URL.')
+
+        self.stdout.write(
+            f'{"engine":>32} {"requests":>9} {"ms/request":>11}'
+        )
+        for engine in [
+            'django.db.backends.postgresql', 'drf_api.postgres_pool'
+        ]:
+            elapsed = self.run(
+                {**settings_dict, 'ENGINE': engine},
+                options['requests'], options['threads'],
+            )
+            self.stdout.write(
+                f'{engine:>32} {options["requests"]:>9} '
+                f'{elapsed * 1000 / options["requests"]:>11.2f}'
+            )
+        for stats in get_pool_stats():
+            self.stdout.write(', '.join(
+                f'{name}={value}' for name, value in stats.items()
+            ))
+
+    def run(self, settings_dict, requests, threads):
+        backend = load_backend(settings_dict['ENGINE'])
+
+        def worker(count):
+            connection = backend.DatabaseWrapper(settings_dict, 'bench')
+            for _ in range(count):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                connection.close()
+
+        workers = [
+            threading.Thread(
+                target=worker,
+                args=(requests // threads + (i < requests % threads),),
+            )
+            for i in range(threads)
+        ]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - start
@@ -0,0 +1,78 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from drf_api import renderers
+from drf_api.parsers import FastJSONParser
+from drf_api.renderers import FastJSONRenderer
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+from ._seeding import create_bench_user, seed_tasks
+
+
+class Command(BaseCommand):
+    '''
+    Compares JSONRenderer and JSONParser with their orjson versions
+    on TaskSerializer list payloads.
+    Data is created in a transaction that is rolled back.
+    '''
+    help = 'Benchmark JSON rendering and parsing of task lists, in MB/s.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[100, 1000, 10000],
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stderr.write('orjson is not installed, nothing to compare.')
+            return
+
+        self.stdout.write(
+            f'{"tasks":>8} {"bytes":>11} {"render MB/s":>12} '
+            f'{"orjson MB/s":>12} {"parse MB/s":>11} {"orjson MB/s":>12}'
+        )
+        for size in options['sizes']:
+            with transaction.atomic():
+                owner = create_bench_user(f'bench-json-{size}')
+                seed_tasks(owner, size)
+                data = {
+                    'count': size, 'next': None, 'previous': None,
+                    'results': TaskSerializer(
+                        Task.objects.select_related(
+                            'owner', 'category'
+                        ).filter(owner=owner),
+                        many=True,
+                    ).data,
+                }
+                transaction.set_rollback(True)
+
+            body = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != body:
+                raise AssertionError('Rendered JSON differs')
+
+            repeat = options['repeat']
+            rates = [
+                len(body) * repeat / self.time(function, repeat) / 2**20
+                for function in [
+                    lambda: JSONRenderer().render(data),
+                    lambda: FastJSONRenderer().render(data),
+                    lambda: JSONParser().parse(BytesIO(body)),
+                    lambda: FastJSONParser().parse(BytesIO(body)),
+                ]
+            ]
+            self.stdout.write(
+                f'{size:>8} {len(body):>11,} {rates[0]:>12.1f} '
+                f'{rates[1]:>12.1f} {rates[2]:>11.1f} {rates[3]:>12.1f}'
+            )
+
+    def time(self, function, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        return time.perf_counter() - start
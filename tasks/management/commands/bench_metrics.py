@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from drf_api import metrics
+from profiles.purge import delete_in_chunks
+from tasks.models import Task
+from ._seeding import create_bench_user, seed_tasks
+
+
+class Command(BaseCommand):
+    '''
+    Measures what drf_api/metrics.py adds to a GET /tasks/ request.
+    - Requests with metrics on and off are interleaved in rounds, and
+      each mode keeps its fastest round, to leave out noise.
+    - `recorded` is the time the middleware itself reports in
+      drf_metrics_overhead_seconds_total.
+    '''
+    help = 'Benchmark the per-request overhead of the metrics middleware.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def handle(self, *args, **options):
+        owner = create_bench_user('bench-metrics')
+        try:
+            seed_tasks(owner, options['tasks'])
+            client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+            client.force_login(owner)
+            self.run(client, options)
+        finally:
+            delete_in_chunks(Task.objects.filter(owner=owner), 5000)
+            owner.delete()
+
+    def run(self, client, options):
+        requests = options['requests']
+        best = {True: float('inf'), False: float('inf')}
+        metrics.registry.reset()
+        with override_settings(RESPONSE_CACHE={'ENABLED': False}):
+            # Warm up
+            client.get('/tasks/')
+            for _ in range(options['rounds']):
+                for enabled in best:
+                    with override_settings(METRICS={'ENABLED': enabled}):
+                        start = time.perf_counter()
+                        for _ in range(requests):
+                            client.get('/tasks/')
+                        elapsed = time.perf_counter() - start
+                    best[enabled] = min(best[enabled], elapsed / requests)
+
+        recorded = metrics.registry.overhead_seconds / (
+            requests * options['rounds'] + 1
+        )
+        self.stdout.write(
+            f'{"off ms":>8} {"on ms":>8} {"added us":>9} {"recorded us":>12}'
+        )
+        self.stdout.write(
+            f'{best[False] * 1000:>8.3f} {best[True] * 1000:>8.3f} '
+            f'{(best[True] - best[False]) * 1e6:>9.1f} '
+            f'{recorded * 1e6:>12.1f}'
+        )
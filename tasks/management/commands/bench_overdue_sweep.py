@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from tasks.models import Task
+from tasks.overdue import BATCH_SIZE, mark_overdue_tasks
+from ._seeding import create_bench_user, seed_tasks
+
+# Runtime target for a full sweep of 10M tasks
+TARGET_SECONDS = 300
+
+
+class Command(BaseCommand):
+    '''
+    Times the overdue sweep and extrapolates to 10M tasks.
+    Tasks are seeded like every benchmark's (see
+    _seeding.realistic_task()), so about 5% of them need marking.
+    Each run seeds its own user, which is deleted afterwards, and only
+    their tasks are swept.
+    '''
+    help = 'Benchmark the overdue sweep.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[100000, 1000000],
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"tasks":>9} {"marked":>9} {"sweep s":>8} '
+            f'{"tasks/s":>10} {"10M est. s":>11}'
+        )
+        for size in options['sizes']:
+            owner = create_bench_user(f'bench-overdue-{size}')
+            seed_tasks(owner, size)
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE tasks_task')
+
+            start = time.perf_counter()
+            marked = mark_overdue_tasks(
+                batch_size=options['batch_size'],
+                tasks=Task.objects.filter(owner=owner),
+            )
+            elapsed = time.perf_counter() - start
+            estimate = elapsed * 10_000_000 / size
+
+            Task.objects.filter(owner=owner)._raw_delete(connection.alias)
+            owner.delete()
+            self.stdout.write(
+                f'{size:>9} {marked:>9} {elapsed:>8.2f} '
+                f'{size / elapsed:>10,.0f} {estimate:>11.0f}'
+            )
+        self.stdout.write(f'Target for 10M tasks: {TARGET_SECONDS}s')
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tasks.models import Task
+from tasks.serializers import TaskSerializer, TaskRowSerializer
+from ._seeding import create_bench_user, seed_tasks
+
+
+class Command(BaseCommand):
+    '''
+    Compares TaskSerializer with the TaskRowSerializer fast path.
+    Data is created in a transaction that is rolled back.
+    '''
+    help = 'Benchmark task list serialization, in rows per second.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"tasks":>8} {"serializer rows/s":>18} '
+            f'{"fast path rows/s":>17} {"speedup":>8}'
+        )
+        for size in options['sizes']:
+            with transaction.atomic():
+                owner = create_bench_user(f'bench-rows-{size}')
+                seed_tasks(owner, size)
+                queryset = Task.objects.select_related(
+                    'owner', 'category'
+                ).filter(owner=owner)
+
+                start = time.perf_counter()
+                TaskSerializer(queryset, many=True).data
+                slow = time.perf_counter() - start
+
+                start = time.perf_counter()
+                rows = TaskRowSerializer()
+                rows.serialize(rows.get_rows(queryset))
+                fast = time.perf_counter() - start
+
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f'{size:>8} {size / slow:>18,.0f} '
+                f'{size / fast:>17,.0f} {slow / fast:>7.1f}x'
+            )
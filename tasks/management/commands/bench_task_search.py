@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.filters import SearchFilter
+from rest_framework.test import APIRequestFactory
+
+from tasks.filters import TaskSearchFilter
+from tasks.models import Task
+from tasks.views import TaskListView
+from ._seeding import create_bench_user, seed_tasks
+
+
+class Command(BaseCommand):
+    '''
+    Compares DRF's SearchFilter (LIKE '%term%') with TaskSearchFilter.
+    Data is created in a transaction that is rolled back.
+    '''
+    help = 'Benchmark task search over a synthetic corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--terms', nargs='+',
+            default=['tomatoes', 'pay invoice', 'gard', 'passport renew'],
+        )
+
+    def time_search(self, backend, owner, term, repeat):
+        '''
+        Returns the best time to run the view's search and fetch a page.
+        '''
+        view = TaskListView()
+        view.search_fields = TaskListView.search_fields
+        request = view.initialize_request(
+            APIRequestFactory().get('/tasks/', {'search': term})
+        )
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset = backend().filter_queryset(
+                request,
+                Task.objects.filter(owner=owner, is_archived=False),
+                view,
+            )
+            matches = queryset.count()
+            list(queryset[:100])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, matches
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            owner = create_bench_user('bench-search')
+            start = time.perf_counter()
+            seed_tasks(owner, options['size'])
+            self.stdout.write(
+                f'Seeded {options["size"]:,} tasks in '
+                f'{time.perf_counter() - start:.1f}s'
+            )
+
+            self.stdout.write(
+                f'{"term":>16} {"matches":>8} {"LIKE ms":>9} '
+                f'{"full-text ms":>13} {"speedup":>8}'
+            )
+            for term in options['terms']:
+                like, matches = self.time_search(
+                    SearchFilter, owner, term, options['repeat']
+                )
+                fts, fts_matches = self.time_search(
+                    TaskSearchFilter, owner, term, options['repeat']
+                )
+                self.stdout.write(
+                    f'{term:>16} {fts_matches:>8} {like * 1000:>9.1f} '
+                    f'{fts * 1000:>13.1f} {like / fts:>7.1f}x'
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,86 @@
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from profiles.purge import delete_in_chunks
+from tasks.models import Task
+from tasks.views import TaskListView
+from ._seeding import create_bench_user, seed_tasks
+
+
+class Command(BaseCommand):
+    '''
+    Compares the memory of a buffered and a streamed /tasks/ page.
+    - Peak Python allocations are traced with tracemalloc.
+    - Peak RSS is measured in a fresh process per mode, on a database
+      seeded by the parent; the data is deleted afterwards.
+    '''
+    help = 'Benchmark peak memory of buffered and streamed task lists.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=10000)
+        parser.add_argument(
+            '--mode', choices=['buffered', 'streamed'],
+            help='Measure one mode on existing data (used internally).',
+        )
+        parser.add_argument('--username', default='bench-stream')
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            return self.measure(options['username'], options['mode'])
+
+        owner = create_bench_user(options['username'])
+        try:
+            seed_tasks(owner, options['tasks'])
+            self.stdout.write(
+                f'{"mode":>9} {"traced peak":>12} {"peak RSS":>10} '
+                f'{"seconds":>8} {"bytes":>12}'
+            )
+            for mode in ['buffered', 'streamed']:
+                # A fresh process, ru_maxrss never goes down
+                result = subprocess.run(
+                    [sys.executable, sys.argv[0], 'bench_task_stream',
+                     '--mode', mode, '--username', owner.username],
+                    capture_output=True, text=True, check=True,
+                )
+                self.stdout.write(result.stdout.rstrip())
+        finally:
+            delete_in_chunks(Task.objects.filter(owner=owner), 5000)
+            owner.delete()
+
+    def measure(self, username, mode):
+        owner = User.objects.get(username=username)
+        request = APIRequestFactory().get(
+            '/tasks/',
+            {'stream': 'true'} if mode == 'streamed' else {},
+            HTTP_HOST=settings.ALLOWED_HOSTS[0],
+            HTTP_ACCEPT='application/json',
+        )
+        force_authenticate(request, user=owner)
+        view = TaskListView.as_view()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with override_settings(RESPONSE_CACHE={'ENABLED': False}):
+            response = view(request)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.render().content)
+        elapsed = time.perf_counter() - start
+        _, traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        self.stdout.write(
+            f'{mode:>9} {traced / 2**20:>10.1f}MB {rss / 1024:>8.1f}MB '
+            f'{elapsed:>8.2f} {size:>12,}'
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.overdue import BATCH_SIZE, OverdueScheduler, mark_overdue_tasks
+
+
+class Command(BaseCommand):
+    '''
+    Runs one overdue sweep, meant to be scheduled (eg. daily with cron).
+    With `--interval` it keeps running and sweeps every that many
+    seconds, eg. as its own Procfile process. Run one such process only.
+    '''
+    help = "Mark tasks whose due date has passed as 'Overdue'."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--interval', type=float)
+
+    def handle(self, *args, **options):
+        if options['interval']:
+            # In the foreground, until the process is stopped
+            OverdueScheduler(
+                options['interval'], options['batch_size']
+            ).run()
+            return
+        started = time.perf_counter()
+        marked = mark_overdue_tasks(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Marked {marked:,} tasks overdue '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
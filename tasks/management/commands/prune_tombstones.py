@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.sync import PRUNE_CHUNK_SIZE, prune_tombstones
+
+
+class Command(BaseCommand):
+    '''
+    Deletes task tombstones older than TASK_SYNC['TOMBSTONE_RETENTION_DAYS'],
+    meant to be scheduled (eg. daily with cron). Sync cursors older than
+    the retention are asked to start over instead.
+    '''
+    help = 'Delete tombstones of deleted tasks past their retention.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=PRUNE_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        deleted = prune_tombstones(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted:,} tombstones '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,286 @@
+import json
+import random
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from categories.models import Category
+from tasks.models import Task
+from ._seeding import NOUNS, VERBS
+
+# name: (method, path), `{task}` and `{category}` are ids of the user's,
+# `{created}` and `{created_category}` ones made by earlier scenarios
+SCENARIOS = {
+    'root': ('GET', '/'),
+    'tasks-list': ('GET', '/tasks/'),
+    'tasks-filter-priority': ('GET', '/tasks/?priority=High'),
+    'tasks-filter-status': ('GET', '/tasks/?status=In+Progress'),
+    'tasks-search': ('GET', '/tasks/?search={word}'),
+    'tasks-ordering': ('GET', '/tasks/?ordering=-due_date'),
+    'tasks-cursor': ('GET', '/tasks/?pagination=cursor'),
+    'task-detail': ('GET', '/tasks/{task}/'),
+    'task-create': ('POST', '/tasks/'),
+    'task-update': ('PATCH', '/tasks/{created}/'),
+    'task-archive': ('PATCH', '/tasks/{created}/'),
+    'task-delete': ('DELETE', '/tasks/{created}/'),
+    'tasks-bulk': ('POST', '/tasks/bulk/'),
+    'tasks-changes': ('GET', '/tasks/changes/'),
+    'archive-list': ('GET', '/archive/'),
+    'categories-list': ('GET', '/categories/'),
+    'category-detail': ('GET', '/categories/{category}/'),
+    'category-create': ('POST', '/categories/'),
+    'category-delete': ('DELETE', '/categories/{created_category}/'),
+    'profiles-list': ('GET', '/profiles/'),
+    'profile-detail': ('GET', '/profiles/{profile}/'),
+}
+REPORTED = ['p50_ms', 'p95_ms', 'p99_ms', 'queries']
+
+
+def percentile(values, share):
+    '''
+    Nearest-rank percentile of sorted values.
+    '''
+    index = max(0, min(len(values) - 1, round(share * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    '''
+    Requests every route of drf_api/urls.py as the users of `seed_data`
+    and reports their latency percentiles and queries per request.
+    - Scenarios run in the order of SCENARIOS, `--requests` times each,
+      spread over the first `--users` seeded users. Writes undo
+      themselves: created tasks are updated, archived, then deleted.
+    - Requests go to the app in process, with the test client, so no
+      server or network time is measured. The response cache is off
+      unless `--response-cache` is given.
+    - Login, account deletion, admin and /metrics/ are left out.
+    - `--output` saves the results as JSON, `--compare` prints the
+      change from a saved run.
+    '''
+    help = 'Benchmark the API end to end against seeded data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument(
+            '--scenario', nargs='+', choices=list(SCENARIOS),
+            default=list(SCENARIOS),
+        )
+        parser.add_argument('--response-cache', action='store_true')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Save the results to this file.')
+        parser.add_argument(
+            '--compare', help='Results file of an earlier run.'
+        )
+
+    def handle(self, *args, **options):
+        owners = list(User.objects.filter(
+            username__startswith=f'{options["prefix"]}-'
+        ).select_related('profile').order_by('id')[:options['users']])
+        if not owners:
+            raise CommandError(
+                f'No "{options["prefix"]}-" users, run seed_data first.'
+            )
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                previous = json.load(file)
+
+        self.random = random.Random(options['seed'])
+        users = [self.get_user(owner) for owner in owners]
+        response_cache = {
+            **settings.RESPONSE_CACHE, 'ENABLED': options['response_cache']
+        }
+        results = {}
+        try:
+            with override_settings(RESPONSE_CACHE=response_cache):
+                for user in users:
+                    # Warm up
+                    user['client'].get('/tasks/')
+                for name in options['scenario']:
+                    results[name] = self.run_scenario(
+                        name, users, options['requests']
+                    )
+        finally:
+            self.cleanup(users)
+
+        self.report(results, previous)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({
+                    'finished_at': datetime.now(timezone.utc).isoformat(),
+                    'database': connections['default'].vendor,
+                    'users': len(owners),
+                    'tasks': Task.objects.filter(owner__in=owners).count(),
+                    'requests': options['requests'],
+                    'response_cache': options['response_cache'],
+                    'results': results,
+                }, file, indent=2)
+            self.stdout.write(f'Saved to {options["output"]}')
+
+    def get_user(self, owner):
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        # Session authentication in DEV, JWT cookies otherwise
+        client.force_login(owner)
+        client.cookies[settings.JWT_AUTH_COOKIE] = str(
+            RefreshToken.for_user(owner).access_token
+        )
+        return {
+            'client': client,
+            'profile': owner.profile.id,
+            'tasks': list(Task.objects.filter(owner=owner).values_list(
+                'id', flat=True
+            )[:1000]),
+            'categories': list(Category.objects.filter(
+                owner=owner
+            ).values_list('id', flat=True)),
+            'created': [],
+            'created_categories': [],
+            'bulk': [],
+        }
+
+    def run_scenario(self, name, users, requests):
+        method, path = SCENARIOS[name]
+        latencies = []
+        queries = 0
+        errors = 0
+        for number in range(requests):
+            user = users[number % len(users)]
+            url, data = self.build_request(name, path, user, number)
+            count = [0]
+
+            def count_query(execute, sql, params, many, context):
+                count[0] += 1
+                return execute(sql, params, many, context)
+
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(count_query)
+                    )
+                start = time.perf_counter()
+                response = user['client'].generic(
+                    method, url, json.dumps(data) if data else '',
+                    content_type='application/json',
+                    HTTP_ACCEPT='application/json',
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append(time.perf_counter() - start)
+            queries += count[0]
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                self.after_response(name, user, response)
+
+        latencies.sort()
+        return {
+            'requests': requests,
+            'errors': errors,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'mean_ms': sum(latencies) / len(latencies) * 1000,
+            'queries': queries / requests,
+        }
+
+    def build_request(self, name, path, user, number):
+        '''
+        Returns the URL and body of the scenario's request.
+        '''
+        created = user['created']
+        if name == 'task-delete':
+            # Each delete takes one of the created tasks
+            created = [created.pop()] if created else []
+        created_categories = user['created_categories']
+        url = path.format(
+            word=self.random.choice(NOUNS),
+            task=self.random.choice(user['tasks'] or [0]),
+            category=self.random.choice(user['categories'] or [0]),
+            profile=user['profile'],
+            created=created[number % len(created)] if created else 0,
+            created_category=created_categories.pop()
+            if name == 'category-delete' and created_categories else 0,
+        )
+
+        if name == 'task-create':
+            return url, self.new_task(user)
+        if name == 'task-update':
+            return url, {'title': self.new_task(user)['title']}
+        if name == 'task-archive':
+            return url, {'status': 'Completed'}
+        if name == 'tasks-bulk':
+            delete, user['bulk'] = user['bulk'], []
+            return url, {
+                'create': [self.new_task(user) for _ in range(10)],
+                'delete': delete,
+            }
+        if name == 'category-create':
+            return url, {'name': f'Bench {number}'}
+        return url, None
+
+    def new_task(self, user):
+        return {
+            'title': f'{self.random.choice(VERBS)} '
+                     f'{self.random.choice(NOUNS)}',
+            'priority': self.random.choice(['Low', 'Medium', 'High']),
+            'category': self.random.choice(user['categories'] or [None]),
+        }
+
+    def after_response(self, name, user, response):
+        '''
+        Keeps the ids of what the scenario created.
+        '''
+        if name == 'task-create':
+            user['created'].append(response.json()['id'])
+        elif name == 'category-create':
+            user['created_categories'].append(response.json()['id'])
+        elif name == 'tasks-bulk':
+            user['bulk'] = [task['id'] for task in response.json()['created']]
+
+    def cleanup(self, users):
+        '''
+        Deletes what scenarios created and did not delete themselves.
+        '''
+        Task.objects.filter(
+            id__in=[task for user in users
+                    for task in user['created'] + user['bulk']]
+        ).delete()
+        Category.objects.filter(
+            id__in=[category for user in users
+                    for category in user['created_categories']]
+        ).delete()
+
+    def report(self, results, previous):
+        self.stdout.write(
+            f'{"scenario":<22} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"queries":>8} {"errors":>7}'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:<22} {result["p50_ms"]:>8.2f} '
+                f'{result["p95_ms"]:>8.2f} {result["p99_ms"]:>8.2f} '
+                f'{result["queries"]:>8.1f} {result["errors"]:>7}'
+            )
+            before = (previous or {}).get('results', {}).get(name)
+            if before:
+                line += '  ' + ' '.join(
+                    f'{key.split("_")[0]} {change(before[key], result[key])}'
+                    for key in REPORTED
+                )
+            self.stdout.write(line)
+
+
+def change(before, after):
+    if not before:
+        return 'n/a' if after else '+0%'
+    return f'{(after - before) / before:+.0%}'
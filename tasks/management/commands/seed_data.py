@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from ._seeding import delete_users, seed_users
+
+
+class Command(BaseCommand):
+    '''
+    Fills the database with users, categories and tasks to benchmark
+    against, see `run_benchmarks` and _seeding.realistic_task().
+    - Users are named `<prefix>-<n>` and share `--password`.
+    - `--clear` deletes the users of an earlier run with the same prefix
+      first. Without it, seeding over them fails.
+    - The same `--seed` gives the same data.
+    '''
+    help = 'Seed users x categories x tasks of synthetic data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument(
+            '--categories', type=int, default=5,
+            help='Categories per user, Uncategorized included.',
+        )
+        parser.add_argument(
+            '--tasks', type=int, default=1000, help='Tasks per user.',
+        )
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        prefix = options['prefix']
+        if options['clear']:
+            delete_users(
+                User.objects.filter(username__startswith=f'{prefix}-')
+            )
+
+        owners = seed_users(
+            prefix,
+            options['users'],
+            options['categories'],
+            options['tasks'],
+            options['password'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(owners):,} users with '
+            f'{len(owners) * options["tasks"]:,} tasks '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
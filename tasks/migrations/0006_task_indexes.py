@@ -0,0 +1,33 @@
+# Generated by Django 3.2.4 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_is_archived'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['owner', '-created_at', '-id'], name='task_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_archived', True)), fields=['owner', '-created_at', '-id'], name='task_archived_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['owner', 'status', '-created_at'], name='task_active_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['owner', 'priority', '-created_at'], name='task_active_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['owner', 'due_date'], name='task_active_due_date_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from tasks.search import install_search_index, uninstall_search_index
+
+
+def install(apps, schema_editor):
+    install_search_index(schema_editor.connection, backfill=True)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        ('tasks', '0006_task_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
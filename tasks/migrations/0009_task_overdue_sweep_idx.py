@@ -0,0 +1,17 @@
+# Generated by Django 3.2.4 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_task_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['status', 'due_date', 'id'], name='task_overdue_sweep_idx'),
+        ),
+    ]
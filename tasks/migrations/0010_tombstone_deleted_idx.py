@@ -0,0 +1,17 @@
+# Generated by Django 3.2.4 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_overdue_sweep_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tasktombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ),
+    ]
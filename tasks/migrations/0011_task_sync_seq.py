@@ -0,0 +1,77 @@
+# Generated by Django 3.2.4 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+def backfill_sync_seq(apps, schema_editor):
+    '''
+    Numbers every owner's tasks, then their tombstones, in the order they
+    changed, and moves the owner's counter past them.
+    '''
+    Profile = apps.get_model('profiles', 'Profile')
+    Task = apps.get_model('tasks', 'Task')
+    TaskTombstone = apps.get_model('tasks', 'TaskTombstone')
+    for profile in Profile.objects.only('pk', 'owner_id').iterator():
+        seq = 0
+        for model, field in [
+            (Task, 'updated_at'), (TaskTombstone, 'deleted_at'),
+        ]:
+            rows = []
+            for pk in model.objects.filter(
+                owner_id=profile.owner_id
+            ).order_by(field, 'id').values_list('id', flat=True).iterator():
+                seq += 1
+                rows.append(model(pk=pk, sync_seq=seq))
+            model.objects.bulk_update(rows, ['sync_seq'], batch_size=500)
+        Profile.objects.filter(pk=profile.pk).update(sync_seq=seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_profile_sync_seq'),
+        ('tasks', '0010_tombstone_deleted_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_owner_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tasktombstone',
+            name='tombstone_owner_deleted_idx',
+        ),
+        # A plain ADD COLUMN: on SQLite, AddField would rebuild the table
+        # and break the search triggers of tasks/search.py
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'ALTER TABLE tasks_task '
+                    'ADD COLUMN sync_seq bigint NOT NULL DEFAULT 0',
+                    'ALTER TABLE tasks_task DROP COLUMN sync_seq',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='task',
+                    name='sync_seq',
+                    field=models.BigIntegerField(default=0, editable=False),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tasktombstone',
+            name='sync_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'sync_seq'], name='task_owner_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasktombstone',
+            index=models.Index(fields=['owner', 'sync_seq'], name='tombstone_owner_seq_idx'),
+        ),
+        migrations.RunPython(backfill_sync_seq, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Q
+from django.utils import timezone
 from django.contrib.auth.models import User
 from categories.models import Category
+from .sequence import reserve_sequence
 
 
 class Task(models.Model):
@@ -45,15 +48,91 @@ class Task(models.Model):
 
     # Is Archived for completed tasks
     is_archived = models.BooleanField(default=False)
+    # Number of the last change in the owner's change sequence,
+    # see tasks/sequence.py
+    sync_seq = models.BigIntegerField(default=0, editable=False)
 
     def save(self, *args, **kwargs):
         """Automatically archive completed tasks."""
         if self.status == "Completed":
             self.is_archived = True
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'sync_seq'}
+        with transaction.atomic(using=router.db_for_write(Task)):
+            self.sync_seq = reserve_sequence(self.owner_id)
+            super().save(*args, **kwargs)
 
     class Meta:
         ordering = ['-created_at', 'owner']
+        # Every task query is scoped to one owner and one side of the
+        # archive, so the indexes are partial on is_archived
+        indexes = [
+            # Default newest-first lists, with id for keyset pagination
+            models.Index(
+                fields=['owner', '-created_at', '-id'],
+                condition=Q(is_archived=False),
+                name='task_active_created_idx',
+            ),
+            models.Index(
+                fields=['owner', '-created_at', '-id'],
+                condition=Q(is_archived=True),
+                name='task_archived_created_idx',
+            ),
+            # ?status=, ?priority= and ?ordering= on the active list
+            models.Index(
+                fields=['owner', 'status', '-created_at'],
+                condition=Q(is_archived=False),
+                name='task_active_status_idx',
+            ),
+            models.Index(
+                fields=['owner', 'priority', '-created_at'],
+                condition=Q(is_archived=False),
+                name='task_active_priority_idx',
+            ),
+            models.Index(
+                fields=['owner', 'due_date'],
+                condition=Q(is_archived=False),
+                name='task_active_due_date_idx',
+            ),
+            # The overdue sweep, see tasks/overdue.py
+            models.Index(
+                fields=['status', 'due_date', 'id'],
+                condition=Q(is_archived=False),
+                name='task_overdue_sweep_idx',
+            ),
+            # /tasks/changes/ reads in change sequence order
+            models.Index(
+                fields=['owner', 'sync_seq'], name='task_owner_seq_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.owner} | title: {self.title} | id = {self.id}'
+
+
+class TaskTombstone(models.Model):
+    '''
+    Left behind by a deleted task so /tasks/changes/ can report the delete.
+    Written by a post_delete signal in tasks/signals.py, pruned after
+    the retention by `prune_tombstones`, see tasks/sync.py.
+    '''
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    task_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    # Number of the delete in the owner's change sequence
+    sync_seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['owner', 'sync_seq'], name='tombstone_owner_seq_idx',
+            ),
+            # prune_tombstones() deletes by age across owners
+            models.Index(
+                fields=['deleted_at'], name='tombstone_deleted_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.owner} | deleted task id = {self.task_id}'
@@ -0,0 +1,116 @@
+'''
+Marks tasks whose due date has passed as 'Overdue'.
+
+The sweep runs in batches, one status at a time. Each batch is one short
+transaction:
+- read the next ids off the `task_overdue_sweep_idx` index, a range seek
+  on (status, due_date);
+- flip each owner's with an UPDATE that also sets `updated_at` and
+  takes numbers of the owner's change sequence, so /tasks/changes/
+  picks them up (see tasks/sequence.py);
+- bump their owners' data versions, so cached lists and ETags change.
+Updated rows leave the range being swept, so every batch starts at the
+front of it without an OFFSET.
+'''
+import logging
+import threading
+import time
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from drf_api.cache import bump_data_version
+from .models import Task
+from .sequence import resequence
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+# Statuses a task can go overdue from
+SWEEP_STATUSES = ['Pending', 'In Progress']
+
+
+def overdue_tasks(status, today=None, tasks=None):
+    '''
+    Active tasks in `status` that were due before `today`,
+    out of `tasks` (all tasks by default).
+    '''
+    if tasks is None:
+        tasks = Task.objects.all()
+    return tasks.filter(
+        is_archived=False,
+        status=status,
+        due_date__lt=today or timezone.localdate(),
+    )
+
+
+def mark_overdue_tasks(
+    today=None, batch_size=BATCH_SIZE, progress=None, tasks=None
+):
+    '''
+    Runs the sweep, returning the number of tasks marked Overdue.
+    - `progress(marked)` is called after every batch.
+    - `tasks` limits the sweep to a queryset, eg. one owner's tasks.
+    '''
+    today = today or timezone.localdate()
+    marked = 0
+    for status in SWEEP_STATUSES:
+        overdue = overdue_tasks(status, today, tasks)
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    overdue.order_by('due_date', 'id')
+                    .values_list('id', 'owner_id')[:batch_size]
+                )
+                if not batch:
+                    break
+                owners = {}
+                for task_id, owner_id in batch:
+                    owners.setdefault(owner_id, []).append(task_id)
+                # In owner order, as profile rows are locked in order.
+                # Re-checked, a task may have changed since it was read
+                for owner_id in sorted(owners):
+                    marked += resequence(
+                        overdue.filter(id__in=owners[owner_id]), owner_id,
+                        status='Overdue', updated_at=timezone.now(),
+                    )
+                bump_data_version(*owners)
+            if progress:
+                progress(marked)
+    return marked
+
+
+class OverdueScheduler(threading.Thread):
+    '''
+    Runs the sweep at once, then every `interval` seconds.
+    Meant for one dedicated process, `mark_overdue_tasks --interval`,
+    not the web workers: sweeps from several processes are safe, just
+    redundant.
+    '''
+    daemon = True
+
+    def __init__(self, interval, batch_size=BATCH_SIZE):
+        super().__init__(name='overdue-sweep')
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stopped = threading.Event()
+
+    def run(self):
+        while True:
+            close_old_connections()
+            try:
+                started = time.perf_counter()
+                marked = mark_overdue_tasks(batch_size=self.batch_size)
+                logger.info(
+                    'Marked %d tasks overdue in %.1fs',
+                    marked, time.perf_counter() - started,
+                )
+            except Exception:
+                logger.exception('Overdue sweep failed')
+            finally:
+                close_old_connections()
+            if self.stopped.wait(self.interval):
+                break
+
+    def stop(self):
+        self.stopped.set()
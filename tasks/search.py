@@ -0,0 +1,175 @@
+'''
+Database side of task full-text search.
+
+The search index is kept up to date by triggers, so it also covers
+bulk_create(), queryset.update() and raw deletes:
+- Postgres: a `search_vector` tsvector column on tasks_task with a GIN index.
+- SQLite: a `tasks_task_fts` FTS5 table keyed by task id.
+Both index the title, description and category name.
+'''
+from django.db import connections
+
+POSTGRES_INSTALL = [
+    'ALTER TABLE tasks_task ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    '''
+    CREATE OR REPLACE FUNCTION tasks_task_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT name FROM categories_category WHERE id = NEW.category_id),
+                ''
+            )), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS tasks_task_search_vector_update ON tasks_task',
+    '''
+    CREATE TRIGGER tasks_task_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description, category_id ON tasks_task
+    FOR EACH ROW EXECUTE PROCEDURE tasks_task_search_vector()
+    ''',
+    # Renaming a category re-runs the trigger above on its tasks
+    '''
+    CREATE OR REPLACE FUNCTION categories_category_search_vector()
+    RETURNS trigger AS $$
+    BEGIN
+        IF NEW.name IS DISTINCT FROM OLD.name THEN
+            UPDATE tasks_task SET category_id = category_id
+            WHERE category_id = NEW.id;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    DROP TRIGGER IF EXISTS categories_category_search_vector_update
+    ON categories_category
+    ''',
+    '''
+    CREATE TRIGGER categories_category_search_vector_update
+    AFTER UPDATE OF name ON categories_category
+    FOR EACH ROW EXECUTE PROCEDURE categories_category_search_vector()
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS tasks_task_search_vector_idx
+    ON tasks_task USING gin (search_vector)
+    ''',
+]
+
+POSTGRES_BACKFILL = 'UPDATE tasks_task SET title = title'
+
+POSTGRES_UNINSTALL = [
+    '''
+    DROP TRIGGER IF EXISTS categories_category_search_vector_update
+    ON categories_category
+    ''',
+    'DROP FUNCTION IF EXISTS categories_category_search_vector()',
+    'DROP TRIGGER IF EXISTS tasks_task_search_vector_update ON tasks_task',
+    'DROP FUNCTION IF EXISTS tasks_task_search_vector()',
+    'ALTER TABLE tasks_task DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_INSTALL = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_task_fts USING fts5(
+        title, description, category_name, tokenize = 'porter unicode61'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_insert
+    AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(rowid, title, description, category_name)
+        VALUES (
+            new.id, new.title, new.description,
+            (SELECT name FROM categories_category WHERE id = new.category_id)
+        );
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_update
+    AFTER UPDATE OF title, description, category_id ON tasks_task BEGIN
+        DELETE FROM tasks_task_fts WHERE rowid = old.id;
+        INSERT INTO tasks_task_fts(rowid, title, description, category_name)
+        VALUES (
+            new.id, new.title, new.description,
+            (SELECT name FROM categories_category WHERE id = new.category_id)
+        );
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_task_fts_delete
+    AFTER DELETE ON tasks_task BEGIN
+        DELETE FROM tasks_task_fts WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS categories_category_fts_update
+    AFTER UPDATE OF name ON categories_category BEGIN
+        UPDATE tasks_task_fts SET category_name = new.name
+        WHERE rowid IN (SELECT id FROM tasks_task WHERE category_id = new.id);
+    END
+    ''',
+]
+
+SQLITE_BACKFILL = '''
+    INSERT INTO tasks_task_fts(rowid, title, description, category_name)
+    SELECT task.id, task.title, task.description, category.name
+    FROM tasks_task task
+    LEFT JOIN categories_category category ON category.id = task.category_id
+'''
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS categories_category_fts_update',
+    'DROP TRIGGER IF EXISTS tasks_task_fts_delete',
+    'DROP TRIGGER IF EXISTS tasks_task_fts_update',
+    'DROP TRIGGER IF EXISTS tasks_task_fts_insert',
+    'DROP TABLE IF EXISTS tasks_task_fts',
+]
+
+
+def install_search_index(connection, backfill=False):
+    '''
+    Creates the search column or table and its triggers, if missing.
+    '''
+    if connection.vendor == 'postgresql':
+        statements, backfill_sql = POSTGRES_INSTALL, POSTGRES_BACKFILL
+    elif connection.vendor == 'sqlite':
+        statements, backfill_sql = SQLITE_INSTALL, SQLITE_BACKFILL
+    else:
+        return
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+        if backfill:
+            cursor.execute(backfill_sql)
+
+
+def uninstall_search_index(connection):
+    if connection.vendor == 'postgresql':
+        statements = POSTGRES_UNINSTALL
+    elif connection.vendor == 'sqlite':
+        statements = SQLITE_UNINSTALL
+    else:
+        return
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def ensure_search_triggers(sender, using, **kwargs):
+    '''
+    post_migrate receiver: SQLite migrations that rebuild a table drop
+    its triggers, so put back any that are missing.
+    '''
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    if 'tasks_task_fts' not in connection.introspection.table_names():
+        # Not installed, or migrated back past the search migration
+        return
+    with connection.cursor() as cursor:
+        for sql in SQLITE_INSTALL[1:]:
+            cursor.execute(sql)
@@ -0,0 +1,60 @@
+'''
+The per-user change sequence /tasks/changes/ pages on, see tasks/sync.py.
+
+Every write to a task, and every tombstone, takes the next numbers of its
+owner's Profile.sync_seq counter in the writing transaction:
+- The counter is bumped with an UPDATE, which locks the profile row until
+  the transaction commits. One user's writes therefore take their numbers
+  one transaction at a time and commit in number order.
+- Once a number is visible, every smaller number of that user is visible
+  too (or was rolled back), so a cursor can move past the last number it
+  read without ever skipping a row, however long a transaction runs or
+  whatever the clocks say.
+Task.save(), the bulk endpoint, the overdue sweep, tombstones, category
+renames and username changes all take numbers. Code that writes tasks
+any other way must call resequence() or reserve_sequence() itself.
+'''
+from django.db import models
+from django.db.models import Case, F, Value, When
+
+from profiles.models import Profile
+
+CHUNK_SIZE = 500
+
+
+def reserve_sequence(owner_id, count=1):
+    '''
+    Takes `count` numbers of the owner's sequence, returning the first.
+    Run it inside transaction.atomic(), before writing the rows.
+    An owner without a profile, only while being deleted, gets 0.
+    '''
+    profile = Profile.objects.filter(owner_id=owner_id)
+    if not profile.update(sync_seq=F('sync_seq') + count):
+        return 0
+    return profile.values_list('sync_seq', flat=True).get() - count + 1
+
+
+def resequence(queryset, owner_id, chunk_size=CHUNK_SIZE, **fields):
+    '''
+    Gives each of the owner's rows in `queryset` a new number, setting
+    `fields` too, with one UPDATE per chunk. Returns the rows updated.
+    Run it inside transaction.atomic().
+    '''
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    if not ids:
+        return 0
+    first = reserve_sequence(owner_id, len(ids))
+    updated = 0
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        updated += queryset.filter(pk__in=chunk).update(
+            sync_seq=Case(
+                *[
+                    When(pk=pk, then=Value(first + start + offset))
+                    for offset, pk in enumerate(chunk)
+                ],
+                output_field=models.BigIntegerField(),
+            ),
+            **fields,
+        )
+    return updated
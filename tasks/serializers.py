@@ -1,19 +1,28 @@
-from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from .models import Task
-from categories.models import Category
+from categories.fields import OwnedCategoryField
+from drf_api.metrics import MetricsSerializerMixin, serializer_timer
+from drf_api.sparse import SparseFieldsMixin
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(
+    MetricsSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     '''
     Read-only serializer for retrieving task data.
     - Ensures users can only see and assign their own categories.
+    - GETs can ask for some fields only, see drf_api/sparse.py.
     '''
+    sparse_sources = {
+        'owner': ['owner__username'],
+        'category_name': ['category__name'],
+    }
+
     owner = serializers.ReadOnlyField(source='owner.username')
-    category = serializers.PrimaryKeyRelatedField(
-        queryset=Category.objects.none(),
-        allow_null=True,
-        required=False,
-    )
+    category = OwnedCategoryField(allow_null=True, required=False)
     category_name = serializers.SerializerMethodField()
 
     class Meta:
@@ -37,17 +46,181 @@ class TaskSerializer(serializers.ModelSerializer):
             'is_archived',
         ]
 
-    def __init__(self, *args, **kwargs):
-        '''
-        Filter category choices based on the logged in user
-        '''
-        super().__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            self.fields[
-                'category'
-                ].queryset = Category.objects.filter(owner=request.user)
-    
     def get_category_name(self, obj):
         '''Returns the category name instead of just the ID'''
         return obj.category.name if obj.category else "No Category"
+
+
+class TaskBulkItemSerializer(serializers.ModelSerializer):
+    '''
+    Validates one task of a bulk create without touching the database.
+    - `category` is a plain id, ownership is checked once for the batch.
+    '''
+    category = serializers.IntegerField(allow_null=True, required=False)
+
+    class Meta:
+        model = Task
+        fields = [
+            'title',
+            'description',
+            'category',
+            'status',
+            'priority',
+            'due_date',
+        ]
+
+
+class TaskBulkUpdateItemSerializer(TaskBulkItemSerializer):
+    '''
+    One partial update of a bulk request, identified by its `id`.
+    Only the fields sent end up in validated_data.
+    '''
+    id = serializers.IntegerField()
+
+    class Meta(TaskBulkItemSerializer.Meta):
+        fields = ['id'] + TaskBulkItemSerializer.Meta.fields
+        extra_kwargs = {'title': {'required': False}}
+
+
+class TaskBulkSerializer(serializers.Serializer):
+    '''
+    Body of a bulk request: lists of creates, partial updates and
+    task ids to delete, all optional.
+    '''
+    max_items = 500
+
+    create = TaskBulkItemSerializer(many=True, required=False)
+    update = TaskBulkUpdateItemSerializer(many=True, required=False)
+    delete = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+    def validate(self, data):
+        data.setdefault('create', [])
+        data.setdefault('update', [])
+        data.setdefault('delete', [])
+        total = len(data['create']) + len(data['update']) + len(data['delete'])
+        if total > self.max_items:
+            raise serializers.ValidationError(
+                f'A bulk request can change at most {self.max_items} tasks.'
+            )
+        ids = [item['id'] for item in data['update']] + data['delete']
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Each task can only be updated or deleted once.'
+            )
+        return data
+
+
+def datetime_formatter(output_format):
+    '''
+    Returns a function formatting datetimes exactly like
+    DRF's DateTimeField.to_representation with the given format.
+    '''
+    field_timezone = (
+        timezone.get_current_timezone() if settings.USE_TZ else None
+    )
+
+    def localise(value):
+        if field_timezone is None:
+            if timezone.is_aware(value):
+                return timezone.make_naive(value, timezone.utc)
+            return value
+        if timezone.is_aware(value):
+            return value.astimezone(field_timezone)
+        return timezone.make_aware(value, field_timezone)
+
+    if output_format is None:
+        return lambda value: value or None
+
+    if output_format.lower() == ISO_8601:
+        def format_iso(value):
+            if not value:
+                return None
+            value = localise(value).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return format_iso
+
+    def format_datetime(value):
+        if not value:
+            return None
+        return localise(value).strftime(output_format)
+    return format_datetime
+
+
+def date_formatter(output_format):
+    '''
+    Returns a function formatting dates exactly like
+    DRF's DateField.to_representation with the given format.
+    '''
+    if output_format is None:
+        return lambda value: value or None
+    if output_format.lower() == ISO_8601:
+        return lambda value: value.isoformat() if value else None
+    return lambda value: value.strftime(output_format) if value else None
+
+
+class TaskRowSerializer:
+    '''
+    Read-only fast path for task lists.
+    - Selects only the serialized columns with values_list(),
+      joining owner and category, instead of building Task instances.
+    - Formats each row with formatters built once per request.
+    - Output is identical to TaskSerializer's.
+    '''
+    # TaskSerializer field -> column to select
+    COLUMNS = {
+        'id': 'id',
+        'owner': 'owner__username',
+        'title': 'title',
+        'description': 'description',
+        'category': 'category_id',
+        'category_name': 'category__name',
+        'status': 'status',
+        'priority': 'priority',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+        'due_date': 'due_date',
+        'is_archived': 'is_archived',
+    }
+
+    def __init__(self, fields=None):
+        self.fields = list(
+            TaskSerializer.Meta.fields if fields is None else fields
+        )
+        self.columns = [self.COLUMNS[field] for field in self.fields]
+
+        format_datetime = datetime_formatter(api_settings.DATETIME_FORMAT)
+        formatters = {
+            'category_name': lambda name: "No Category" if name is None else name,
+            'created_at': format_datetime,
+            'updated_at': format_datetime,
+            'due_date': date_formatter(api_settings.DATE_FORMAT),
+        }
+        # Every other column is already in its serialized form
+        self.formatters = [
+            (field, formatters[field])
+            for field in self.fields if field in formatters
+        ]
+
+    def get_rows(self, queryset, extra_columns=()):
+        '''
+        Returns the queryset as named rows of the serialized columns.
+        Extra columns (eg. pagination keys) go after them.
+        '''
+        columns = self.columns + [
+            column for column in extra_columns if column not in self.columns
+        ]
+        return queryset.values_list(*columns, named=True)
+
+    def to_representation(self, row):
+        data = dict(zip(self.fields, row))
+        for field, formatter in self.formatters:
+            data[field] = formatter(data[field])
+        return data
+
+    def serialize(self, rows):
+        with serializer_timer():
+            return [self.to_representation(row) for row in rows]
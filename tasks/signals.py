@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from drf_api.cache import bump_data_version
+from .models import Task, TaskTombstone
+from .sequence import reserve_sequence, resequence
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def bump_owner_data_version(sender, instance, **kwargs):
+    '''
+    Invalidates the owner's cached task and category lists.
+    '''
+    bump_data_version(instance.owner_id)
+
+
+@receiver(post_delete, sender=Task)
+def create_tombstone(sender, instance, **kwargs):
+    '''
+    Records the delete for /tasks/changes/.
+    '''
+    TaskTombstone.objects.create(
+        owner_id=instance.owner_id, task_id=instance.id,
+        sync_seq=reserve_sequence(instance.owner_id),
+    )
+
+
+@receiver(pre_save, sender=User)
+def check_username_change(sender, instance, update_fields=None, **kwargs):
+    '''
+    Notes whether the username changes, tasks are synced with it.
+    '''
+    instance._username_changed = bool(
+        instance.pk
+        and (update_fields is None or 'username' in update_fields)
+        and User.objects.filter(pk=instance.pk).exclude(
+            username=instance.username
+        ).exists()
+    )
+
+
+@receiver(post_save, sender=User)
+def resequence_renamed_owner_tasks(sender, instance, **kwargs):
+    '''
+    Sends every task of a renamed user to /tasks/changes/ again.
+    '''
+    if getattr(instance, '_username_changed', False):
+        with transaction.atomic():
+            resequence(Task.objects.filter(owner=instance), instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def delete_owner_tombstones(sender, instance, **kwargs):
+    '''
+    Deleting a user deletes their tasks after collecting their tombstones,
+    so the tombstones written meanwhile are removed here.
+    '''
+    TaskTombstone.objects.filter(owner_id=instance.pk).delete()
@@ -0,0 +1,113 @@
+'''
+Cursors for the /tasks/changes/ delta sync.
+
+A cursor holds the last number of the owner's change sequence sent for
+tasks, the same for tombstones, and when the cursor was issued, base64
+encoded so clients treat it as opaque. Numbers commit in order (see
+tasks/sequence.py), so paging on them alone never skips a row.
+
+Tombstones are kept for TASK_SYNC['TOMBSTONE_RETENTION_DAYS'], then
+pruned by `python manage.py prune_tombstones`. A cursor issued longer
+ago than that may have missed deletes, so it is answered with
+ResyncRequired (410) and the client starts over with a first sync.
+'''
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from profiles.purge import delete_in_chunks
+from .models import TaskTombstone
+
+DEFAULTS = {
+    'TOMBSTONE_RETENTION_DAYS': 30,
+}
+PRUNE_CHUNK_SIZE = 5000
+
+
+class ResyncRequired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = (
+        'This cursor is older than deleted tasks are kept, '
+        'sync again without `since`.'
+    )
+    default_code = 'resync_required'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TASK_SYNC', {})}
+
+
+def get_retention():
+    return timedelta(days=get_config()['TOMBSTONE_RETENTION_DAYS'])
+
+
+def is_expired(issued_at, now=None):
+    '''
+    Whether tombstones a cursor has not seen yet may have been pruned.
+    '''
+    return issued_at < (now or timezone.now()) - get_retention()
+
+
+def prune_tombstones(now=None, chunk_size=PRUNE_CHUNK_SIZE):
+    '''
+    Deletes tombstones older than the retention, in chunks.
+    Returns how many were deleted.
+    '''
+    cutoff = (now or timezone.now()) - get_retention()
+    deleted = [0]
+
+    def count(chunk):
+        deleted[0] += chunk
+
+    delete_in_chunks(
+        TaskTombstone.objects.filter(deleted_at__lt=cutoff),
+        chunk_size, on_chunk=count,
+    )
+    return deleted[0]
+
+
+def encode_cursor(tasks_seq, tombstones_seq, issued_at):
+    data = json.dumps(
+        [tasks_seq, tombstones_seq, issued_at.isoformat()],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor):
+    '''
+    Returns the (tasks seq, tombstones seq, issued at) of a cursor.
+    Raises ValueError for anything encode_cursor() did not produce.
+    '''
+    def is_seq(value):
+        return type(value) is int
+
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        tasks_seq, tombstones_seq, issued_at = data
+        issued_at = datetime.fromisoformat(issued_at)
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if (
+        not (tasks_seq is None or is_seq(tasks_seq))
+        or not is_seq(tombstones_seq)
+        or issued_at.tzinfo is None
+    ):
+        raise ValueError('Invalid cursor')
+    return tasks_seq, tombstones_seq, issued_at
+
+
+def after(queryset, seq):
+    '''
+    Rows numbered after `seq` (every row for None), in sequence order.
+    '''
+    queryset = queryset.order_by('sync_seq')
+    if seq is None:
+        return queryset
+    return queryset.filter(sync_seq__gt=seq)
@@ -1,8 +1,33 @@
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIRequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from rest_framework import status
 from django.contrib.auth.models import User
-from .models import Task
-from datetime import date
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management import CommandError, call_command
+from categories.models import Category
+from profiles.models import Profile
+from .management.commands import run_benchmarks
+from .management.commands import _seeding
+from .management.commands._seeding import create_bench_user, seed_tasks
+from .models import Task, TaskTombstone
+from .serializers import TaskSerializer, TaskRowSerializer
+from .views import TaskListView, ArchivedTaskListView
+from drf_api import cache, streaming
+from drf_api.pagination import PageOrCursorPagination
+from .overdue import OverdueScheduler, mark_overdue_tasks, overdue_tasks
+from .sync import decode_cursor, encode_cursor
+from django.utils import timezone
+from datetime import date, datetime, timedelta
+from io import StringIO
+import json
+import tempfile
+import time
+from unittest import mock
 
 
 class TaskListTests(APITestCase):
@@ -418,3 +443,1426 @@ class TaskFilteringTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data[0]['title'], "Task 3")
         self.assertEqual(response.data[2]['title'], "Task 1")
+
+
+class TaskCursorPaginationTests(APITestCase):
+    '''
+    Tests for keyset (cursor) pagination of the task lists.
+    '''
+
+    def setUp(self):
+        '''
+        Create a test user with tasks sharing created_at timestamps
+        and some missing due dates.
+        '''
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+
+        for i in range(7):
+            Task.objects.create(
+                owner=self.user,
+                title=f"Task {i}",
+                due_date=date(2024, 2, i + 1) if i % 3 else None,
+            )
+        # Force ties so the id tie-breaker is exercised
+        first = Task.objects.order_by('id').first()
+        Task.objects.filter(id__lte=first.id + 3).update(
+            created_at=first.created_at
+        )
+
+    def walk(self, url):
+        '''
+        Follows `next` links and returns the ids of every page.
+        '''
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            self.assertLessEqual(len(response.data['results']), 3)
+            ids.extend(task['id'] for task in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_cursor_pages_follow_default_ordering(self):
+        '''
+        Walking the cursor pages returns every task once,
+        newest first with id as the tie-breaker.
+        '''
+        ids = self.walk('/tasks/?pagination=cursor&page_size=3')
+        expected = list(
+            Task.objects.order_by('-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_cursor_pages_with_ordering_param(self):
+        '''
+        Cursor pages honour ?ordering=, with null due dates last.
+        '''
+        ids = self.walk(
+            '/tasks/?pagination=cursor&page_size=3&ordering=due_date'
+        )
+        with_due_date = list(
+            Task.objects.filter(due_date__isnull=False)
+            .order_by('due_date', 'id').values_list('id', flat=True)
+        )
+        without_due_date = list(
+            Task.objects.filter(due_date__isnull=True)
+            .order_by('id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, with_due_date + without_due_date)
+
+    def test_cursor_pages_with_ids_filter(self):
+        '''
+        Cursor pages only contain the tasks requested with ?ids=.
+        '''
+        wanted = list(Task.objects.values_list('id', flat=True)[:4])
+        ids_param = ",".join(str(task_id) for task_id in wanted)
+        ids = self.walk(
+            f'/tasks/?pagination=cursor&page_size=3&ids={ids_param}'
+        )
+        self.assertEqual(sorted(ids), sorted(wanted))
+
+    def test_previous_link_returns_previous_page(self):
+        '''
+        The previous link of the second page returns the first page.
+        '''
+        first = self.client.get('/tasks/?pagination=cursor&page_size=3')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [task['id'] for task in back.data['results']],
+            [task['id'] for task in first.data['results']],
+        )
+        self.assertIsNone(back.data['previous'])
+
+    def test_invalid_cursor(self):
+        '''
+        A tampered cursor returns 404 Not Found.
+        '''
+        # base64 of 'p=[1]', a position with too few keys
+        response = self.client.get('/tasks/?cursor=cD1bMV0=')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_pagination_is_default(self):
+        '''
+        Existing clients still get page number pagination.
+        '''
+        response = self.client.get('/tasks/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 7)
+
+
+class TaskIndexUsageTests(TestCase):
+    '''
+    EXPLAIN based checks that every list and filter combination
+    is answered from an index rather than a full table scan.
+    '''
+    QUERIES = [
+        '',
+        '?status=Pending',
+        '?priority=High',
+        '?priority=Low&status=Overdue',
+        '?ordering=due_date',
+        '?ordering=-due_date&status=Pending',
+        '?ordering=priority',
+        '?ordering=status',
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are always cheaper to seq scan,
+            # so make the planner show which index it would use
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def get_queryset(self, view_class, query):
+        '''
+        Returns the queryset the view would run for the given query string.
+        '''
+        view = view_class()
+        view.request = view.initialize_request(
+            APIRequestFactory().get('/tasks/' + query)
+        )
+        view.request.user = self.user
+        view.format_kwarg = None
+        view.kwargs = {}
+        return view.filter_queryset(view.get_queryset())
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            self.assertRegex(plan, r'SEARCH tasks_task USING (COVERING )?INDEX')
+            self.assertNotRegex(plan, r'SCAN tasks_task(?! USING)')
+        elif connection.vendor == 'postgresql':
+            self.assertIn('Index', plan)
+            self.assertNotIn('Seq Scan on tasks_task', plan)
+
+    def test_active_task_list_uses_index(self):
+        '''
+        The active task list and each of its filters use an index.
+        '''
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertUsesIndex(self.get_queryset(TaskListView, query))
+
+    def test_archived_task_list_uses_index(self):
+        '''
+        The archived task list and each of its filters use an index.
+        '''
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertUsesIndex(
+                    self.get_queryset(ArchivedTaskListView, query)
+                )
+
+    def test_active_filters_use_partial_indexes(self):
+        '''
+        The active list filters use the partial indexes made for them.
+        '''
+        if connection.vendor != 'sqlite':
+            self.skipTest('Index choice is only stable on SQLite')
+        expected = {
+            '': 'task_active_created_idx',
+            '?status=Pending': 'task_active_status_idx',
+            '?priority=High': 'task_active_priority_idx',
+            '?ordering=due_date': 'task_active_due_date_idx',
+        }
+        for query, index in expected.items():
+            with self.subTest(query=query):
+                plan = self.get_queryset(TaskListView, query).explain()
+                self.assertIn(index, plan)
+
+
+class TaskQueryCountTests(APITestCase):
+    '''
+    Tests that task endpoints run a fixed number of queries,
+    however many tasks are returned.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.category = Category.objects.create(owner=self.user, name="Work")
+
+    def create_tasks(self, count, **kwargs):
+        for i in range(count):
+            Task.objects.create(
+                owner=self.user,
+                title=f"Task {i}",
+                category=self.category if i % 2 else None,
+                **kwargs
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_task_list_query_count_is_constant(self):
+        '''
+        Listing 3 or 12 tasks runs the same number of queries.
+        '''
+        self.create_tasks(3)
+        small = self.count_queries('/tasks/')
+        self.create_tasks(9)
+        self.assertEqual(self.count_queries('/tasks/'), small)
+
+    def test_archive_list_query_count_is_constant(self):
+        '''
+        Listing 3 or 12 archived tasks runs the same number of queries.
+        '''
+        self.create_tasks(3, status="Completed")
+        small = self.count_queries('/archive/')
+        self.create_tasks(9, status="Completed")
+        self.assertEqual(self.count_queries('/archive/'), small)
+
+    def test_task_detail_loads_relations_in_one_query(self):
+        '''
+        Task detail does not query the owner or category separately.
+        '''
+        self.create_tasks(2)
+        task = Task.objects.filter(category=self.category).first()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/tasks/{task.id}/')
+        task_queries = [
+            query for query in queries
+            if 'tasks_task' in query['sql']
+            or 'categories_category' in query['sql']
+        ]
+        self.assertEqual(len(task_queries), 1)
+
+    def validate(self, data):
+        request = Request(APIRequestFactory().post('/tasks/'))
+        request.user = self.user
+        serializer = TaskSerializer(
+            data=data, many=True, context={'request': request}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            serializer.is_valid()
+        return serializer, len(queries)
+
+    def test_category_ownership_checked_once_per_request(self):
+        '''
+        Validating many tasks loads the user's categories once.
+        '''
+        other = Category.objects.create(owner=self.user, name="Home")
+        serializer, count = self.validate([
+            {'title': f'Task {i}', 'category': category.id}
+            for i, category in enumerate([self.category, other] * 5)
+        ])
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(count, 1)
+        self.assertEqual(
+            serializer.validated_data[1]['category'], other
+        )
+
+    def test_foreign_category_is_rejected(self):
+        other_user = User.objects.create_user(
+            username="otheruser",
+            password="password123"
+        )
+        foreign = Category.objects.create(owner=other_user, name="Theirs")
+        serializer, _ = self.validate([
+            {'title': 'Mine', 'category': foreign.id},
+            {'title': 'Typo', 'category': 'work'},
+            {'title': 'Flag', 'category': True},
+        ])
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors[0]['category'][0].code, 'does_not_exist'
+        )
+        self.assertEqual(
+            serializer.errors[1]['category'][0].code, 'incorrect_type'
+        )
+        self.assertEqual(
+            serializer.errors[2]['category'][0].code, 'incorrect_type'
+        )
+
+
+# Both paths are requested at the same URL, keep the cache out of it
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class TaskRowSerializerTests(APITestCase):
+    '''
+    Tests that the values() fast path renders exactly what
+    TaskSerializer renders.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        category = Category.objects.create(owner=self.user, name="Wörk")
+        Task.objects.create(
+            owner=self.user,
+            title="With everything",
+            description="Line one\nline two \u2028",
+            category=category,
+            priority="High",
+            due_date=date(2024, 2, 15),
+        )
+        Task.objects.create(owner=self.user, title="Bare")
+        Task.objects.create(
+            owner=self.user,
+            title="Done",
+            category=category,
+            status="Completed",
+        )
+
+    def assertSameAsSerializer(self, url):
+        with override_settings(TASKS_FAST_READ=False):
+            expected = self.client.get(url)
+        with override_settings(TASKS_FAST_READ=True):
+            actual = self.client.get(url)
+        self.assertEqual(actual.status_code, status.HTTP_200_OK)
+        self.assertEqual(actual.content, expected.content)
+
+    def test_task_list_matches_serializer(self):
+        self.assertSameAsSerializer('/tasks/')
+
+    def test_archive_list_matches_serializer(self):
+        self.assertSameAsSerializer('/archive/')
+
+    def test_cursor_page_matches_serializer(self):
+        self.assertSameAsSerializer(
+            '/tasks/?pagination=cursor&page_size=1&ordering=due_date'
+        )
+
+    def test_iso_formats_match_serializer(self):
+        '''
+        The fast path follows DATE_FORMAT and DATETIME_FORMAT.
+        '''
+        rest_framework = dict(
+            settings.REST_FRAMEWORK,
+            DATE_FORMAT='iso-8601',
+            DATETIME_FORMAT='iso-8601',
+        )
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            self.assertSameAsSerializer('/tasks/')
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class TaskStreamingTests(APITestCase):
+    '''
+    Tests for streamed task lists with `?stream=true`.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        category = Category.objects.create(owner=self.user, name="Wörk")
+        for i in range(5):
+            Task.objects.create(
+                owner=self.user,
+                title=f"Task {i}",
+                description="Line one\nline two \u2028",
+                category=category if i % 2 else None,
+                due_date=date(2024, 2, 15),
+            )
+
+    def get_streamed(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_stream_matches_buffered_response(self):
+        expected = self.client.get('/tasks/').content
+        self.assertEqual(self.get_streamed('/tasks/?stream=true'), expected)
+
+    def test_chunks_join_into_the_same_json(self):
+        rows = TaskRowSerializer()
+        queryset = rows.get_rows(Task.objects.order_by('id'))
+        envelope = {'count': 5, 'next': None, 'previous': None}
+        streamed = b''.join(streaming.iter_json(
+            envelope, queryset, rows.serialize, JSONRenderer(), chunk_size=2
+        ))
+        expected = JSONRenderer().render(
+            {**envelope, 'results': rows.serialize(queryset)}
+        )
+        self.assertEqual(streamed, expected)
+
+    @mock.patch.object(PageOrCursorPagination, 'page_size', 2)
+    def test_pages_are_streamed(self):
+        data = json.loads(self.get_streamed('/archive/?stream=true'))
+        self.assertEqual(data['count'], 0)
+        data = json.loads(self.get_streamed('/tasks/?stream=true&page=2'))
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(len(data['results']), 2)
+        self.assertIn('page=3', data['next'])
+        self.assertIn('stream=true', data['next'])
+        response = self.client.get('/tasks/?stream=true&page=9')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_only_json_page_number_lists_are_streamed(self):
+        for url in [
+            '/tasks/',
+            '/tasks/?stream=true&format=api',
+            '/tasks/?stream=true&pagination=cursor',
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(response.streaming)
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': True})
+    def test_streamed_responses_are_not_cached(self):
+        for _ in range(2):
+            response = self.client.get('/tasks/?stream=true')
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['X-Cache'], 'MISS')
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class TaskSparseFieldsTests(APITestCase):
+    '''
+    Tests for `?fields=` and `?omit=` on task endpoints.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        category = Category.objects.create(owner=self.user, name="Work")
+        self.task = Task.objects.create(
+            owner=self.user,
+            title="Task",
+            description="Long description",
+            category=category,
+        )
+        Task.objects.create(owner=self.user, title="Other")
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        task_queries = [
+            query['sql'] for query in queries
+            if 'FROM "tasks_task"' in query['sql']
+        ]
+        return response, task_queries[-1]
+
+    def test_fields_narrow_payload_and_select(self):
+        for fast_read in [True, False]:
+            with override_settings(TASKS_FAST_READ=fast_read):
+                response, sql = self.get(
+                    '/tasks/?fields=id,title,status,due_date'
+                )
+            self.assertEqual(
+                list(response.data['results'][0]),
+                ['id', 'title', 'status', 'due_date'],
+            )
+            self.assertNotIn('description', sql)
+            self.assertNotIn('JOIN', sql)
+
+    def test_omit_keeps_needed_joins(self):
+        response, sql = self.get('/tasks/?omit=description,owner')
+        task = response.data['results'][-1]
+        self.assertNotIn('description', task)
+        self.assertNotIn('owner', task)
+        self.assertEqual(task['category_name'], 'Work')
+        self.assertIn('categories_category', sql)
+        self.assertNotIn('auth_user', sql)
+
+    def test_cursor_pages_with_fields(self):
+        response, _ = self.get(
+            '/tasks/?fields=title&pagination=cursor&page_size=1'
+        )
+        self.assertEqual(response.data['results'], [{'title': 'Other'}])
+        response, _ = self.get(response.data['next'])
+        self.assertEqual(response.data['results'], [{'title': 'Task'}])
+
+    def test_detail_fields(self):
+        response, sql = self.get(f'/tasks/{self.task.id}/?fields=title')
+        self.assertEqual(response.data, {'title': 'Task'})
+        self.assertNotIn('JOIN', sql)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/tasks/?fields=title,secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+
+    def test_writes_ignore_fields(self):
+        response = self.client.put(
+            f'/tasks/{self.task.id}/?fields=title',
+            {'title': 'Renamed', 'status': 'In Progress'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'In Progress')
+        self.assertIn('description', response.data)
+
+
+class TaskSearchTests(APITestCase):
+    '''
+    Tests for full-text search over title, description and category name.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="otheruser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.garden = Category.objects.create(owner=self.user, name="Garden")
+
+        self.title_match = Task.objects.create(
+            owner=self.user,
+            title="Plant tomatoes",
+            description="Buy seedlings first",
+        )
+        self.description_match = Task.objects.create(
+            owner=self.user,
+            title="Weekend jobs",
+            description="Water the tomatoes",
+            category=self.garden,
+        )
+        self.no_match = Task.objects.create(
+            owner=self.user,
+            title="Pay rent",
+        )
+        Task.objects.create(owner=self.other, title="Eat tomatoes")
+
+    def search(self, term, url='/tasks/'):
+        response = self.client.get(url, {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task['id'] for task in response.data['results']]
+
+    def test_search_is_ranked(self):
+        '''
+        Title matches rank above description matches,
+        other users' tasks are never returned.
+        '''
+        self.assertEqual(
+            self.search('tomatoes'),
+            [self.title_match.id, self.description_match.id]
+        )
+
+    def test_search_matches_prefixes(self):
+        self.assertEqual(self.search('tomat'), [
+            self.title_match.id, self.description_match.id
+        ])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('water tomato'), [
+            self.description_match.id
+        ])
+
+    def test_search_category_name(self):
+        self.assertEqual(self.search('garden'), [self.description_match.id])
+
+    def test_search_follows_category_rename(self):
+        self.garden.name = "Allotment"
+        self.garden.save()
+        self.assertEqual(self.search('garden'), [])
+        self.assertEqual(self.search('allotment'), [self.description_match.id])
+
+    def test_search_follows_task_changes(self):
+        self.no_match.title = "Pay for tomatoes"
+        self.no_match.save()
+        self.title_match.delete()
+        self.assertEqual(sorted(self.search('tomatoes')), sorted([
+            self.description_match.id, self.no_match.id
+        ]))
+
+    def test_search_with_ordering(self):
+        '''
+        ?ordering= takes precedence over the search rank.
+        '''
+        self.title_match.due_date = date(2024, 5, 1)
+        self.title_match.save()
+        self.description_match.due_date = date(2024, 1, 1)
+        self.description_match.save()
+        response = self.client.get(
+            '/tasks/', {'search': 'tomatoes', 'ordering': 'due_date'}
+        )
+        self.assertEqual(
+            [task['id'] for task in response.data['results']],
+            [self.description_match.id, self.title_match.id]
+        )
+
+    def test_search_cursor_pages_need_ordering(self):
+        response = self.client.get(
+            '/tasks/', {'search': 'tomatoes', 'pagination': 'cursor'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cursor', response.data)
+        response = self.client.get('/tasks/', {
+            'search': 'tomatoes', 'pagination': 'cursor',
+            'ordering': 'due_date', 'page_size': 1,
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [task['id'] for task in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [task['id'] for task in response.data['results']]
+        self.assertEqual(
+            set(ids), {self.title_match.id, self.description_match.id}
+        )
+
+    def test_search_archive(self):
+        self.title_match.status = "Completed"
+        self.title_match.save()
+        self.assertEqual(self.search('tomatoes', '/archive/'), [
+            self.title_match.id
+        ])
+
+    def test_search_without_words(self):
+        '''
+        Punctuation only searches are ignored.
+        '''
+        self.assertEqual(len(self.search('"*')), 3)
+
+
+@override_settings(RESPONSE_CACHE={
+    'BACKEND': 'drf_api.cache.LRUBackend',
+    'OPTIONS': {'max_entries': 100},
+})
+class TaskResponseCacheTests(APITestCase):
+    '''
+    Tests the per-user list cache and its invalidation.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="otheruser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.task = Task.objects.create(owner=self.user, title="Cached")
+        cache.stats.reset()
+
+    def get_titles(self, url='/tasks/', **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [task['title'] for task in response.data['results']]
+        return response['X-Cache'], titles
+
+    def test_second_request_is_a_hit(self):
+        self.assertEqual(self.get_titles(), ('MISS', ['Cached']))
+        with self.assertNumQueries(3):
+            # Session, user and data version only
+            self.assertEqual(self.get_titles(), ('HIT', ['Cached']))
+        self.assertEqual(cache.stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    def test_query_params_are_normalized(self):
+        self.get_titles(priority='Low', status='Pending')
+        response = self.client.get('/tasks/?status=Pending&priority=Low')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(self.get_titles(status='Pending')[0], 'MISS')
+
+    def test_task_writes_invalidate(self):
+        self.get_titles()
+        Task.objects.create(owner=self.user, title="New")
+        self.assertEqual(self.get_titles(), ('MISS', ['New', 'Cached']))
+
+        self.task.title = "Renamed"
+        self.task.save()
+        self.assertEqual(self.get_titles(), ('MISS', ['New', 'Renamed']))
+
+        self.task.delete()
+        self.assertEqual(self.get_titles(), ('MISS', ['New']))
+
+    def test_completing_a_task_invalidates_archive(self):
+        self.assertEqual(self.get_titles('/archive/'), ('MISS', []))
+        self.client.put(
+            f'/tasks/{self.task.id}/',
+            {'title': 'Cached', 'status': 'Completed'},
+            format='json'
+        )
+        self.assertEqual(self.get_titles('/archive/'), ('MISS', ['Cached']))
+        self.assertEqual(self.get_titles(), ('MISS', []))
+
+    def test_category_writes_invalidate(self):
+        self.get_titles()
+        Category.objects.create(owner=self.user, name="Home")
+        self.assertEqual(self.get_titles()[0], 'MISS')
+
+    def test_other_users_writes_do_not_invalidate(self):
+        self.get_titles()
+        Task.objects.create(owner=self.other, title="Not mine")
+        self.assertEqual(self.get_titles(), ('HIT', ['Cached']))
+
+    def test_users_do_not_share_entries(self):
+        self.get_titles()
+        self.client.login(username="otheruser", password="password123")
+        self.assertEqual(self.get_titles(), ('MISS', []))
+
+    def test_bulk_writes_need_an_explicit_bump(self):
+        '''
+        queryset.update() sends no signals, bump_data_version() covers it.
+        '''
+        self.get_titles()
+        Task.objects.filter(owner=self.user).update(title="Updated")
+        cache.bump_data_version(self.user.id)
+        self.assertEqual(self.get_titles(), ('MISS', ['Updated']))
+
+    def test_username_change_invalidates(self):
+        for url in ['/tasks/', '/archive/', '/categories/']:
+            self.client.get(url)
+        self.user.username = "renamed"
+        self.user.save()
+        response = self.client.get('/tasks/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['owner'], 'renamed')
+        self.assertEqual(self.client.get('/archive/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/categories/')['X-Cache'], 'MISS')
+
+    def test_logins_do_not_invalidate(self):
+        self.get_titles()
+        self.client.login(username="testuser", password="password123")
+        self.assertEqual(self.get_titles()[0], 'HIT')
+
+    def test_new_version_drops_older_entries(self):
+        self.get_titles()
+        self.get_titles(status='Pending')
+        backend = cache.get_backend()
+        self.assertEqual(len(backend.entries), 2)
+        Task.objects.create(owner=self.user, title="New")
+        self.assertEqual(self.get_titles()[0], 'MISS')
+        self.assertEqual(len(backend.entries), 1)
+
+    def test_large_pages_are_not_cached(self):
+        Task.objects.create(
+            owner=self.user, title="Second", status="In Progress"
+        )
+        with override_settings(RESPONSE_CACHE={'MAX_ROWS': 1}):
+            self.assertEqual(self.get_titles()[0], 'MISS')
+            self.assertEqual(self.get_titles()[0], 'MISS')
+            self.assertEqual(self.get_titles(status='Pending')[0], 'MISS')
+            self.assertEqual(self.get_titles(status='Pending')[0], 'HIT')
+
+    def test_lru_backend_is_bounded_by_bytes(self):
+        payload = ['x' * 1000]
+        size = cache.get_size(payload)
+        backend = cache.LRUBackend(max_entries=100, max_bytes=size * 20)
+        for key in range(30):
+            backend.set(key, payload)
+        self.assertEqual(len(backend.entries), 20)
+        self.assertEqual(backend.bytes, size * 20)
+        self.assertIsNone(backend.get(0))
+        self.assertEqual(backend.get(29), payload)
+        # Over a tenth of max_bytes
+        backend.set('large', payload * 3)
+        self.assertIsNone(backend.get('large'))
+
+    @override_settings(
+        RESPONSE_CACHE={
+            'BACKEND': 'drf_api.cache.DjangoCacheBackend',
+            'OPTIONS': {'alias': 'default', 'timeout': 60},
+        },
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }},
+    )
+    def test_shared_backend(self):
+        self.assertEqual(self.get_titles(), ('MISS', ['Cached']))
+        self.assertEqual(self.get_titles(), ('HIT', ['Cached']))
+        self.task.delete()
+        self.assertEqual(self.get_titles(), ('MISS', []))
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False})
+    def test_disabled(self):
+        self.client.get('/tasks/')
+        response = self.client.get('/tasks/')
+        self.assertNotIn('X-Cache', response)
+
+
+class TaskConditionalGetTests(APITestCase):
+    '''
+    Tests ETag validation on task endpoints.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.task = Task.objects.create(owner=self.user, title="Task")
+
+    def test_list_not_modified(self):
+        response = self.client.get('/tasks/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        with self.assertNumQueries(3):
+            # Session, user and data version, no task query
+            response = self.client.get('/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_depends_on_query(self):
+        etag = self.client.get('/tasks/')['ETag']
+        response = self.client.get(
+            '/tasks/', {'ordering': 'due_date'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_writes_change_etag(self):
+        etag = self.client.get('/archive/')['ETag']
+        self.task.status = "Completed"
+        self.task.save()
+        response = self.client.get('/archive/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_username_change_changes_etag(self):
+        list_etag = self.client.get('/tasks/')['ETag']
+        url = f'/tasks/{self.task.id}/'
+        detail_etag = self.client.get(url)['ETag']
+        self.user.username = "renamed"
+        self.user.save()
+        response = self.client.get('/tasks/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['owner'], 'renamed')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['owner'], 'renamed')
+
+    def test_detail_not_modified(self):
+        url = f'/tasks/{self.task.id}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_deleted_task_is_not_found(self):
+        url = f'/tasks/{self.task.id}/'
+        etag = self.client.get(url)['ETag']
+        self.client.delete(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_get_other_etags(self):
+        etag = self.client.get('/tasks/')['ETag']
+        User.objects.create_user(username="other", password="password123")
+        self.client.login(username="other", password="password123")
+        response = self.client.get('/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TaskBulkTests(APITestCase):
+    '''
+    Tests for creating, updating and deleting tasks in bulk.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="otheruser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.work = Category.objects.create(owner=self.user, name="Work")
+        self.foreign = Category.objects.create(owner=self.other, name="Theirs")
+        self.task = Task.objects.create(
+            owner=self.user, title="Existing", category=self.work
+        )
+        self.done = Task.objects.create(
+            owner=self.user, title="Done", status="Completed"
+        )
+
+    def bulk(self, **data):
+        return self.client.post('/tasks/bulk/', data, format='json')
+
+    def test_create(self):
+        response = self.bulk(create=[
+            {'title': 'One', 'category': self.work.id, 'priority': 'High'},
+            {'title': 'Two'},
+            {'title': 'Three', 'status': 'Completed'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        one, two, three = response.data['created']
+        self.assertEqual(one['category_name'], 'Work')
+        self.assertEqual(one['priority'], 'High')
+        self.assertEqual(two['category_name'], 'Uncategorized')
+        self.assertTrue(three['is_archived'])
+        self.assertEqual(
+            Task.objects.filter(owner=self.user, title='Two').count(), 1
+        )
+
+    def test_update_is_partial_and_follows_archive_rules(self):
+        response = self.bulk(update=[
+            {'id': self.task.id, 'status': 'Completed'},
+            {'id': self.done.id, 'status': 'Pending'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.task.refresh_from_db()
+        self.done.refresh_from_db()
+        self.assertEqual(self.task.title, 'Existing')
+        self.assertEqual(self.task.category, self.work)
+        self.assertTrue(self.task.is_archived)
+        self.assertFalse(self.done.is_archived)
+        self.assertGreater(self.task.updated_at, self.task.created_at)
+
+    def test_delete(self):
+        response = self.bulk(delete=[self.task.id, self.done.id])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], [self.task.id, self.done.id])
+        self.assertFalse(Task.objects.filter(owner=self.user).exists())
+        self.assertEqual(
+            sorted(TaskTombstone.objects.values_list('task_id', flat=True)),
+            sorted([self.task.id, self.done.id]),
+        )
+
+    def test_delete_query_count_is_constant(self):
+        def count_queries(task_ids):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.bulk(delete=task_ids)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        few = count_queries([self.task.id])
+        many = [
+            Task.objects.create(owner=self.user, title=f"Task {i}").id
+            for i in range(20)
+        ]
+        self.assertEqual(count_queries(many), few)
+
+    def test_category_ownership_checked_in_one_query(self):
+        categories = [
+            Category.objects.create(owner=self.user, name=f"Cat {i}")
+            for i in range(5)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.bulk(create=[
+                {'title': f'Task {i}', 'category': category.id}
+                for i, category in enumerate(categories)
+            ])
+        category_queries = [
+            query for query in queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "categories_category"' in query['sql']
+        ]
+        self.assertEqual(len(category_queries), 1)
+
+    def test_invalid_items_write_nothing(self):
+        other_task = Task.objects.create(owner=self.other, title="Theirs")
+        response = self.bulk(
+            create=[
+                {'title': 'Fine'},
+                {'title': 'Bad', 'category': self.foreign.id},
+            ],
+            update=[{'id': other_task.id, 'title': 'Mine now'}],
+            delete=[self.task.id],
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['create'][0], {})
+        self.assertIn('category', response.data['create'][1])
+        self.assertIn('id', response.data['update'][0])
+        self.assertNotIn('delete', response.data)
+        self.assertFalse(Task.objects.filter(title='Fine').exists())
+        self.assertTrue(Task.objects.filter(id=self.task.id).exists())
+
+    def test_validation_errors(self):
+        response = self.bulk(create=[{'status': 'Unknown'}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('title', response.data['create'][0])
+        self.assertIn('status', response.data['create'][0])
+
+        response = self.bulk(
+            update=[{'id': self.task.id}], delete=[self.task.id]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalidates_cached_lists(self):
+        self.client.get('/tasks/')
+        self.bulk(update=[{'id': self.task.id, 'title': 'Renamed'}])
+        response = self.client.get('/tasks/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        response = self.bulk(create=[{'title': 'Anonymous'}])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TaskChangesTests(APITestCase):
+    '''
+    Tests for incremental sync through /tasks/changes/.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="otheruser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.category = Category.objects.create(owner=self.user, name="Work")
+        self.tasks = [
+            Task.objects.create(
+                owner=self.user, title=f"Task {i}", category=self.category
+            )
+            for i in range(3)
+        ]
+        Task.objects.create(owner=self.other, title="Not mine")
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params['since'] = cursor
+        response = self.client.get('/tasks/changes/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def changed_ids(self, data):
+        return [task['id'] for task in data['changed']]
+
+    def test_first_sync_returns_everything(self):
+        data = self.sync()
+        self.assertEqual(
+            self.changed_ids(data), [task.id for task in self.tasks]
+        )
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+
+    def test_nothing_changed(self):
+        data = self.sync(self.sync()['cursor'])
+        self.assertEqual(data['changed'], [])
+        self.assertEqual(data['deleted'], [])
+
+    def test_only_changes_are_returned(self):
+        cursor = self.sync()['cursor']
+        self.tasks[1].status = "Completed"
+        self.tasks[1].save()
+        new = Task.objects.create(owner=self.user, title="New")
+        data = self.sync(cursor)
+        self.assertEqual(self.changed_ids(data), [self.tasks[1].id, new.id])
+        self.assertTrue(data['changed'][0]['is_archived'])
+
+    def test_deletes_are_returned(self):
+        cursor = self.sync()['cursor']
+        self.client.delete(f'/tasks/{self.tasks[0].id}/')
+        data = self.sync(cursor)
+        self.assertEqual(data['changed'], [])
+        self.assertEqual(data['deleted'], [self.tasks[0].id])
+
+    def test_category_delete_leaves_tombstones(self):
+        cursor = self.sync()['cursor']
+        self.client.delete(f'/categories/{self.category.id}/')
+        data = self.sync(cursor)
+        self.assertEqual(
+            sorted(data['deleted']), [task.id for task in self.tasks]
+        )
+
+    def test_paging(self):
+        data = self.sync(page_size=2)
+        self.assertTrue(data['has_more'])
+        ids = self.changed_ids(data)
+        data = self.sync(data['cursor'], page_size=2)
+        self.assertFalse(data['has_more'])
+        self.assertEqual(
+            ids + self.changed_ids(data), [task.id for task in self.tasks]
+        )
+
+    def test_changes_are_found_by_sequence_not_clock(self):
+        '''
+        A write stamped before the cursor, eg. by a slow transaction or
+        a skewed clock, still comes after it in the sequence.
+        '''
+        cursor = self.sync()['cursor']
+        self.tasks[0].title = "Late"
+        self.tasks[0].save()
+        Task.objects.filter(pk=self.tasks[0].pk).update(
+            updated_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(
+            self.changed_ids(self.sync(cursor)), [self.tasks[0].id]
+        )
+
+    def test_sequence_commits_in_order(self):
+        self.tasks[0].save()
+        self.tasks[1].save()
+        self.assertLess(
+            Task.objects.get(pk=self.tasks[0].pk).sync_seq,
+            Task.objects.get(pk=self.tasks[1].pk).sync_seq,
+        )
+        self.assertEqual(
+            Profile.objects.get(owner=self.user).sync_seq,
+            Task.objects.get(pk=self.tasks[1].pk).sync_seq,
+        )
+
+    def test_bulk_writes_are_returned(self):
+        cursor = self.sync()['cursor']
+        response = self.client.post('/tasks/bulk/', {
+            'create': [{'title': 'New'}],
+            'update': [{'id': self.tasks[0].id, 'title': 'Bulk'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = self.sync(cursor)
+        self.assertEqual(
+            self.changed_ids(data),
+            [response.data['created'][0]['id'], self.tasks[0].id],
+        )
+
+    def test_overdue_sweep_is_returned(self):
+        Task.objects.filter(pk=self.tasks[1].pk).update(
+            due_date=date(2024, 3, 1)
+        )
+        cursor = self.sync()['cursor']
+        mark_overdue_tasks(date(2024, 3, 10))
+        data = self.sync(cursor)
+        self.assertEqual(self.changed_ids(data), [self.tasks[1].id])
+        self.assertEqual(data['changed'][0]['status'], 'Overdue')
+
+    def test_category_rename_is_returned(self):
+        cursor = self.sync()['cursor']
+        self.client.put(
+            f'/categories/{self.category.id}/', {'name': 'Office'}
+        )
+        data = self.sync(cursor)
+        self.assertEqual(
+            self.changed_ids(data), [task.id for task in self.tasks]
+        )
+        self.assertEqual(
+            {task['category_name'] for task in data['changed']}, {'Office'}
+        )
+
+    def test_username_change_is_returned(self):
+        cursor = self.sync()['cursor']
+        self.user.first_name = "Test"
+        self.user.save()
+        self.assertEqual(self.sync(cursor)['changed'], [])
+        self.user.username = "renamed"
+        self.user.save()
+        data = self.sync(cursor)
+        self.assertEqual(
+            self.changed_ids(data), [task.id for task in self.tasks]
+        )
+        self.assertEqual(
+            {task['owner'] for task in data['changed']}, {'renamed'}
+        )
+
+    def test_invalid_cursor(self):
+        for cursor in [
+            'nonsense', 'WzEsMl0=', 'W1siMjAyNCIsMV0sbnVsbF0=',
+            encode_cursor(True, 0, timezone.now()),
+            encode_cursor(1, 0, datetime(2024, 1, 1)),
+        ]:
+            response = self.client.get('/tasks/changes/', {'since': cursor})
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_idle_cursor_keeps_up(self):
+        old = timezone.now() - timedelta(days=1)
+        seq = Profile.objects.get(owner=self.user).sync_seq
+        cursor = self.sync(encode_cursor(seq, seq, old))['cursor']
+        self.assertGreater(decode_cursor(cursor)[2], old)
+
+    def test_old_cursor_must_resync(self):
+        old = timezone.now() - timedelta(days=31)
+        response = self.client.get(
+            '/tasks/changes/', {'since': encode_cursor(None, 0, old)}
+        )
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(response.data['detail'].code, 'resync_required')
+        with self.settings(TASK_SYNC={'TOMBSTONE_RETENTION_DAYS': 60}):
+            self.sync(encode_cursor(None, 0, old))
+
+    def test_prune_tombstones(self):
+        old, recent = [task.id for task in self.tasks[:2]]
+        self.tasks[0].delete()
+        self.tasks[1].delete()
+        TaskTombstone.objects.filter(task_id=old).update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        out = StringIO()
+        call_command('prune_tombstones', '--chunk-size', '1', stdout=out)
+        self.assertIn('Deleted 1 tombstones', out.getvalue())
+        self.assertEqual(
+            list(TaskTombstone.objects.values_list('task_id', flat=True)),
+            [recent],
+        )
+
+    def test_deleting_a_user_removes_their_tombstones(self):
+        self.tasks[0].delete()
+        self.user.delete()
+        self.assertFalse(TaskTombstone.objects.exists())
+
+
+class OverdueSweepTests(APITestCase):
+    '''
+    Tests for marking past-due tasks as Overdue.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="password123"
+        )
+        self.client.login(username="testuser", password="password123")
+        self.today = date(2024, 3, 10)
+        past = date(2024, 3, 9)
+        self.pending = Task.objects.create(
+            owner=self.user, title="Pending", due_date=past
+        )
+        self.in_progress = Task.objects.create(
+            owner=self.user, title="In Progress", due_date=past,
+            status="In Progress",
+        )
+        self.due_today = Task.objects.create(
+            owner=self.user, title="Due today", due_date=self.today
+        )
+        self.no_due_date = Task.objects.create(owner=self.user, title="None")
+        self.completed = Task.objects.create(
+            owner=self.user, title="Completed", due_date=past,
+            status="Completed",
+        )
+
+    def test_marks_past_due_tasks(self):
+        reports = []
+        marked = mark_overdue_tasks(
+            self.today, batch_size=1, progress=reports.append
+        )
+        self.assertEqual(marked, 2)
+        self.assertEqual(reports, [1, 2])
+        self.assertEqual(
+            set(Task.objects.filter(status="Overdue")),
+            {self.pending, self.in_progress}
+        )
+        self.assertEqual(mark_overdue_tasks(self.today), 0)
+
+    def test_bumps_updated_at_and_invalidates_cache(self):
+        before = self.pending.updated_at
+        self.client.get('/tasks/')
+        mark_overdue_tasks(self.today)
+        self.pending.refresh_from_db()
+        self.assertGreater(self.pending.updated_at, before)
+
+        response = self.client.get('/tasks/', {'status': 'Overdue'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_sweep_can_be_limited(self):
+        other = User.objects.create_user(
+            username="otheruser",
+            password="password123"
+        )
+        kept = Task.objects.create(
+            owner=other, title="Other", due_date=date(2024, 3, 9)
+        )
+        marked = mark_overdue_tasks(
+            self.today, tasks=Task.objects.filter(owner=other)
+        )
+        self.assertEqual(marked, 1)
+        kept.refresh_from_db()
+        self.assertEqual(kept.status, "Overdue")
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, "Pending")
+
+    def test_sweep_uses_index(self):
+        queryset = overdue_tasks('Pending', self.today).order_by(
+            'due_date', 'id'
+        )
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            self.assertIn('task_overdue_sweep_idx', plan)
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command('mark_overdue_tasks', stdout=out)
+        # Every test date is in the past for the real today
+        self.assertIn('Marked 3 tasks overdue', out.getvalue())
+
+    def test_management_command_interval(self):
+        with mock.patch(
+            'tasks.management.commands.mark_overdue_tasks.OverdueScheduler'
+        ) as scheduler:
+            call_command('mark_overdue_tasks', '--interval', '3600')
+        scheduler.assert_called_once_with(3600, 5000)
+        scheduler.return_value.run.assert_called_once_with()
+
+    def test_scheduler(self):
+        with mock.patch('tasks.overdue.mark_overdue_tasks') as sweep:
+            scheduler = OverdueScheduler(interval=0.01)
+            scheduler.start()
+            for _ in range(100):
+                if sweep.called:
+                    break
+                time.sleep(0.01)
+            scheduler.stop()
+            scheduler.join(1)
+        self.assertTrue(sweep.called)
+        self.assertFalse(scheduler.is_alive())
+
+
+class SeedAndBenchmarkTests(TestCase):
+    '''
+    The seed_data and run_benchmarks commands.
+    '''
+    def seed(self, *args):
+        call_command(
+            'seed_data', '--users', '2', '--categories', '3',
+            '--tasks', '20', *args, stdout=StringIO(),
+        )
+
+    def test_seed_data(self):
+        self.seed()
+        tasks = Task.objects.filter(owner__username__startswith='seed-')
+        self.assertEqual(
+            User.objects.filter(username__startswith='seed-').count(), 2
+        )
+        self.assertEqual(tasks.count(), 40)
+        self.assertEqual(
+            Category.objects.filter(owner__username__startswith='seed-')
+            .count(), 6
+        )
+        for user in User.objects.filter(username__startswith='seed-'):
+            self.assertEqual(user.profile.default_category.name,
+                             'Uncategorized')
+            self.assertEqual(user.profile.default_category.owner, user)
+        self.assertFalse(tasks.exclude(category__owner=F('owner')).exists())
+        self.assertFalse(
+            tasks.filter(status='Completed', is_archived=False).exists()
+        )
+
+    def test_bench_commands_seed_the_same_distribution(self):
+        owner = create_bench_user('bench-user')
+        seed_tasks(owner, 2000)
+        tasks = Task.objects.filter(owner=owner)
+        total = sum(_seeding.STATUS_WEIGHTS.values())
+        for status_name, weight in _seeding.STATUS_WEIGHTS.items():
+            self.assertAlmostEqual(
+                tasks.filter(status=status_name).count() / 2000,
+                weight / total, delta=0.05,
+            )
+        self.assertFalse(
+            tasks.filter(status='Completed', is_archived=False).exists()
+        )
+        # Left for the overdue sweep
+        self.assertTrue(overdue_tasks('Pending', tasks=tasks).exists())
+
+    def test_seed_data_clear(self):
+        self.seed()
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                self.seed()
+        self.seed('--clear')
+        self.assertEqual(
+            Task.objects.filter(owner__username__startswith='seed-').count(),
+            40
+        )
+
+    def test_run_benchmarks(self):
+        self.seed()
+        tasks = Task.objects.count()
+        categories = Category.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            output = f'{directory}/results.json'
+            call_command(
+                'run_benchmarks', '--requests', '3', '--output', output,
+                stdout=StringIO(),
+            )
+            with open(output) as file:
+                results = json.load(file)['results']
+            out = StringIO()
+            call_command(
+                'run_benchmarks', '--requests', '3', '--compare', output,
+                '--scenario', 'tasks-list', stdout=out,
+            )
+
+        self.assertEqual(set(results), set(run_benchmarks.SCENARIOS))
+        for name, result in results.items():
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['queries'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertIn('p50 ', out.getvalue())
+        # Writes undo themselves
+        self.assertEqual(Task.objects.count(), tasks)
+        self.assertEqual(Category.objects.count(), categories)
+
+    def test_run_benchmarks_without_seeded_users(self):
+        with self.assertRaises(CommandError):
+            call_command('run_benchmarks', stdout=StringIO())
@@ -1,8 +1,11 @@
 from django.urls import path
+from drf_api.async_views import async_view
 from tasks import views
 
 urlpatterns = [
-    path('tasks/', views.TaskListView.as_view()),
-    path('tasks/<int:pk>/', views.TaskDetailView.as_view()),
+    path('tasks/', async_view(views.TaskListView.as_view())),
+    path('tasks/<int:pk>/', async_view(views.TaskDetailView.as_view())),
+    path('tasks/bulk/', views.TaskBulkView.as_view()),
+    path('tasks/changes/', views.TaskChangesView.as_view()),
     path("archive/", views.ArchivedTaskListView.as_view()),
 ]
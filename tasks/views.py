@@ -4,33 +4,110 @@ from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 from drf_api.permissions import IsOwnerOrReadOnly
 # functionality
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 # server requests
+from django.conf import settings
+from django.db import connection, transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 # serializers
-from .serializers import TaskSerializer
+from .serializers import (
+    TaskSerializer, TaskRowSerializer, TaskBulkSerializer,
+)
 # models
-from .models import Task
+from .models import Task, TaskTombstone
+from categories.deletion import create_tombstones
+from categories.defaults import (
+    get_default_category_id, load_default_category_id,
+)
+from categories.fields import get_owned_categories
 from categories.models import Category
+from profiles.models import Profile
 # filters
 from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter
-from .filters import filter_tasks_by_priority, filter_tasks_by_status
+from .filters import (
+    filter_tasks_by_priority, filter_tasks_by_status, TaskSearchFilter,
+)
+# pagination
+from drf_api.pagination import PageOrCursorPagination
+# caching
+from drf_api.cache import CachedListMixin, bump_data_version
+from drf_api.conditional import DataVersionConditionalMixin
+from drf_api.replicas import ReplicaReadMixin
+from drf_api.streaming import streaming_response, wants_stream
+from drf_api.sparse import get_sparse_fields, sparse_queryset
+# sync
+from .sequence import reserve_sequence
+from .sync import (
+    ResyncRequired, after, decode_cursor, encode_cursor, is_expired,
+)
 
 
-class TaskListView(generics.ListCreateAPIView):
+class TaskRowListMixin:
+    '''
+    Serves list GETs from values_list() rows through TaskRowSerializer
+    instead of Task instances and TaskSerializer.
+    - `?stream=true` streams page number pages in chunks.
+    Turned off with the TASKS_FAST_READ setting.
+    '''
+    def list(self, request, *args, **kwargs):
+        if not settings.TASKS_FAST_READ:
+            return super().list(request, *args, **kwargs)
+
+        serializer = TaskRowSerializer(
+            get_sparse_fields(request, TaskSerializer.Meta.fields)
+        )
+        queryset = self.filter_queryset(self.get_queryset())
+        # Keyset pages read their keys from the rows
+        key_columns = []
+        if self.paginator is not None:
+            key_columns = self.paginator.get_key_columns(
+                queryset, request, view=self
+            )
+        queryset = serializer.get_rows(queryset, key_columns)
+
+        if wants_stream(request) and self.paginator is not None:
+            page = self.paginator.paginate_queryset_lazily(
+                queryset, request, view=self
+            )
+            if page is not None:
+                envelope, rows = page
+                return streaming_response(
+                    envelope, rows, serializer.serialize,
+                    request.accepted_renderer,
+                )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+
+class TaskListView(
+    ReplicaReadMixin, DataVersionConditionalMixin, CachedListMixin,
+    TaskRowListMixin, generics.ListCreateAPIView
+):
     '''
     API view for listing and creating tasks.
     - Users can only view their own tasks.
     - Users must be authenticated to access.
     - Users can only assign categories they own.
-    - Supports text search by title and description.
+    - Supports full-text search by title, description and category name.
+    - Supports keyset pagination with `?pagination=cursor`.
+    - Streams large pages as JSON with `?stream=true`.
+    - `?fields=` and `?omit=` return and load only some fields.
+    - List responses are cached per user until their data changes.
+    - GETs carry an ETag and answer If-None-Match with 304.
+    - GETs read from a replica when there is one.
     '''
     permission_classes = [IsAuthenticated]
     serializer_class = TaskSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    pagination_class = PageOrCursorPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter, TaskSearchFilter]
     filterset_fields = ['priority', 'status']
     ordering_fields = ['priority', 'due_date', 'status']
     search_fields = ['title', 'description', 'category__name']
@@ -39,8 +116,11 @@ class TaskListView(generics.ListCreateAPIView):
         '''
         Returns only active (non-archived) belonging to the logged in user
         Supports filtering by priority.
+        Owner and category are joined in for the serializer.
         '''
-        queryset = Task.objects.filter(owner=self.request.user, is_archived=False)
+        queryset = Task.objects.select_related('owner', 'category').filter(
+            owner=self.request.user, is_archived=False
+        )
 
         task_ids = self.request.query_params.get("ids")
         if task_ids:
@@ -49,26 +129,36 @@ class TaskListView(generics.ListCreateAPIView):
 
         queryset = filter_tasks_by_priority(queryset, self.request)
         queryset = filter_tasks_by_status(queryset, self.request)
-        return queryset
+        return sparse_queryset(queryset, self.request, TaskSerializer)
 
     def perform_create(self, serializer):
         """
         Assigns 'Uncategorized' if no category is provided.
+        The serializer only accepts the user's own categories and the
+        default category id comes with the user, so no category is
+        queried here.
         """
         user = self.request.user
-        category = serializer.validated_data.get("category", None)
-
-        if category is None or not Category.objects.filter(id=category.id, owner=user).exists():
-            category = Category.objects.get(owner=user, name="Uncategorized")
-
-        serializer.save(owner=user, category=category)
+        if serializer.validated_data.get("category") is None:
+            serializer.validated_data.pop("category", None)
+            serializer.save(
+                owner=user, category_id=get_default_category_id(user)
+            )
+        else:
+            serializer.save(owner=user)
 
 
-class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
+class TaskDetailView(
+    ReplicaReadMixin, DataVersionConditionalMixin,
+    generics.RetrieveUpdateDestroyAPIView
+):
     '''
     API view for retrieving, updating, and deleting a task.
     - Users can only access their own tasks
     - Only the task owner can edit or delete
+    - `?fields=` and `?omit=` return and load only some fields.
+    - GETs carry an ETag and answer If-None-Match with 304.
+    - GETs read from a replica when there is one.
     '''
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
     serializer_class = TaskSerializer
@@ -79,7 +169,10 @@ class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
         returns 404 for none-owner as the task is not in the queryset.
         not a 403 forbidden.
         '''
-        return Task.objects.filter(owner=self.request.user)
+        queryset = Task.objects.select_related('owner', 'category').filter(
+            owner=self.request.user
+        )
+        return sparse_queryset(queryset, self.request, TaskSerializer)
 
     def get_object(self):
         '''
@@ -111,19 +204,238 @@ class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
             serializer.save()
 
 
-class ArchivedTaskListView(generics.ListAPIView):
+class ArchivedTaskListView(
+    ReplicaReadMixin, DataVersionConditionalMixin, CachedListMixin,
+    TaskRowListMixin, generics.ListAPIView
+):
     '''
     API view for listing only archived (completed) tasks.
     - Users can only view their own archived tasks.
     - Tasks marked as 'Completed' are automatically moved here.
+    - Supports keyset pagination with `?pagination=cursor`.
+    - Streams large pages as JSON with `?stream=true`.
+    - `?fields=` and `?omit=` return and load only some fields.
+    - Responses are cached per user until their data changes.
+    - GETs carry an ETag and answer If-None-Match with 304.
+    - GETs read from a replica when there is one.
     '''
     permission_classes = [IsAuthenticated]
     serializer_class = TaskSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    pagination_class = PageOrCursorPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter, TaskSearchFilter]
     search_fields = ['title', 'description', 'category__name']
 
     def get_queryset(self):
         '''
         Returns only archived (completed) tasks belonging to the logged-in user.
         '''
-        return Task.objects.filter(owner=self.request.user, is_archived=True)
+        queryset = Task.objects.select_related('owner', 'category').filter(
+            owner=self.request.user, is_archived=True
+        )
+        return sparse_queryset(queryset, self.request, TaskSerializer)
+
+
+class TaskBulkView(APIView):
+    '''
+    API view for creating, updating and deleting many tasks at once.
+    - Body: `{"create": [...], "update": [{"id": 1, ...}], "delete": [2]}`.
+    - Category ownership is checked with one query for the whole request.
+    - Creates without a category go to 'Uncategorized'.
+    - Same archive rules as Task.save and TaskDetailView.perform_update.
+    - Everything is written in one transaction, or nothing on any error.
+    '''
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = TaskBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = request.user
+
+        categories = get_owned_categories(request)
+        tasks = Task.objects.filter(owner=user).select_related(
+            'category'
+        ).in_bulk([item['id'] for item in data['update']] + data['delete'])
+        errors = self.get_errors(data, categories, tasks)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            created = self.create_tasks(user, data['create'], categories)
+            updated = self.update_tasks(user, data['update'], categories, tasks)
+            self.delete_tasks(user, data['delete'])
+            # bulk_create(), bulk_update() and raw deletes send no signals
+            bump_data_version(user.id)
+
+        context = self.get_serializer_context()
+        return Response({
+            'created': TaskSerializer(created, many=True, context=context).data,
+            'updated': TaskSerializer(updated, many=True, context=context).data,
+            'deleted': data['delete'],
+        })
+
+    def get_serializer_context(self):
+        return {
+            'request': self.request, 'format': self.format_kwarg, 'view': self
+        }
+
+    def get_errors(self, data, categories, tasks):
+        '''
+        Returns errors shaped like the request, or None if there are none.
+        '''
+        def category_error(item):
+            category_id = item.get('category')
+            if category_id is not None and category_id not in categories:
+                return {'category': [
+                    f'Invalid pk "{category_id}" - object does not exist.'
+                ]}
+            return {}
+
+        def task_error(task_id):
+            if task_id not in tasks:
+                return {'id': ['Not found.']}
+            return {}
+
+        errors = {
+            'create': [category_error(item) for item in data['create']],
+            'update': [
+                {**task_error(item['id']), **category_error(item)}
+                for item in data['update']
+            ],
+            'delete': [task_error(task_id) for task_id in data['delete']],
+        }
+        errors = {key: value for key, value in errors.items() if any(value)}
+        return errors or None
+
+    def create_tasks(self, user, items, categories):
+        if not items:
+            return []
+        uncategorized = categories.get(get_default_category_id(user))
+        if uncategorized is None:
+            # Read with an older copy of the user
+            uncategorized = Category.objects.get(
+                pk=load_default_category_id(user)
+            )
+        created = []
+        for item in items:
+            category_id = item.pop('category', None)
+            task = Task(
+                owner=user,
+                category=categories.get(category_id, uncategorized),
+                **item
+            )
+            task.is_archived = task.status == "Completed"
+            created.append(task)
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            first = reserve_sequence(user.id, len(created))
+            for offset, task in enumerate(created):
+                task.sync_seq = first + offset
+            return Task.objects.bulk_create(created)
+        # Without RETURNING (eg. SQLite) bulk_create() cannot set the ids
+        for task in created:
+            task.save()
+        return created
+
+    def update_tasks(self, user, items, categories, tasks):
+        if not items:
+            return []
+        now = timezone.now()
+        first = reserve_sequence(user.id, len(items))
+        fields = {'is_archived', 'updated_at', 'sync_seq'}
+        updated = []
+        for item in items:
+            task = tasks[item.pop('id')]
+            task.owner = user
+            previous_status = task.status
+            if 'category' in item:
+                task.category = categories.get(item.pop('category'))
+                fields.add('category')
+            for field, value in item.items():
+                setattr(task, field, value)
+                fields.add(field)
+
+            if task.status == "Completed":
+                task.is_archived = True
+            elif previous_status == "Completed":
+                task.is_archived = False
+            task.updated_at = now
+            task.sync_seq = first + len(updated)
+            updated.append(task)
+
+        Task.objects.bulk_update(updated, sorted(fields))
+        return updated
+
+    def delete_tasks(self, user, task_ids):
+        '''
+        Deletes like categories/deletion.py: one INSERT of tombstones and
+        one raw DELETE, instead of the collector's queries per task.
+        '''
+        if not task_ids:
+            return
+        create_tombstones(user.id, task_ids, timezone.now())
+        queryset = Task.objects.filter(owner=user, id__in=task_ids)
+        queryset._raw_delete(queryset.db)
+
+
+class TaskChangesView(APIView):
+    '''
+    API view for incremental sync of all the user's tasks.
+    - `?since=<cursor>` returns tasks created or updated after the cursor
+      (archived ones included) and the ids of tasks deleted since.
+    - Without `?since=` every task is returned, as a first sync.
+    - Follow `cursor` while `has_more` is true, then keep it for next time.
+    - A cursor older than the tombstone retention is answered with 410
+      `resync_required`: drop local state and sync again without it.
+    - Always reads from `default`, never a replica, so a sync right after
+      a write includes it.
+    '''
+    permission_classes = [IsAuthenticated]
+    page_size = 500
+    max_page_size = 1000
+
+    def get(self, request):
+        user = request.user
+        since = request.query_params.get('since')
+        if since:
+            try:
+                tasks_seq, tombstones_seq, issued_at = decode_cursor(since)
+            except ValueError:
+                raise ValidationError({'since': ['Invalid cursor.']})
+            if is_expired(issued_at):
+                raise ResyncRequired()
+        else:
+            # A first sync has nothing to delete: deletes numbered up to
+            # now removed their tasks before the tasks are read
+            tasks_seq = None
+            tombstones_seq = Profile.objects.filter(owner=user).values_list(
+                'sync_seq', flat=True
+            ).first() or 0
+        issued_at = timezone.now()
+        limit = self.get_page_size(request)
+
+        serializer = TaskRowSerializer()
+        tasks = list(serializer.get_rows(
+            after(Task.objects.filter(owner=user), tasks_seq), ['sync_seq']
+        )[:limit + 1])
+        tombstones = list(after(
+            TaskTombstone.objects.filter(owner=user), tombstones_seq
+        ).values_list('sync_seq', 'task_id')[:limit + 1])
+
+        if tasks[:limit]:
+            tasks_seq = tasks[:limit][-1].sync_seq
+        if tombstones[:limit]:
+            tombstones_seq = tombstones[:limit][-1][0]
+        return Response({
+            'changed': serializer.serialize(tasks[:limit]),
+            'deleted': [task_id for _, task_id in tombstones[:limit]],
+            'cursor': encode_cursor(tasks_seq, tombstones_seq, issued_at),
+            'has_more': len(tasks) > limit or len(tombstones) > limit,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get('page_size', ''))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))